@@ -0,0 +1,40 @@
+from rest_framework import filters
+from products.search import SEARCH_MODES, search_products
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """
+    `?search=` usando o índice de busca textual de produtos em vez de
+    `icontains` nos campos. Sem `?ordering=`, os resultados vêm por relevância.
+    `?search_mode=fuzzy` ativa a busca aproximada (trigramas do nome).
+    """
+
+    search_mode_param = "search_mode"
+
+    def get_search_mode(self, request):
+        mode = request.query_params.get(self.search_mode_param, "")
+        return mode if mode in SEARCH_MODES else "fulltext"
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        ordering_param = filters.OrderingFilter.ordering_param
+        ranked = not request.query_params.get(ordering_param)
+        return search_products(
+            queryset,
+            " ".join(terms),
+            ranked=ranked,
+            mode=self.get_search_mode(request),
+        )
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [
+            {
+                "name": self.search_mode_param,
+                "required": False,
+                "in": "query",
+                "description": "Modo de busca: fulltext (padrão) ou fuzzy (aproximada).",
+                "schema": {"type": "string", "enum": list(SEARCH_MODES)},
+            }
+        ]
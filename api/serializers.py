@@ -1,5 +1,13 @@
 from rest_framework import serializers
-from products.models import Category, Product, PriceHistory, ProductMovement
+from products.models import (
+    Category,
+    PriceDailyRollup,
+    PriceHistory,
+    Product,
+    ProductMovement,
+)
+from products.bulk import PRICE_ADJUSTMENTS
+from products.stock import MAX_BATCH_LINES
 from django.contrib.auth.models import User
 
 
@@ -22,6 +30,41 @@ class PriceHistorySerializer(serializers.ModelSerializer):
         fields = ["id", "price", "changed_at"]
 
 
+class PriceDailyRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PriceDailyRollup
+        fields = ["day", "open", "high", "low", "close", "change_count"]
+
+
+# Limites de /products/{id}/price-history/
+MAX_SERIES_POINTS = 5000
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 1000
+
+
+class PriceHistoryQuerySerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    # Com `points`, a série do período é reduzida por LTTB (sem paginação)
+    points = serializers.IntegerField(
+        required=False, min_value=3, max_value=MAX_SERIES_POINTS
+    )
+    cursor = serializers.CharField(required=False)
+    page_size = serializers.IntegerField(
+        required=False, min_value=1, max_value=MAX_PAGE_SIZE, default=DEFAULT_PAGE_SIZE
+    )
+
+    def validate(self, attrs):
+        if attrs.get("start") and attrs.get("end") and attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError("`start` deve ser anterior a `end`.")
+        return attrs
+
+
+class PricePointSerializer(serializers.Serializer):
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    changed_at = serializers.DateTimeField()
+
+
 class ProductMovementSerializer(serializers.ModelSerializer):
     type_display = serializers.CharField(source="get_type_display", read_only=True)
 
@@ -35,8 +78,70 @@ class ProductMovementSerializer(serializers.ModelSerializer):
             "quantity",
             "reason",
             "moved_at",
+            "balance_after",
         ]
-        read_only_fields = ["product", "moved_at"]
+        read_only_fields = ["product", "moved_at", "balance_after"]
+
+    def validate_quantity(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("A quantidade deve ser maior que zero.")
+        return value
+
+
+class MovementBatchLineSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    type = serializers.ChoiceField(choices=ProductMovement.MOVEMENT_TYPES)
+    quantity = serializers.IntegerField(min_value=1)
+    reason = serializers.CharField(
+        max_length=255, required=False, allow_blank=True, default=""
+    )
+
+
+class MovementBatchSerializer(serializers.Serializer):
+    MODES = [
+        ("atomic", "Tudo ou nada"),
+        ("best_effort", "Aplica as linhas válidas"),
+    ]
+
+    mode = serializers.ChoiceField(choices=MODES, default="atomic")
+    # As linhas são validadas uma a uma pela view, para o modo best_effort
+    movements = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=MAX_BATCH_LINES,
+    )
+
+
+class InventoryCountLineSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    counted = serializers.IntegerField(min_value=0)
+
+
+class InventoryCountSerializer(serializers.Serializer):
+    reason = serializers.CharField(
+        max_length=255,
+        required=False,
+        allow_blank=True,
+        default=ProductMovement.ADJUSTMENT_REASON,
+    )
+    counts = InventoryCountLineSerializer(
+        many=True, allow_empty=False, max_length=MAX_BATCH_LINES
+    )
+
+    def validate_counts(self, value):
+        products = [line["product"] for line in value]
+        if len(set(products)) < len(products):
+            raise serializers.ValidationError("Produto repetido na contagem.")
+        return value
+
+
+class BulkPriceSerializer(serializers.Serializer):
+    mode = serializers.ChoiceField(choices=list(PRICE_ADJUSTMENTS.items()))
+    value = serializers.DecimalField(max_digits=12, decimal_places=2)
+    # Sem ids, vale para todos os produtos filtrados pela query string
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False
+    )
 
 
 class ProductSerializer(serializers.ModelSerializer):
@@ -49,6 +154,14 @@ class ProductSerializer(serializers.ModelSerializer):
         required=False,
     )
 
+    # Resumo do histórico gravado no produto (sem consultar PriceHistory)
+    recent_prices = PricePointSerializer(
+        source="price_points", many=True, read_only=True
+    )
+    price_trend = serializers.ChoiceField(
+        choices=["up", "down", "stable"], read_only=True
+    )
+
     class Meta:
         model = Product
         fields = [
@@ -56,6 +169,11 @@ class ProductSerializer(serializers.ModelSerializer):
             "name",
             "description",
             "price",
+            "previous_price",
+            "price_trend",
+            "price_change_count",
+            "last_price_change_at",
+            "recent_prices",
             "stock",
             "is_public",
             "created_at",
@@ -64,10 +182,15 @@ class ProductSerializer(serializers.ModelSerializer):
             "category_ids",
         ]
         read_only_fields = ["user", "created_at", "updated_at"]
+        extra_kwargs = {"stock": {"min_value": 0}}
 
 
 class ProductDetailSerializer(ProductSerializer):
-    price_history = PriceHistorySerializer(many=True, read_only=True)
+    # Só os últimos registros (prefetch de ProductViewSet); o histórico
+    # completo fica em /products/{id}/price-history/
+    price_history = PriceHistorySerializer(
+        source="recent_price_history", many=True, read_only=True
+    )
     movements = ProductMovementSerializer(many=True, read_only=True)
 
     class Meta(ProductSerializer.Meta):
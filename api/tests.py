@@ -1,4 +1,5 @@
 import pytest
+from decimal import Decimal
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -106,6 +107,20 @@ class TestProductAPI:
         assert "price_history" in response.data
         assert "movements" in response.data
 
+    def test_product_list_includes_price_summary(self, auth_client, product):
+        product.price = Decimal("120.00")
+        product.save()
+        response = auth_client.get(reverse("product-list"))
+        assert response.status_code == status.HTTP_200_OK
+        data = response.data[0]
+        assert data["previous_price"] == "150.00"
+        assert data["price_trend"] == "down"
+        assert data["price_change_count"] == 2
+        assert [point["price"] for point in data["recent_prices"]] == [
+            "150.00",
+            "120.00",
+        ]
+
     def test_other_user_cannot_access_product(self, api_client, other_user, product):
         # Authenticate as other_user
         response = api_client.post(
@@ -120,6 +135,77 @@ class TestProductAPI:
         assert response.status_code == status.HTTP_404_NOT_FOUND
 
 
+@pytest.mark.django_db
+class TestPriceHistoryAPI:
+    def test_short_range_returns_raw_entries(self, auth_client, product):
+        product.price = Decimal("120.00")
+        product.save()
+        url = reverse("product-price-history", args=[product.id])
+        response = auth_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["granularity"] == "raw"
+        assert [row["price"] for row in response.data["results"]] == [
+            "150.00",
+            "120.00",
+        ]
+
+    def test_long_range_returns_daily_rollups(self, auth_client, product):
+        url = reverse("product-price-history", args=[product.id])
+        response = auth_client.get(url, {"start": "2020-01-01"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["granularity"] == "daily"
+        assert response.data["results"][0]["close"] == "150.00"
+        assert response.data["results"][0]["change_count"] == 1
+
+    def test_invalid_range(self, auth_client, product):
+        url = reverse("product-price-history", args=[product.id])
+        response = auth_client.get(url, {"start": "2024-02-01", "end": "2024-01-01"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.django_db
+class TestPriceHistorySeriesAPI:
+    def _history(self, product, prices):
+        for price in prices:
+            product.price = Decimal(price)
+            product.save()
+
+    def test_cursor_pagination(self, auth_client, product):
+        self._history(product, ["151.00", "152.00", "153.00", "154.00"])
+        url = reverse("product-price-history", args=[product.id])
+
+        first = auth_client.get(url, {"page_size": 3})
+        assert [row["price"] for row in first.data["results"]] == [
+            "150.00",
+            "151.00",
+            "152.00",
+        ]
+        second = auth_client.get(first.data["next"])
+        assert [row["price"] for row in second.data["results"]] == [
+            "153.00",
+            "154.00",
+        ]
+        assert second.data["next"] is None
+
+    def test_points_downsamples_with_endpoints_kept(self, auth_client, product):
+        self._history(product, [str(100 + i % 7 * 10) for i in range(30)])
+        url = reverse("product-price-history", args=[product.id])
+
+        response = auth_client.get(url, {"points": 5})
+        assert response.status_code == status.HTTP_200_OK
+        results = response.data["results"]
+        assert len(results) == 5
+        history = list(product.price_history.order_by("changed_at", "id"))
+        assert results[0]["id"] == history[0].id
+        assert results[-1]["id"] == history[-1].id
+
+    def test_detail_nests_recent_history_only(self, auth_client, product):
+        self._history(product, [str(100 + i) for i in range(15)])
+        response = auth_client.get(reverse("product-detail", args=[product.id]))
+        assert len(response.data["price_history"]) == 10
+        assert response.data["price_history"][0]["price"] == "114.00"
+
+
 @pytest.mark.django_db
 class TestMovementAPI:
     def test_perform_in_movement(self, auth_client, product):
@@ -137,3 +223,240 @@ class TestMovementAPI:
         response = auth_client.post(url, data)
         assert response.status_code == status.HTTP_400_BAD_REQUEST
         assert "insuficiente" in response.data["error"]
+
+
+@pytest.mark.django_db
+class TestProductStatsAPI:
+    def test_stats(self, auth_client, product, user):
+        Product.objects.create(user=user, name="Mouse", price=50.00, stock=2)
+        url = reverse("product-stats")
+        response = auth_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["total_count"] == 2
+        assert response.data["total_stock"] == 12
+        assert float(response.data["total_value"]) == 1600.00
+
+    def test_stats_respects_filters(self, auth_client, product, category):
+        url = reverse("product-stats")
+        response = auth_client.get(url, {"search": "inexistente"})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["total_count"] == 0
+
+
+@pytest.mark.django_db
+class TestProductSearchAPI:
+    def test_search_uses_index_and_ranks(self, auth_client, user):
+        Product.objects.create(
+            user=user, name="Suporte", description="Para monitor", price=10, stock=1
+        )
+        Product.objects.create(user=user, name="Monitor", price=900, stock=1)
+        Product.objects.create(user=user, name="Cadeira", price=500, stock=1)
+
+        response = auth_client.get(reverse("product-list"), {"search": "monitor"})
+        assert response.status_code == status.HTTP_200_OK
+        assert [p["name"] for p in response.data] == ["Monitor", "Suporte"]
+
+    def test_search_with_explicit_ordering(self, auth_client, user):
+        Product.objects.create(
+            user=user, name="Suporte", description="Para monitor", price=10, stock=1
+        )
+        Product.objects.create(user=user, name="Monitor", price=900, stock=1)
+
+        response = auth_client.get(
+            reverse("product-list"), {"search": "monitor", "ordering": "price"}
+        )
+        assert [p["name"] for p in response.data] == ["Suporte", "Monitor"]
+
+    def test_fuzzy_search_mode(self, auth_client, user):
+        Product.objects.create(user=user, name="Monitor", price=900, stock=1)
+        Product.objects.create(user=user, name="Cadeira", price=500, stock=1)
+
+        response = auth_client.get(
+            reverse("product-list"), {"search": "monitr", "search_mode": "fuzzy"}
+        )
+        assert [p["name"] for p in response.data] == ["Monitor"]
+
+
+@pytest.mark.django_db
+class TestMovementBatchAPI:
+    def _post(self, client, movements, mode="atomic"):
+        return client.post(
+            reverse("movement-batch"),
+            {"mode": mode, "movements": movements},
+            format="json",
+        )
+
+    def test_atomic_batch_applies_all_lines(self, auth_client, user, product):
+        other = Product.objects.create(user=user, name="Mouse", price=50, stock=2)
+
+        response = self._post(
+            auth_client,
+            [
+                {"product": product.id, "type": "OUT", "quantity": 4},
+                {"product": other.id, "type": "IN", "quantity": 3, "reason": "PDV"},
+                {"product": product.id, "type": "OUT", "quantity": 6},
+            ],
+        )
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["applied"] == 3
+        assert [r["movement"]["balance_after"] for r in response.data["results"]] == [
+            6,
+            5,
+            0,
+        ]
+        product.refresh_from_db()
+        other.refresh_from_db()
+        assert (product.stock, other.stock) == (0, 5)
+
+    def test_atomic_batch_is_all_or_nothing(self, auth_client, product, other_user):
+        foreign = Product.objects.create(user=other_user, name="X", price=1, stock=5)
+
+        response = self._post(
+            auth_client,
+            [
+                {"product": product.id, "type": "OUT", "quantity": 4},
+                {"product": product.id, "type": "OUT", "quantity": 7},
+                {"product": foreign.id, "type": "IN", "quantity": 1},
+            ],
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert [r["status"] for r in response.data["results"]] == [
+            "skipped",
+            "error",
+            "error",
+        ]
+        product.refresh_from_db()
+        assert product.stock == 10
+        assert ProductMovement.objects.filter(product=product).count() == 1
+
+    def test_best_effort_applies_valid_lines(self, auth_client, product):
+        response = self._post(
+            auth_client,
+            [
+                {"product": product.id, "type": "OUT", "quantity": 4},
+                {"product": product.id, "type": "OUT", "quantity": 0},
+                {"product": product.id, "type": "OUT", "quantity": 7},
+                {"product": product.id, "type": "IN", "quantity": 1},
+            ],
+            mode="best_effort",
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [r["status"] for r in response.data["results"]] == [
+            "applied",
+            "error",
+            "error",
+            "applied",
+        ]
+        assert "quantity" in response.data["results"][1]["errors"]
+        product.refresh_from_db()
+        assert product.stock == 7
+
+    def test_batch_validates_products_in_one_query(
+        self, auth_client, user, django_assert_max_num_queries
+    ):
+        products = [
+            Product.objects.create(user=user, name=f"P{i}", price=1, stock=5)
+            for i in range(10)
+        ]
+        lines = [{"product": p.id, "type": "OUT", "quantity": 1} for p in products]
+
+        # Auth + SELECT ... FOR UPDATE + UPDATE + rollups + bulk_create
+        with django_assert_max_num_queries(10):
+            response = self._post(auth_client, lines)
+
+        assert response.status_code == status.HTTP_201_CREATED
+
+
+@pytest.mark.django_db
+class TestBulkPriceAPI:
+    def test_percent_on_filtered_category(self, auth_client, user, product):
+        other = Product.objects.create(user=user, name="Mouse", price=50, stock=2)
+
+        category_id = product.categories.get().pk
+        response = auth_client.post(
+            reverse("product-bulk-price") + f"?categories={category_id}",
+            {"mode": "percent", "value": "8"},
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["changed"] == 1
+        product.refresh_from_db()
+        other.refresh_from_db()
+        assert (product.price, other.price) == (Decimal("162.00"), Decimal("50.00"))
+        assert list(product.price_history.values_list("price", flat=True)) == [
+            Decimal("162.00"),
+            Decimal("150.00"),
+        ]
+
+    def test_ids_limit_to_own_products(self, auth_client, product, other_user):
+        foreign = Product.objects.create(user=other_user, name="X", price=10, stock=1)
+
+        response = auth_client.post(
+            reverse("product-bulk-price"),
+            {"mode": "set", "value": "99.90", "ids": [product.id, foreign.id]},
+            format="json",
+        )
+
+        assert response.data["changed"] == 1
+        foreign.refresh_from_db()
+        assert foreign.price == Decimal("10.00")
+
+    def test_invalid_reduction(self, auth_client, product):
+        response = auth_client.post(
+            reverse("product-bulk-price"),
+            {"mode": "percent", "value": "-100"},
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        product.refresh_from_db()
+        assert product.price == Decimal("150.00")
+
+
+@pytest.mark.django_db
+class TestInventoryCountAPI:
+    def test_count_sets_stock(self, auth_client, product):
+        response = auth_client.post(
+            reverse("movement-inventory-count"),
+            {"counts": [{"product": product.id, "counted": 3}]},
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["adjusted"] == 1
+        movement = response.data["movements"][0]
+        assert (movement["type"], movement["quantity"]) == ("OUT", 7)
+        assert movement["balance_after"] == 3
+        product.refresh_from_db()
+        assert product.stock == 3
+
+    def test_only_foreign_products_is_rejected(self, auth_client, other_user):
+        foreign = Product.objects.create(user=other_user, name="X", price=1, stock=5)
+
+        response = auth_client.post(
+            reverse("movement-inventory-count"),
+            {"counts": [{"product": foreign.id, "counted": 0}]},
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data["errors"][0]["product"] == foreign.id
+
+    def test_duplicate_products_are_rejected(self, auth_client, product):
+        response = auth_client.post(
+            reverse("movement-inventory-count"),
+            {
+                "counts": [
+                    {"product": product.id, "counted": 1},
+                    {"product": product.id, "counted": 2},
+                ]
+            },
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "counts" in response.data
@@ -1,13 +1,44 @@
 from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from django.db.models import Prefetch
 from django_filters.rest_framework import DjangoFilterBackend
-from products.models import Category, Product, ProductMovement
+from products.bulk import PriceAdjustmentError, adjust_prices
+from products.downsample import downsample
+from products.models import (
+    RECENT_PRICES,
+    Category,
+    PriceHistory,
+    Product,
+    ProductMovement,
+)
+from products.pagination import paginate_keyset
+from products.price_summary import (
+    daily_prices_between,
+    price_history_between,
+    use_daily_prices,
+)
+from products.queries import inventory_stats
+from products.stock import (
+    InsufficientStock,
+    apply_inventory_count,
+    record_movement,
+    record_movements,
+)
+from .filters import ProductSearchFilter
 from .serializers import (
     CategorySerializer,
     ProductSerializer,
     ProductDetailSerializer,
     ProductMovementSerializer,
+    MovementBatchSerializer,
+    MovementBatchLineSerializer,
+    BulkPriceSerializer,
+    InventoryCountSerializer,
+    PriceDailyRollupSerializer,
+    PriceHistoryQuerySerializer,
+    PriceHistorySerializer,
 )
 
 
@@ -36,7 +67,7 @@ class ProductViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [
         DjangoFilterBackend,
-        filters.SearchFilter,
+        ProductSearchFilter,
         filters.OrderingFilter,
     ]
     filterset_fields = ["is_public", "categories"]
@@ -44,7 +75,18 @@ class ProductViewSet(viewsets.ModelViewSet):
     ordering_fields = ["name", "price", "stock", "created_at"]
 
     def get_queryset(self):
-        return Product.objects.filter(user=self.request.user)
+        products = Product.objects.filter(user=self.request.user)
+        if self.action == "retrieve":
+            # Uma consulta com os últimos preços de cada produto (ROW_NUMBER)
+            recent = PriceHistory.objects.order_by("-changed_at", "-id")
+            products = products.prefetch_related(
+                Prefetch(
+                    "price_history",
+                    queryset=recent[:RECENT_PRICES],
+                    to_attr="recent_price_history",
+                )
+            )
+        return products
 
     def get_serializer_class(self):
         if self.action == "retrieve":
@@ -54,6 +96,98 @@ class ProductViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=["get"])
+    def stats(self, request):
+        """
+        Retorna as estatísticas de inventário dos produtos filtrados.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(inventory_stats(queryset))
+
+    @action(detail=False, methods=["post"], url_path="bulk-price")
+    def bulk_price(self, request):
+        """
+        Reajusta o preço de vários produtos com um único UPDATE.
+
+        `mode` é `percent` (ex: 8 para +8%), `amount` (soma ao preço) ou
+        `set` (novo preço). Vale para os produtos em `ids` ou, sem `ids`,
+        para todos os filtrados pela query string (ex: `?categories=3`).
+        """
+        payload = BulkPriceSerializer(data=request.data)
+        payload.is_valid(raise_exception=True)
+        queryset = self.filter_queryset(self.get_queryset())
+        if "ids" in payload.validated_data:
+            queryset = queryset.filter(pk__in=payload.validated_data["ids"])
+
+        try:
+            changed = adjust_prices(
+                queryset,
+                payload.validated_data["mode"],
+                payload.validated_data["value"],
+            )
+        except PriceAdjustmentError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"changed": changed})
+
+    @action(detail=True, methods=["get"], url_path="price-history")
+    def price_history(self, request, pk=None):
+        """
+        Histórico de preços do produto, filtrado por `start` e `end`
+        (AAAA-MM-DD). Períodos de mais de 90 dias (sem `start`, desde o
+        cadastro do produto) vêm agregados por dia, com abertura, máxima,
+        mínima e fechamento: `granularity` é `daily` em vez de `raw`.
+
+        A resposta é paginada por cursor (`page_size`, e `next` traz a URL
+        da próxima página). Com `points=N`, devolve no máximo N pontos do
+        período inteiro, escolhidos por LTTB, para gráficos de tamanho fixo.
+        """
+        product = self.get_object()
+        params = PriceHistoryQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        start = params.validated_data.get("start")
+        end = params.validated_data.get("end")
+
+        if use_daily_prices(product, start, end):
+            granularity, time_field, value_field = "daily", "day", "close"
+            rows = daily_prices_between(product, start, end)
+            serializer_class = PriceDailyRollupSerializer
+        else:
+            granularity, time_field, value_field = "raw", "changed_at", "price"
+            rows = price_history_between(product, start, end)
+            serializer_class = PriceHistorySerializer
+
+        if "points" in params.validated_data:
+            rows = downsample(
+                rows, time_field, value_field, params.validated_data["points"]
+            )
+            return Response(
+                {
+                    "granularity": granularity,
+                    "next": None,
+                    "results": serializer_class(rows, many=True).data,
+                }
+            )
+
+        page = paginate_keyset(
+            rows,
+            time_field,
+            time_field,
+            cursor=params.validated_data.get("cursor"),
+            page_size=params.validated_data["page_size"],
+        )
+        next_url = None
+        if page.has_next:
+            next_url = replace_query_param(
+                request.build_absolute_uri(), "cursor", page.next_cursor
+            )
+        return Response(
+            {
+                "granularity": granularity,
+                "next": next_url,
+                "results": serializer_class(page.items, many=True).data,
+            }
+        )
+
     @action(detail=True, methods=["post"])
     def movement(self, request, pk=None):
         """
@@ -63,26 +197,24 @@ class ProductViewSet(viewsets.ModelViewSet):
         serializer = ProductMovementSerializer(data=request.data)
 
         if serializer.is_valid():
-            movement_type = serializer.validated_data["type"]
-            quantity = serializer.validated_data["quantity"]
-
-            if movement_type == "OUT" and product.stock < quantity:
+            # UPDATE condicional do estoque + insert da movimentação, atômicos
+            try:
+                movement = record_movement(
+                    product,
+                    serializer.validated_data["type"],
+                    serializer.validated_data["quantity"],
+                    serializer.validated_data.get("reason", ""),
+                )
+            except InsufficientStock:
                 return Response(
                     {"error": "Estoque insuficiente para esta saída."},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            # Salva o movimento
-            serializer.save(product=product)
-
-            # Atualiza o estoque do produto manualmente para garantir consistência
-            if movement_type == "IN":
-                product.stock += quantity
-            else:
-                product.stock -= quantity
-            product.save()
-
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            return Response(
+                ProductMovementSerializer(movement).data,
+                status=status.HTTP_201_CREATED,
+            )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -99,3 +231,102 @@ class ProductMovementViewSet(viewsets.ReadOnlyModelViewSet):
 
     def get_queryset(self):
         return ProductMovement.objects.filter(product__user=self.request.user)
+
+    @action(detail=False, methods=["post"])
+    def batch(self, request):
+        """
+        Registra um lote de movimentações (integrações/PDV) numa transação.
+
+        `mode=atomic` (padrão) aplica tudo ou nada; `mode=best_effort`
+        aplica as linhas válidas. A resposta traz o resultado de cada linha,
+        na ordem recebida.
+        """
+        payload = MovementBatchSerializer(data=request.data)
+        payload.is_valid(raise_exception=True)
+        atomic = payload.validated_data["mode"] == "atomic"
+
+        results = [None] * len(payload.validated_data["movements"])
+        valid = []
+        for index, line in enumerate(payload.validated_data["movements"]):
+            serializer = MovementBatchLineSerializer(data=line)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results[index] = {
+                    "index": index,
+                    "status": "error",
+                    "errors": serializer.errors,
+                }
+
+        # No modo atômico, uma linha mal formada já cancela o lote
+        if valid and not (atomic and len(valid) < len(results)):
+            batch = record_movements(
+                request.user, [line for _, line in valid], atomic=atomic
+            )
+            for (index, _), line in zip(valid, batch.lines):
+                if not line.ok:
+                    results[index] = {
+                        "index": index,
+                        "status": "error",
+                        "errors": {"non_field_errors": [line.error]},
+                    }
+                elif batch.applied:
+                    results[index] = {
+                        "index": index,
+                        "status": "applied",
+                        "movement": ProductMovementSerializer(line.movement).data,
+                    }
+
+        # Linhas válidas que não foram gravadas porque o lote foi cancelado
+        for index, _ in valid:
+            if results[index] is None:
+                results[index] = {"index": index, "status": "skipped"}
+
+        applied_count = sum(r["status"] == "applied" for r in results)
+        failed_count = sum(r["status"] == "error" for r in results)
+        if not applied_count:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif failed_count:
+            response_status = status.HTTP_200_OK
+        else:
+            response_status = status.HTTP_201_CREATED
+        return Response(
+            {
+                "mode": payload.validated_data["mode"],
+                "applied": applied_count,
+                "failed": failed_count,
+                "results": results,
+            },
+            status=response_status,
+        )
+
+    @action(detail=False, methods=["post"], url_path="inventory-count")
+    def inventory_count(self, request):
+        """
+        Aplica uma contagem de inventário: `counts` traz o estoque contado de
+        cada produto e as diferenças viram movimentações de ajuste.
+        """
+        payload = InventoryCountSerializer(data=request.data)
+        payload.is_valid(raise_exception=True)
+        counts = {
+            line["product"]: line["counted"]
+            for line in payload.validated_data["counts"]
+        }
+        result = apply_inventory_count(
+            request.user, counts, reason=payload.validated_data["reason"]
+        )
+        applied = result.adjusted + result.unchanged
+        return Response(
+            {
+                "adjusted": result.adjusted,
+                "unchanged": result.unchanged,
+                "errors": [
+                    {"product": product_id, "error": message}
+                    for product_id, message in result.errors
+                ],
+                "movements": ProductMovementSerializer(
+                    result.movements, many=True
+                ).data,
+            },
+            status=status.HTTP_200_OK if applied else status.HTTP_400_BAD_REQUEST,
+        )
@@ -66,6 +66,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "products.instrumentation.ServerTimingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -199,3 +200,31 @@ SPECTACULAR_SETTINGS = {
     "VERSION": "1.0.0",
     "SERVE_INCLUDE_SCHEMA": False,
 }
+
+# --- Instrumentação por requisição (products/instrumentation.py) ---
+SERVER_TIMING_HEADER = os.environ.get("SERVER_TIMING_HEADER", "True") == "True"
+
+# --- Efeitos colaterais dos saves de Product (products/outbox.py) ---
+# "sync": histórico e índice de busca gravados na própria requisição;
+# "outbox": gravados depois pelo worker `manage.py run_outbox_worker`
+PRODUCT_SIDE_EFFECTS = os.environ.get("PRODUCT_SIDE_EFFECTS", "sync")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "products.timing": {
+            "handlers": ["console"],
+            "level": os.environ.get("TIMING_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
+        "products.outbox": {
+            "handlers": ["console"],
+            "level": "INFO",
+            "propagate": False,
+        },
+    },
+}
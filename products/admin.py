@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Product, Category, PriceHistory
+from .models import Product, Category, PriceHistory, OutboxEvent
 
 
 @admin.register(Product)
@@ -25,3 +25,23 @@ class PriceHistoryAdmin(admin.ModelAdmin):
     def has_add_permission(self, request):
         # Previne criação manual - apenas via signal
         return False
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ["topic", "product_id", "created_at", "processed_at", "attempts"]
+    list_filter = ["topic", "processed_at"]
+    search_fields = ["product_id"]
+    readonly_fields = [
+        "topic",
+        "product_id",
+        "payload",
+        "created_at",
+        "processed_at",
+        "attempts",
+        "last_error",
+    ]
+
+    def has_add_permission(self, request):
+        # Eventos só são gravados pelos signals de Product
+        return False
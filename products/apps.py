@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class ProductsConfig(AppConfig):
     name = 'products'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from .search import install_fuzzy_threshold
+
+        connection_created.connect(install_fuzzy_threshold)
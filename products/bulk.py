@@ -0,0 +1,233 @@
+"""
+Ações em massa sobre produtos feitas por conjunto, e não produto a produto.
+
+Os vínculos com categorias são gravados direto na tabela M2M
+(`Product.categories.through`): um `bulk_create(ignore_conflicts=True)` para
+vincular e um DELETE para desvincular, independentemente do número de
+produtos. Como a tabela intermediária não dispara signals, cada operação
+envia um único `m2m_changed` agregado por categoria (lado reverso, com o
+`pk_set` dos produtos realmente afetados), o mesmo que
+`category.products.add()/remove()` enviaria; assim os receivers de
+`products.models` (rollups por categoria) continuam consistentes.
+
+O reajuste de preços (`adjust_prices`) também é um único UPDATE; como ele
+não passa por `Product.save()`, o histórico de preços é gravado com um
+`bulk_create` (e o resumo de preços com um `bulk_update`) e os rollups
+recebem só a diferença de valor.
+
+A troca de visibilidade (`set_visibility`) é outro UPDATE, e os rollups
+recebem a contribuição dos produtos que mudaram de visibilidade.
+"""
+
+from decimal import Decimal
+
+from django.db import router, transaction
+from django.db.models import DecimalField, F, Value
+from django.db.models.functions import Greatest, Round
+from django.db.models.signals import m2m_changed
+from django.utils import timezone
+
+from .models import MAX_PRICE, Category, PriceHistory, Product
+from .price_summary import record_prices
+from .rollups import apply_price_changes, apply_visibility_changes
+
+ProductCategory = Product.categories.through
+
+
+def _notify(action, category, product_ids):
+    m2m_changed.send(
+        sender=ProductCategory,
+        action=action,
+        instance=category,
+        reverse=True,
+        model=Product,
+        pk_set=set(product_ids),
+        using=router.db_for_write(ProductCategory, instance=category),
+    )
+
+
+def _linked(category, product_ids):
+    return set(
+        ProductCategory.objects.filter(
+            category=category, product_id__in=product_ids
+        ).values_list("product_id", flat=True)
+    )
+
+
+def add_category(category, products):
+    """
+    Vincula `category` aos produtos do queryset `products`. Retorna o número
+    de vínculos criados (os já existentes são ignorados).
+    """
+    with transaction.atomic():
+        product_ids = set(products.values_list("pk", flat=True))
+        new_ids = product_ids - _linked(category, product_ids)
+        if not new_ids:
+            return 0
+        _notify("pre_add", category, new_ids)
+        ProductCategory.objects.bulk_create(
+            [
+                ProductCategory(product_id=product_id, category_id=category.pk)
+                for product_id in sorted(new_ids)
+            ],
+            ignore_conflicts=True,
+        )
+        _notify("post_add", category, new_ids)
+    return len(new_ids)
+
+
+def remove_category(category, products):
+    """Desvincula `category` dos produtos de `products`. Retorna o nº removido."""
+    with transaction.atomic():
+        linked = _linked(category, products.values("pk"))
+        if not linked:
+            return 0
+        _notify("pre_remove", category, linked)
+        ProductCategory.objects.filter(
+            category=category, product_id__in=linked
+        ).delete()
+        _notify("post_remove", category, linked)
+    return len(linked)
+
+
+def replace_categories(category, products):
+    """
+    Deixa `category` como única categoria dos produtos de `products`: remove
+    os demais vínculos com um único DELETE e vincula a categoria. Retorna
+    (vínculos removidos, vínculos criados).
+    """
+    with transaction.atomic():
+        others = ProductCategory.objects.filter(
+            product_id__in=products.values("pk")
+        ).exclude(category=category)
+        removed = {}
+        for category_id, product_id in others.values_list("category_id", "product_id"):
+            removed.setdefault(category_id, set()).add(product_id)
+
+        affected = Category.objects.in_bulk(removed)
+        for category_id, product_ids in removed.items():
+            _notify("pre_remove", affected[category_id], product_ids)
+        others.delete()
+        for category_id, product_ids in removed.items():
+            _notify("post_remove", affected[category_id], product_ids)
+
+        added = add_category(category, products)
+    return sum(len(ids) for ids in removed.values()), added
+
+
+PRICE_ADJUSTMENTS = {
+    "percent": "Percentual (%)",
+    "amount": "Valor fixo (R$)",
+    "set": "Novo preço (R$)",
+}
+
+
+class PriceAdjustmentError(ValueError):
+    """Reajuste de preço inválido."""
+
+
+def _price_expression(mode, value):
+    price = DecimalField(max_digits=10, decimal_places=2)
+    if mode == "percent":
+        if value <= -100:
+            raise PriceAdjustmentError("A redução não pode ser de 100% ou mais.")
+        factor = Value(1 + value / 100, output_field=DecimalField())
+        return Round(F("price") * factor, 2, output_field=price)
+    if mode == "amount":
+        # Reduções maiores que o preço zeram o produto em vez de negativá-lo
+        return Greatest(
+            F("price") + Value(value, output_field=price),
+            Value(Decimal("0.00"), output_field=price),
+            output_field=price,
+        )
+    if mode == "set":
+        if value < 0:
+            raise PriceAdjustmentError("O preço não pode ser negativo.")
+        return Value(value, output_field=price)
+    raise PriceAdjustmentError(f"Tipo de reajuste inválido: {mode}")
+
+
+def _adjusted(price, mode, value):
+    if mode == "percent":
+        return price * (1 + value / 100)
+    if mode == "amount":
+        return price + value
+    return value
+
+
+def adjust_prices(products, mode, value):
+    """
+    Reajusta os preços dos produtos de `products`: `mode="percent"` aplica
+    `value`% (ex: 8 ou -10), `"amount"` soma `value` ao preço e `"set"`
+    define `value` como novo preço. Um UPDATE para todos os produtos e um
+    `bulk_create` para o histórico dos que mudaram de preço. Retorna o
+    número de produtos com preço alterado.
+    """
+    value = Decimal(str(value))
+    expression = _price_expression(mode, value)
+    with transaction.atomic():
+        # Trava as linhas e guarda o estado anterior (histórico e rollups).
+        # O filtro por pk evita FOR UPDATE com DISTINCT/joins de `products`
+        states = {
+            row["pk"]: row
+            for row in Product.objects.filter(pk__in=products.values("pk"))
+            .select_for_update()
+            .values(
+                "pk",
+                "user_id",
+                "is_public",
+                "price",
+                "stock",
+                *Product.PRICE_SUMMARY_FIELDS,
+            )
+        }
+        if not states:
+            return 0
+        highest = max(state["price"] for state in states.values())
+        if _adjusted(highest, mode, value) > MAX_PRICE:
+            raise PriceAdjustmentError("O reajuste excede o preço máximo permitido.")
+
+        rows = Product.objects.filter(pk__in=states)
+        rows.update(price=expression, updated_at=timezone.now())
+
+        # O arredondamento é do banco: relê os preços gravados
+        prices = {
+            pk: price
+            for pk, price in rows.values_list("pk", "price")
+            if price != states[pk]["price"]
+        }
+        if not prices:
+            return 0
+        history = PriceHistory.objects.bulk_create(
+            [
+                PriceHistory(product_id=pk, price=price)
+                for pk, price in sorted(prices.items())
+            ]
+        )
+        record_prices(states, history)
+        apply_price_changes(states, prices)
+    return len(prices)
+
+
+def set_visibility(products, is_public):
+    """
+    Marca os produtos de `products` como públicos ou privados com um único
+    UPDATE, na mesma transação que aplica a diferença aos rollups. Retorna o
+    número de produtos que mudaram de visibilidade.
+    """
+    with transaction.atomic():
+        # Trava as linhas que vão mudar e guarda o estado usado nos rollups
+        states = {
+            row["pk"]: row
+            for row in Product.objects.filter(pk__in=products.values("pk"))
+            .exclude(is_public=is_public)
+            .select_for_update()
+            .values("pk", "user_id", "is_public", "price", "stock")
+        }
+        if not states:
+            return 0
+        Product.objects.filter(pk__in=states).update(
+            is_public=is_public, updated_at=timezone.now()
+        )
+        apply_visibility_changes(states, is_public)
+    return len(states)
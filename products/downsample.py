@@ -0,0 +1,65 @@
+"""
+Redução de séries temporais para gráficos (Largest-Triangle-Three-Buckets).
+
+O LTTB escolhe, de cada faixa da série, o ponto que forma o maior triângulo
+com o ponto escolhido na faixa anterior e a média da faixa seguinte. Assim
+picos e vales continuam visíveis com um número fixo de pontos, ao contrário
+de amostrar a cada N registros ou tirar médias.
+"""
+
+from datetime import date, datetime
+
+
+def lttb(points, threshold):
+    """
+    Índices dos `threshold` pontos escolhidos de `points` (pares x, y em
+    ordem crescente de x). O primeiro e o último ponto são sempre mantidos;
+    séries que já cabem no limite voltam inteiras.
+    """
+    size = len(points)
+    if threshold >= size or threshold < 3:
+        return list(range(size))
+
+    every = (size - 2) / (threshold - 2)
+    selected = [0]
+    previous = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * every) + 1
+        end = int((bucket + 1) * every) + 1
+        # Média da faixa seguinte (na última faixa, o último ponto)
+        next_end = min(int((bucket + 2) * every) + 1, size)
+        following = points[end:next_end]
+        avg_x = sum(x for x, _ in following) / len(following)
+        avg_y = sum(y for _, y in following) / len(following)
+
+        ax, ay = points[previous]
+        best, best_area = start, -1.0
+        for index in range(start, end):
+            x, y = points[index]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = index, area
+        selected.append(best)
+        previous = best
+    selected.append(size - 1)
+    return selected
+
+
+def _x(value):
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, date):
+        return float(value.toordinal())
+    return float(value)
+
+
+def downsample(queryset, time_field, value_field, threshold):
+    """
+    Linhas de `queryset` escolhidas pelo LTTB sobre (`time_field`,
+    `value_field`), em ordem cronológica. Só (pk, tempo, valor) são lidos da
+    série inteira; as linhas completas vêm numa segunda consulta.
+    """
+    ordered = queryset.order_by(time_field, "pk")
+    series = list(ordered.values_list("pk", time_field, value_field))
+    chosen = lttb([(_x(t), float(v)) for _, t, v in series], threshold)
+    return list(ordered.filter(pk__in=[series[index][0] for index in chosen]))
@@ -0,0 +1,147 @@
+"""
+Exportação em streaming (CSV ou JSONL) de produtos, histórico de preços e
+movimentações.
+
+As linhas são geradas sob demanda: os querysets são percorridos com
+`iterator(chunk_size=...)` (cursor do lado do servidor no PostgreSQL) e cada
+linha é serializada e entregue antes de a próxima ser lida, então a memória
+fica constante qualquer que seja o tamanho da conta. As views entregam o
+gerador num `StreamingHttpResponse`; o comando `export_products` o escreve
+num arquivo.
+
+O CSV de produtos usa as mesmas colunas do importador (`products.importer`),
+com as categorias separadas por "|", para que a exportação possa ser
+reimportada.
+"""
+
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from .importer import CATEGORY_SEPARATOR
+from .models import Category
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "jsonl": ("application/x-ndjson; charset=utf-8", "jsonl"),
+}
+EXPORT_CHUNK_SIZE = 2000
+
+PRODUCT_COLUMNS = (
+    "id",
+    "name",
+    "description",
+    "price",
+    "stock",
+    "is_public",
+    "categories",
+    "created_at",
+    "updated_at",
+)
+PRICE_HISTORY_COLUMNS = ("id", "product_id", "product", "price", "changed_at")
+MOVEMENT_COLUMNS = (
+    "id",
+    "product_id",
+    "product",
+    "type",
+    "quantity",
+    "balance_after",
+    "reason",
+    "moved_at",
+)
+
+
+def product_rows(products, chunk_size=EXPORT_CHUNK_SIZE):
+    # Com iterator(chunk_size), o prefetch das categorias é feito por lote
+    products = products.prefetch_related(
+        Prefetch("categories", queryset=Category.objects.only("name").order_by("name"))
+    )
+    for product in products.iterator(chunk_size=chunk_size):
+        yield {
+            "id": product.pk,
+            "name": product.name,
+            "description": product.description,
+            "price": product.price,
+            "stock": product.stock,
+            "is_public": product.is_public,
+            "categories": [category.name for category in product.categories.all()],
+            "created_at": product.created_at,
+            "updated_at": product.updated_at,
+        }
+
+
+def price_history_rows(history, chunk_size=EXPORT_CHUNK_SIZE):
+    for row in history.values_list(
+        "id", "product_id", "product__name", "price", "changed_at"
+    ).iterator(chunk_size=chunk_size):
+        yield dict(zip(PRICE_HISTORY_COLUMNS, row))
+
+
+def movement_rows(movements, chunk_size=EXPORT_CHUNK_SIZE):
+    for row in movements.values_list(
+        "id",
+        "product_id",
+        "product__name",
+        "type",
+        "quantity",
+        "balance_after",
+        "reason",
+        "moved_at",
+    ).iterator(chunk_size=chunk_size):
+        yield dict(zip(MOVEMENT_COLUMNS, row))
+
+
+class _Echo:
+    """Pseudo-arquivo: o csv.writer devolve a linha em vez de guardá-la."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, list):
+        return CATEGORY_SEPARATOR.join(value)
+    if value is None:
+        return ""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def stream_csv(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_csv_value(row[column]) for column in columns])
+
+
+def stream_jsonl(columns, rows):
+    for row in rows:
+        yield json.dumps(
+            {column: row[column] for column in columns},
+            cls=DjangoJSONEncoder,
+            ensure_ascii=False,
+        ) + "\n"
+
+
+EXPORTS = {
+    "products": (PRODUCT_COLUMNS, product_rows),
+    "price_history": (PRICE_HISTORY_COLUMNS, price_history_rows),
+    "movements": (MOVEMENT_COLUMNS, movement_rows),
+}
+
+
+def export_lines(kind, queryset, fmt="csv", chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Gera as linhas (str) da exportação `kind` ("products", "price_history"
+    ou "movements") de `queryset` no formato `fmt` ("csv" ou "jsonl").
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportação inválido: {fmt}")
+    columns, rows = EXPORTS[kind]
+    stream = stream_jsonl if fmt == "jsonl" else stream_csv
+    return stream(columns, rows(queryset, chunk_size=chunk_size))
@@ -1,6 +1,7 @@
 from django import forms
 from decimal import Decimal, InvalidOperation as DecimalException
-from .models import Product, Category, ProductMovement
+from .bulk import PRICE_ADJUSTMENTS
+from .models import Product, Category, ProductMovement, parse_decimal
 
 
 class CategoryForm(forms.ModelForm):
@@ -113,3 +114,39 @@ class MovementForm(forms.ModelForm):
         if quantity is None or quantity <= 0:
             raise forms.ValidationError("A quantidade deve ser maior que zero.")
         return quantity
+
+
+class ProductImportForm(forms.Form):
+    file = forms.FileField(
+        label="Arquivo CSV",
+        widget=forms.ClearableFileInput(attrs={"class": "input w-full", "accept": ".csv"}),
+    )
+
+
+class BulkPriceForm(forms.Form):
+    price_mode = forms.ChoiceField(choices=list(PRICE_ADJUSTMENTS.items()))
+    price_value = forms.CharField()
+
+    def clean_price_value(self):
+        try:
+            return parse_decimal(self.cleaned_data["price_value"])
+        except ValueError:
+            raise forms.ValidationError("Informe um valor válido (ex: 8 ou -5,50).")
+
+
+class InventoryCountForm(forms.Form):
+    file = forms.FileField(
+        label="Arquivo CSV",
+        required=False,
+        widget=forms.ClearableFileInput(attrs={"class": "input w-full", "accept": ".csv"}),
+    )
+    reason = forms.CharField(
+        required=False,
+        max_length=255,
+        widget=forms.TextInput(
+            attrs={
+                "class": "input w-full",
+                "placeholder": ProductMovement.ADJUSTMENT_REASON,
+            }
+        ),
+    )
@@ -0,0 +1,366 @@
+"""
+Importação de produtos em massa a partir de CSV.
+
+O arquivo é lido em streaming e processado em lotes (`chunk_size` linhas):
+cada lote é validado e gravado numa transação própria com `bulk_create`,
+então a memória fica constante e um lote com erro de banco não desfaz os
+anteriores. A validação das linhas pode rodar em paralelo em processos
+(`workers`), enquanto o processo principal grava os lotes já validados.
+
+Como `bulk_create` não dispara os signals de Product, o importador grava
+ele mesmo o que os signals gravariam: o registro inicial de preço
+(PriceHistory e o resumo de preços do produto), a entrada inicial de estoque (ProductMovement, com o saldo
+do livro), os vínculos com categorias, o índice de busca e os rollups.
+
+Colunas aceitas (cabeçalho em inglês ou português; só `name` é obrigatória):
+
+    name;description;price;stock;is_public;categories
+    Caneca;Caneca de cerâmica;39,90;12;sim;Utensilios|Nacionais
+
+Preços aceitam "1.234,56" ou "1234.56"; categorias são separadas por "|" e
+procuradas pelo nome ou slug entre as do usuário (as inexistentes são
+criadas). O separador (vírgula ou ponto e vírgula) é detectado pelo
+cabeçalho.
+"""
+
+import csv
+import itertools
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.db import DatabaseError, transaction
+from django.utils.text import slugify
+
+from .models import (
+    MAX_PRICE,
+    Category,
+    PriceHistory,
+    Product,
+    ProductMovement,
+    parse_decimal,
+)
+from .price_summary import EMPTY_SUMMARY, record_prices
+from .rollups import apply_products_created
+from .search import index_products
+
+ProductCategory = Product.categories.through
+
+DEFAULT_CHUNK_SIZE = 1000
+CATEGORY_SEPARATOR = "|"
+
+# Erros guardados no resultado (os demais só entram na contagem)
+MAX_REPORTED_ERRORS = 1000
+
+COLUMN_ALIASES = {
+    "nome": "name",
+    "descricao": "description",
+    "descrição": "description",
+    "preco": "price",
+    "preço": "price",
+    "estoque": "stock",
+    "publico": "is_public",
+    "público": "is_public",
+    "categorias": "categories",
+}
+TRUE_VALUES = {"1", "true", "t", "yes", "y", "sim", "s", "x", "publico", "público"}
+FALSE_VALUES = {"", "0", "false", "f", "no", "n", "nao", "não", "privado"}
+
+NAME_MAX_LENGTH = Product._meta.get_field("name").max_length
+CATEGORY_NAME_MAX_LENGTH = Category._meta.get_field("name").max_length
+
+
+class CSVImportError(Exception):
+    """Arquivo que não pode ser importado (cabeçalho inválido, encoding...)."""
+
+
+@dataclass
+class RowError:
+    line: int
+    message: str
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    created: int = 0
+    failed: int = 0
+    errors: list = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def add_error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(RowError(line, message))
+
+
+def parse_price(value):
+    value = (value or "").strip()
+    if not value:
+        raise ValueError("Preço obrigatório.")
+    try:
+        price = parse_decimal(value)
+    except ValueError:
+        raise ValueError(f"Preço inválido: {value!r} (ex: 55,99).")
+    if price < 0 or price > MAX_PRICE:
+        raise ValueError(f"Preço fora do intervalo permitido: {value}.")
+    return price.quantize(Decimal("0.01"))
+
+
+def parse_stock(value):
+    value = (value or "").strip()
+    if not value:
+        return 0
+    try:
+        stock = int(value)
+    except ValueError:
+        raise ValueError(f"Estoque inválido: {value!r}.")
+    if stock < 0:
+        raise ValueError("O estoque não pode ser menor que zero.")
+    return stock
+
+
+def parse_bool(value):
+    value = (value or "").strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f"Valor inválido para is_public: {value!r}.")
+
+
+def parse_row(row):
+    """Valida uma linha (dict com as colunas normalizadas). Levanta ValueError."""
+    name = (row.get("name") or "").strip()
+    if not name:
+        raise ValueError("Nome obrigatório.")
+    if len(name) > NAME_MAX_LENGTH:
+        raise ValueError(f"Nome com mais de {NAME_MAX_LENGTH} caracteres.")
+    categories = []
+    for category in (row.get("categories") or "").split(CATEGORY_SEPARATOR):
+        category = category.strip()
+        if not category:
+            continue
+        if len(category) > CATEGORY_NAME_MAX_LENGTH or not slugify(category):
+            raise ValueError(f"Categoria inválida: {category!r}.")
+        if category not in categories:
+            categories.append(category)
+    return {
+        "name": name,
+        "description": (row.get("description") or "").strip(),
+        "price": parse_price(row.get("price")),
+        "stock": parse_stock(row.get("stock")),
+        "is_public": parse_bool(row.get("is_public")),
+        "categories": categories,
+    }
+
+
+def parse_chunk(chunk):
+    """
+    Valida um lote de (linha, dict). Retorna (linha, dados, erro) para cada
+    linha. Roda nos processos de `workers`, por isso não acessa o banco.
+    """
+    parsed = []
+    for line, row in chunk:
+        try:
+            parsed.append((line, parse_row(row), None))
+        except ValueError as exc:
+            parsed.append((line, None, str(exc)))
+    return parsed
+
+
+def _normalize_header(name):
+    name = (name or "").strip().lower()
+    return COLUMN_ALIASES.get(name, name)
+
+
+def read_chunks(stream, chunk_size=DEFAULT_CHUNK_SIZE, delimiter=None):
+    """
+    Lê `stream` (arquivo de texto) e gera lotes de até `chunk_size` pares
+    (nº da linha no arquivo, dict da linha).
+    """
+    header = stream.readline()
+    if not header.strip():
+        raise CSVImportError("Arquivo vazio.")
+    if delimiter is None:
+        delimiter = ";" if header.count(";") > header.count(",") else ","
+
+    reader = csv.reader(itertools.chain([header], stream), delimiter=delimiter)
+    columns = [_normalize_header(name) for name in next(reader)]
+    if "name" not in columns:
+        raise CSVImportError("O cabeçalho precisa ter a coluna 'name' (ou 'nome').")
+    if "price" not in columns:
+        raise CSVImportError("O cabeçalho precisa ter a coluna 'price' (ou 'preço').")
+
+    chunk = []
+    for values in reader:
+        if not any(value.strip() for value in values):
+            continue
+        chunk.append((reader.line_num, dict(zip(columns, values))))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _parsed_chunks(chunks, workers):
+    if workers <= 1:
+        for chunk in chunks:
+            yield parse_chunk(chunk)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Poucos lotes em voo por vez, para a leitura não ir muito à frente
+        # da gravação e a memória continuar limitada
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(parse_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class CategoryResolver:
+    """Resolve nomes/slugs de categoria do usuário, criando as que faltam."""
+
+    def __init__(self, user):
+        self.user = user
+        self.reload()
+
+    def reload(self):
+        self.ids = {}
+        for pk, name, slug in Category.objects.filter(user=self.user).values_list(
+            "pk", "name", "slug"
+        ):
+            self.ids.setdefault(slug, pk)
+            self.ids.setdefault(name.lower(), pk)
+
+    def _key(self, name):
+        return name.lower() if name.lower() in self.ids else slugify(name)
+
+    def resolve(self, rows):
+        """Garante que as categorias de `rows` existem (cria em lote)."""
+        missing = {}
+        for row in rows:
+            for name in row["categories"]:
+                key = self._key(name)
+                if key not in self.ids:
+                    missing.setdefault(key, name)
+        if missing:
+            Category.objects.bulk_create(
+                [
+                    Category(
+                        user=self.user,
+                        name=name,
+                        slug=slug,
+                        description="Criada na importação de produtos",
+                    )
+                    for slug, name in missing.items()
+                ]
+            )
+            self.reload()
+
+    def category_ids(self, row):
+        return sorted({self.ids[self._key(name)] for name in row["categories"]})
+
+
+def write_chunk(user, rows, categories):
+    """
+    Grava um lote de linhas validadas numa transação: produtos, histórico
+    de preço, entrada inicial de estoque, categorias, busca e rollups.
+    Retorna o número de produtos criados.
+    """
+    with transaction.atomic():
+        categories.resolve(rows)
+        products = Product.objects.bulk_create(
+            [
+                Product(
+                    user=user,
+                    name=row["name"],
+                    description=row["description"],
+                    price=row["price"],
+                    stock=row["stock"],
+                    is_public=row["is_public"],
+                )
+                for row in rows
+            ]
+        )
+        links = [categories.category_ids(row) for row in rows]
+
+        history = PriceHistory.objects.bulk_create(
+            [PriceHistory(product=product, price=product.price) for product in products]
+        )
+        record_prices({product.pk: EMPTY_SUMMARY for product in products}, history)
+        ProductMovement.objects.bulk_create(
+            [
+                ProductMovement(
+                    product=product,
+                    type="IN",
+                    quantity=product.stock,
+                    reason=ProductMovement.INITIAL_REASON,
+                    balance_after=product.stock,
+                )
+                for product in products
+                if product.stock > 0
+            ]
+        )
+        ProductCategory.objects.bulk_create(
+            [
+                ProductCategory(product_id=product.pk, category_id=category_id)
+                for product, category_ids in zip(products, links)
+                for category_id in category_ids
+            ]
+        )
+        index_products([product.pk for product in products])
+        apply_products_created(zip(products, links))
+    return len(products)
+
+
+def import_products(
+    user,
+    stream,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    workers=1,
+    delimiter=None,
+    progress=None,
+):
+    """
+    Importa os produtos do CSV `stream` para `user`. Linhas inválidas são
+    puladas e reportadas em `ImportResult.errors`; `progress`, se informado,
+    é chamado com o resultado parcial após cada lote gravado.
+    """
+    result = ImportResult()
+    categories = CategoryResolver(user)
+    start = time.perf_counter()
+
+    chunks = read_chunks(stream, chunk_size=chunk_size, delimiter=delimiter)
+    for parsed in _parsed_chunks(chunks, workers):
+        rows, lines = [], []
+        for line, data, error in parsed:
+            result.rows += 1
+            if error:
+                result.add_error(line, error)
+            else:
+                rows.append(data)
+                lines.append(line)
+        if rows:
+            try:
+                result.created += write_chunk(user, rows, categories)
+            except DatabaseError as exc:
+                # O lote foi desfeito; as categorias criadas nele também
+                categories.reload()
+                for line in lines:
+                    result.add_error(line, f"Erro ao gravar o lote: {exc}")
+        result.elapsed = time.perf_counter() - start
+        if progress:
+            progress(result)
+
+    result.elapsed = time.perf_counter() - start
+    return result
@@ -0,0 +1,76 @@
+"""
+Livro de movimentações de estoque (ProductMovement.balance_after).
+
+Cada movimentação guarda o saldo do produto logo após ela, gravado no
+insert (ver `ProductMovement.save`), então o saldo atual é a última linha e
+não a soma do histórico. `backfill_balances` preenche/corrige o saldo dos
+registros existentes e `verify_ledger` compara o saldo com `Product.stock`;
+ambos são usados pelo comando `backfill_movement_balances`.
+"""
+
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, When
+from django.db.models.functions import Coalesce
+from django.db.models.expressions import Window
+
+from .models import Product, ProductMovement
+
+SIGNED_QUANTITY = Case(
+    When(type="IN", then=F("quantity")),
+    default=-F("quantity"),
+    output_field=IntegerField(),
+)
+
+
+def backfill_balances(product_ids=None, batch_size=1000):
+    """
+    Recalcula o saldo acumulado de cada movimentação com uma window function
+    e grava apenas as linhas divergentes. Retorna o número de linhas gravadas.
+    """
+    movements = ProductMovement.objects.all()
+    if product_ids is not None:
+        movements = movements.filter(product_id__in=product_ids)
+    rows = movements.annotate(
+        running_balance=Window(
+            Sum(SIGNED_QUANTITY),
+            partition_by=[F("product_id")],
+            order_by=[F("moved_at").asc(), F("id").asc()],
+        )
+    ).only("id", "balance_after")
+
+    updated = 0
+    pending = []
+    for movement in rows.iterator(chunk_size=batch_size):
+        if movement.balance_after != movement.running_balance:
+            movement.balance_after = movement.running_balance
+            pending.append(movement)
+        if len(pending) >= batch_size:
+            ProductMovement.objects.bulk_update(pending, ["balance_after"])
+            updated += len(pending)
+            pending = []
+    if pending:
+        ProductMovement.objects.bulk_update(pending, ["balance_after"])
+        updated += len(pending)
+    return updated
+
+
+def verify_ledger(product_ids=None):
+    """
+    Lista os produtos cujo estoque difere do saldo da última movimentação,
+    como (product_id, stock, saldo).
+    """
+    last_balance = (
+        ProductMovement.objects.filter(product_id=OuterRef("pk"))
+        .order_by("-moved_at", "-id")
+        .values("balance_after")[:1]
+    )
+    products = Product.objects.annotate(
+        ledger_balance=Coalesce(Subquery(last_balance), 0)
+    )
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+    return [
+        (pk, stock, balance)
+        for pk, stock, balance in products.exclude(
+            stock=F("ledger_balance")
+        ).values_list("pk", "stock", "ledger_balance")
+    ]
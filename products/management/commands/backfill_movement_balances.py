@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from products.ledger import backfill_balances, verify_ledger
+
+
+class Command(BaseCommand):
+    help = "Preenche o saldo (balance_after) das movimentações de estoque existentes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Apenas compara o estoque dos produtos com o saldo do livro",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Linhas gravadas por lote (padrão: 1000)",
+        )
+
+    def handle(self, *args, **options):
+        if options["verify"]:
+            mismatches = verify_ledger()
+            for product_id, stock, balance in mismatches:
+                self.stdout.write(
+                    self.style.ERROR(
+                        f"✗ produto={product_id}: estoque {stock}, saldo do livro {balance}"
+                    )
+                )
+            if mismatches:
+                raise CommandError(
+                    f"{len(mismatches)} produtos com saldo divergente do estoque."
+                )
+            self.stdout.write(self.style.SUCCESS("✅ Livro de movimentações consistente."))
+            return
+
+        self.stdout.write(self.style.WARNING("Calculando saldos das movimentações..."))
+        count = backfill_balances(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Saldos preenchidos! {count} movimentações atualizadas.")
+        )
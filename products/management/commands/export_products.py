@@ -0,0 +1,76 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from products.exporter import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, EXPORTS, export_lines
+from products.models import PriceHistory, Product, ProductMovement
+from products.search import search_products
+
+
+class Command(BaseCommand):
+    help = "Exporta produtos, histórico de preços ou movimentações (CSV ou JSONL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(EXPORTS), help="O que exportar")
+        parser.add_argument(
+            "--format", choices=sorted(EXPORT_FORMATS), default="csv", dest="fmt"
+        )
+        parser.add_argument(
+            "--output", "-o", help="Arquivo de saída (padrão: saída padrão)"
+        )
+        parser.add_argument("--user", help="Apenas os produtos deste usuário")
+        parser.add_argument("--q", help="Apenas produtos que casam com a busca")
+        parser.add_argument("--category", type=int, help="Apenas desta categoria")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help=f"Linhas lidas por lote (padrão: {EXPORT_CHUNK_SIZE})",
+        )
+
+    def _products(self, options):
+        products = Product.objects.all()
+        if options["user"]:
+            try:
+                user = User.objects.get(username=options["user"])
+            except User.DoesNotExist:
+                raise CommandError(f"Usuário '{options['user']}' não encontrado.")
+            products = products.filter(user=user)
+        if options["q"]:
+            products = search_products(products, options["q"])
+        if options["category"]:
+            products = products.filter(categories__id=options["category"])
+        return products
+
+    def handle(self, *args, **options):
+        products = self._products(options)
+        kind = options["kind"]
+        if kind == "products":
+            queryset = products.distinct().order_by("pk")
+        elif kind == "price_history":
+            queryset = PriceHistory.objects.filter(product__in=products).order_by(
+                "product_id", "changed_at", "id"
+            )
+        else:
+            queryset = ProductMovement.objects.filter(product__in=products).order_by(
+                "moved_at", "id"
+            )
+
+        lines = export_lines(
+            kind, queryset, options["fmt"], chunk_size=options["chunk_size"]
+        )
+        if not options["output"]:
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+
+        count = 0
+        with open(options["output"], "w", encoding="utf-8", newline="") as output:
+            for line in lines:
+                output.write(line)
+                count += 1
+        if options["fmt"] == "csv":
+            count -= 1  # cabeçalho
+        self.stderr.write(
+            self.style.SUCCESS(
+                f"✅ Exportação concluída! {count} linhas gravadas em {options['output']}."
+            )
+        )
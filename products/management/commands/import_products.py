@@ -0,0 +1,75 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from products.importer import DEFAULT_CHUNK_SIZE, CSVImportError, import_products
+
+
+class Command(BaseCommand):
+    help = "Importa produtos em massa a partir de um arquivo CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Caminho do arquivo CSV")
+        parser.add_argument(
+            "--user", required=True, help="Usuário dono dos produtos importados"
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f"Linhas gravadas por lote (padrão: {DEFAULT_CHUNK_SIZE})",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Processos para validar as linhas em paralelo (padrão: 1)",
+        )
+        parser.add_argument(
+            "--delimiter", help="Separador das colunas (padrão: detectado)"
+        )
+        parser.add_argument(
+            "--encoding", default="utf-8-sig", help="Encoding do arquivo"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"Usuário '{options['user']}' não encontrado.")
+
+        def progress(result):
+            self.stdout.write(
+                f"  {result.rows} linhas lidas, {result.created} produtos criados "
+                f"({result.rows_per_second:.0f} linhas/s)"
+            )
+
+        self.stdout.write(self.style.WARNING(f"Importando {options['path']}..."))
+        try:
+            with open(
+                options["path"], encoding=options["encoding"], newline=""
+            ) as stream:
+                result = import_products(
+                    user,
+                    stream,
+                    chunk_size=options["chunk_size"],
+                    workers=options["workers"],
+                    delimiter=options["delimiter"],
+                    progress=progress,
+                )
+        except (OSError, UnicodeDecodeError, CSVImportError) as exc:
+            raise CommandError(f"Não foi possível importar o arquivo: {exc}")
+
+        for error in result.errors:
+            self.stdout.write(self.style.ERROR(f"✗ linha {error.line}: {error.message}"))
+        if result.failed > len(result.errors):
+            self.stdout.write(
+                self.style.ERROR(
+                    f"... e mais {result.failed - len(result.errors)} linhas com erro."
+                )
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Importação concluída! {result.created} produtos criados, "
+                f"{result.failed} linhas com erro, em {result.elapsed:.1f}s "
+                f"({result.rows_per_second:.0f} linhas/s)."
+            )
+        )
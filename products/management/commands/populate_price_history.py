@@ -1,33 +1,84 @@
-from django.core.management.base import BaseCommand
-from products.models import Product, PriceHistory
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from products.price_summary import (
+    REBUILD_CHUNK_SIZE,
+    populate_missing_history,
+    products_without_history,
+)
+
+PROGRESS_WIDTH = 30
 
 
 class Command(BaseCommand):
     help = "Popula o histórico de preços para produtos existentes"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=REBUILD_CHUNK_SIZE,
+            help=f"Produtos por lote/transação (padrão: {REBUILD_CHUNK_SIZE})",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Apenas conta os produtos sem histórico, sem gravar nada",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            help=(
+                "Arquivo com o último produto processado: retoma dele se existir, "
+                "é atualizado a cada lote e removido ao final"
+            ),
+        )
+
+    def _read_checkpoint(self, checkpoint):
+        if checkpoint is None or not checkpoint.exists():
+            return 0
+        try:
+            return int(checkpoint.read_text().strip())
+        except ValueError:
+            raise CommandError(f"Checkpoint inválido: {checkpoint}")
+
+    def _progress(self, done, total):
+        done = min(done, total)
+        filled = PROGRESS_WIDTH * done // total if total else PROGRESS_WIDTH
+        percent = 100 * done // total if total else 100
+        bar = "#" * filled + "." * (PROGRESS_WIDTH - filled)
+        # No terminal a barra é reescrita na mesma linha
+        ending = "\r" if self.stdout.isatty() else "\n"
+        self.stdout.write(f"[{bar}] {percent}% ({done}/{total})", ending=ending)
+
     def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size deve ser maior que zero.")
+        checkpoint = Path(options["checkpoint"]) if options["checkpoint"] else None
+        after = self._read_checkpoint(checkpoint)
+        if after:
+            self.stdout.write(f"Retomando após o produto {after}.")
+
+        total = products_without_history().filter(pk__gt=after).count()
+        if options["dry_run"]:
+            self.stdout.write(f"{total} produtos sem histórico de preços.")
+            return
+
         self.stdout.write(
             self.style.WARNING("Iniciando migração de histórico de preços...")
         )
-
         created_count = 0
-        skipped_count = 0
-
-        for product in Product.objects.all():
-            if not product.price_history.exists():
-                PriceHistory.objects.create(product=product, price=product.price)
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f"✓ Histórico criado para: {product.name} - R$ {product.price}"
-                    )
-                )
-                created_count += 1
-            else:
-                self.stdout.write(f"- {product.name} já possui histórico")
-                skipped_count += 1
+        for last_pk, created in populate_missing_history(options["batch_size"], after):
+            created_count += created
+            if checkpoint is not None:
+                checkpoint.write_text(str(last_pk))
+            self._progress(created_count, total)
+        if self.stdout.isatty() and created_count:
+            self.stdout.write("")
 
+        if checkpoint is not None and checkpoint.exists():
+            checkpoint.unlink()
         self.stdout.write(
             self.style.SUCCESS(
-                f"\n✅ Migração concluída! {created_count} registros criados, {skipped_count} ignorados."
+                f"\n✅ Migração concluída! {created_count} registros criados."
             )
         )
@@ -0,0 +1,35 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from products.models import Product
+from products.price_summary import REBUILD_CHUNK_SIZE, rebuild_daily_prices
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula os rollups diários de preço (abertura, máxima, mínima e "
+        "fechamento) a partir do histórico"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Restringe a um usuário (username)")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=REBUILD_CHUNK_SIZE,
+            help=f"Produtos por lote (padrão: {REBUILD_CHUNK_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options["user"]:
+            try:
+                user = User.objects.get(username=options["user"])
+            except User.DoesNotExist:
+                raise CommandError(f"Usuário '{options['user']}' não encontrado.")
+            products = products.filter(user=user)
+
+        self.stdout.write(self.style.WARNING("Recalculando rollups diários de preço..."))
+        count = rebuild_daily_prices(products, options["chunk_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Rollups diários recalculados! {count} dias gravados.")
+        )
@@ -0,0 +1,45 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from products.rollups import rebuild_rollups, verify_rollups
+
+
+class Command(BaseCommand):
+    help = "Reconstrói ou verifica os rollups de inventário (totais por usuário/categoria)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Apenas compara os rollups com os produtos, sem alterar nada",
+        )
+        parser.add_argument("--user", help="Restringe a um usuário (username)")
+
+    def handle(self, *args, **options):
+        user = None
+        if options["user"]:
+            try:
+                user = User.objects.get(username=options["user"])
+            except User.DoesNotExist:
+                raise CommandError(f"Usuário '{options['user']}' não encontrado.")
+
+        if options["verify"]:
+            mismatches = verify_rollups(user)
+            for (user_id, category_id, is_public), expected, stored in mismatches:
+                self.stdout.write(
+                    self.style.ERROR(
+                        f"✗ user={user_id} categoria={category_id or '-'} "
+                        f"público={is_public}: esperado {expected}, armazenado {stored}"
+                    )
+                )
+            if mismatches:
+                raise CommandError(
+                    f"{len(mismatches)} rollups divergentes. Execute sem --verify para reconstruir."
+                )
+            self.stdout.write(self.style.SUCCESS("✅ Rollups consistentes."))
+            return
+
+        self.stdout.write(self.style.WARNING("Reconstruindo rollups de inventário..."))
+        count = rebuild_rollups(user)
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Rollups reconstruídos! {count} linhas gravadas.")
+        )
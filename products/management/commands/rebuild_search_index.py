@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from products.search import get_backend, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Reconstrói o índice de busca textual de produtos"
+
+    def handle(self, *args, **options):
+        backend = type(get_backend()).__name__
+        self.stdout.write(
+            self.style.WARNING(f"Reconstruindo índice de busca ({backend})...")
+        )
+        count = rebuild_search_index()
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Índice reconstruído! {count} produtos indexados.")
+        )
@@ -0,0 +1,78 @@
+import time
+
+from django.core.management.base import BaseCommand
+from products.outbox import (
+    DEFAULT_BATCH_SIZE,
+    MAX_ATTEMPTS,
+    drain,
+    purge_processed,
+    retry_failed,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Executa os efeitos colaterais pendentes do outbox (histórico de preço, "
+        "movimentações de ajuste e índice de busca)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Esvazia a fila uma vez e termina, em vez de ficar em execução",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f"Eventos por transação (padrão: {DEFAULT_BATCH_SIZE})",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Segundos de espera quando a fila está vazia (padrão: 1)",
+        )
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=MAX_ATTEMPTS,
+            help=f"Tentativas antes de desistir de um evento (padrão: {MAX_ATTEMPTS})",
+        )
+        parser.add_argument(
+            "--retry-failed",
+            action="store_true",
+            help="Devolve à fila os eventos que esgotaram as tentativas",
+        )
+        parser.add_argument(
+            "--purge-days",
+            type=int,
+            help="Remove eventos processados há mais de N dias",
+        )
+
+    def handle(self, *args, **options):
+        if options["retry_failed"]:
+            count = retry_failed(options["max_attempts"])
+            self.stdout.write(f"{count} eventos devolvidos à fila.")
+        if options["purge_days"] is not None:
+            count = purge_processed(options["purge_days"])
+            self.stdout.write(f"{count} eventos processados removidos.")
+
+        try:
+            while True:
+                processed, failed = drain(
+                    options["batch_size"], options["max_attempts"]
+                )
+                if processed or failed:
+                    self.stdout.write(
+                        f"{processed} eventos processados, {failed} com falha."
+                    )
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Worker interrompido."))
+            return
+        if options["once"]:
+            self.stdout.write(self.style.SUCCESS("✅ Fila do outbox processada."))
@@ -0,0 +1,73 @@
+# Generated by Django 6.0.1 on 2026-10-16 22:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Sum
+
+
+def backfill_rollups(apps, schema_editor):
+    Product = apps.get_model("products", "Product")
+    InventoryRollup = apps.get_model("products", "InventoryRollup")
+    value = Sum(F("price") * F("stock"), output_field=DecimalField())
+
+    rollups = [
+        InventoryRollup(
+            user_id=row["user_id"],
+            is_public=row["is_public"],
+            total_count=row["total_count"],
+            total_stock=row["total_stock"] or 0,
+            total_value=row["total_value"] or 0,
+        )
+        for row in Product.objects.filter(user__isnull=False)
+        .values("user_id", "is_public")
+        .annotate(total_count=Count("pk"), total_stock=Sum("stock"), total_value=value)
+    ]
+    links = Product.categories.through.objects.filter(product__user__isnull=False)
+    rollups += [
+        InventoryRollup(
+            user_id=row["product__user_id"],
+            category_id=row["category_id"],
+            is_public=row["product__is_public"],
+            total_count=row["total_count"],
+            total_stock=row["total_stock"] or 0,
+            total_value=row["total_value"] or 0,
+        )
+        for row in links.values("product__user_id", "category_id", "product__is_public")
+        .annotate(
+            total_count=Count("product_id"),
+            total_stock=Sum("product__stock"),
+            total_value=Sum(
+                F("product__price") * F("product__stock"), output_field=DecimalField()
+            ),
+        )
+    ]
+    InventoryRollup.objects.bulk_create(rollups, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_productmovement'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_public', models.BooleanField()),
+                ('total_count', models.IntegerField(default=0)),
+                ('total_stock', models.BigIntegerField(default=0)),
+                ('total_value', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='inventory_rollups', to='products.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Inventory Rollups',
+                'constraints': [models.UniqueConstraint(condition=models.Q(('category__isnull', True)), fields=('user', 'is_public'), name='unique_rollup_user_visibility'), models.UniqueConstraint(condition=models.Q(('category__isnull', False)), fields=('user', 'category', 'is_public'), name='unique_rollup_user_category_visibility')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Índice de busca textual de produtos (ver products/search.py)
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE TABLE IF NOT EXISTS products_product_search ("
+            " product_id bigint PRIMARY KEY"
+            " REFERENCES products_product (id) ON DELETE CASCADE"
+            " DEFERRABLE INITIALLY DEFERRED,"
+            " document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS products_product_search_gin"
+            " ON products_product_search USING GIN (document)"
+        )
+        schema_editor.execute(
+            "INSERT INTO products_product_search (product_id, document)"
+            " SELECT id,"
+            " setweight(to_tsvector('portuguese'::regconfig, coalesce(name, '')), 'A') ||"
+            " setweight(to_tsvector('portuguese'::regconfig, coalesce(description, '')), 'B')"
+            " FROM products_product"
+            " ON CONFLICT (product_id) DO NOTHING"
+        )
+    elif vendor == "sqlite":
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS products_product_fts USING fts5("
+            " name, description, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            "INSERT INTO products_product_fts (rowid, name, description)"
+            " SELECT id, name, description FROM products_product"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("DROP TABLE IF EXISTS products_product_search")
+    elif vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS products_product_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0012_inventoryrollup"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,70 @@
+# Índice de trigramas para a busca aproximada (ver products/search.py)
+
+import re
+import unicodedata
+
+from django.db import migrations
+
+
+def trigrams(text):
+    """Cópia congelada de products.search.trigrams (formato do pg_trgm)."""
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    grams = set()
+    for word in re.findall(r"[^\W_]+", text):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def create_trigram_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS products_product_name_trgm"
+            " ON products_product USING GIN (name gin_trgm_ops)"
+        )
+    elif vendor == "sqlite":
+        schema_editor.execute(
+            "CREATE TABLE IF NOT EXISTS products_product_trigram ("
+            " trigram text NOT NULL,"
+            " product_id integer NOT NULL"
+            " REFERENCES products_product (id) ON DELETE CASCADE,"
+            " PRIMARY KEY (trigram, product_id)) WITHOUT ROWID"
+        )
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS products_product_trigram_product"
+            " ON products_product_trigram (product_id)"
+        )
+        Product = apps.get_model("products", "Product")
+        rows = [
+            (gram, pk)
+            for pk, name in Product.objects.values_list("pk", "name").iterator()
+            for gram in trigrams(name)
+        ]
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                "INSERT INTO products_product_trigram (trigram, product_id)"
+                " VALUES (%s, %s)",
+                rows,
+            )
+
+
+def drop_trigram_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS products_product_name_trgm")
+    elif vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS products_product_trigram")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0013_product_search_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 6.0.1 on 2026-10-16 22:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    """
+    CREATE INDEX CONCURRENTLY no PostgreSQL, para não bloquear escritas em
+    tabelas grandes; nos demais bancos é um AddIndex comum.
+    """
+
+    def _concurrently(self, schema_editor):
+        if schema_editor.connection.vendor == "postgresql":
+            return {"concurrently": True}
+        return {}
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(
+                model, self.index, **self._concurrently(schema_editor)
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(
+                model, self.index, **self._concurrently(schema_editor)
+            )
+
+
+class Migration(migrations.Migration):
+
+    # CONCURRENTLY não pode rodar dentro de uma transação
+    atomic = False
+
+    dependencies = [
+        ('products', '0014_product_trigram_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='pricehistory',
+            index=models.Index(fields=['product', '-changed_at'], name='price_hist_product_recent_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(fields=['user', 'is_public'], name='product_user_public_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(fields=['user', 'name', 'id'], name='product_user_name_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(fields=['user', 'price'], name='product_user_price_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(fields=['user', 'stock'], name='product_user_stock_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['name', 'id'], name='product_public_name_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['user', '-created_at'], name='product_public_user_recent_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='productmovement',
+            index=models.Index(fields=['product', '-moved_at'], name='movement_product_recent_idx'),
+        ),
+    ]
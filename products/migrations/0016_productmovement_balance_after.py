@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-16 22:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0015_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productmovement',
+            name='balance_after',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 6.0.1 on 2026-10-16 22:56
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Q
+
+
+def clamp_negative_stock(apps, schema_editor):
+    """
+    Zera o estoque negativo antes da constraint, registrando a entrada que
+    compensa a diferença (o livro de movimentações volta a bater com o
+    estoque) e descontando-a dos rollups de inventário.
+    """
+    Product = apps.get_model("products", "Product")
+    ProductMovement = apps.get_model("products", "ProductMovement")
+    InventoryRollup = apps.get_model("products", "InventoryRollup")
+
+    negative = Product.objects.filter(stock__lt=0).prefetch_related("categories")
+    for product in negative.iterator(chunk_size=1000):
+        diff = -product.stock
+        ProductMovement.objects.create(
+            product=product,
+            type="IN",
+            quantity=diff,
+            reason="Ajuste de estoque",
+            balance_after=0,
+        )
+        if product.user_id is not None:
+            categories = [category.pk for category in product.categories.all()]
+            InventoryRollup.objects.filter(
+                Q(category__isnull=True) | Q(category__in=categories),
+                user_id=product.user_id,
+                is_public=product.is_public,
+            ).update(
+                total_stock=F("total_stock") + diff,
+                total_value=F("total_value") + product.price * diff,
+            )
+    Product.objects.filter(stock__lt=0).update(stock=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0016_productmovement_balance_after'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(clamp_negative_stock, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.CheckConstraint(condition=models.Q(('stock__gte', 0)), name='product_stock_non_negative'),
+        ),
+    ]
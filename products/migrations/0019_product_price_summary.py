@@ -0,0 +1,78 @@
+# Generated by Django 6.0.1 on 2026-10-16 23:15
+
+from django.db import migrations, models
+
+# products.models.RECENT_PRICES na época desta migração
+RECENT_PRICES = 10
+
+
+def backfill_price_summary(apps, schema_editor):
+    Product = apps.get_model("products", "Product")
+    PriceHistory = apps.get_model("products", "PriceHistory")
+
+    def summary(product_id, prices, count):
+        recent = prices[-RECENT_PRICES:]
+        return Product(
+            pk=product_id,
+            previous_price=prices[-2][0] if len(prices) > 1 else None,
+            last_price_change_at=prices[-1][1],
+            price_change_count=count,
+            recent_prices=[[str(price), at.isoformat()] for price, at in recent],
+        )
+
+    fields = [
+        "previous_price",
+        "last_price_change_at",
+        "price_change_count",
+        "recent_prices",
+    ]
+    history = (
+        PriceHistory.objects.order_by("product_id", "changed_at", "id")
+        .values_list("product_id", "price", "changed_at")
+        .iterator(chunk_size=2000)
+    )
+    rows, current, prices, count = [], None, [], 0
+    for product_id, price, changed_at in history:
+        if product_id != current:
+            if current is not None:
+                rows.append(summary(current, prices, count))
+            current, prices, count = product_id, [], 0
+        prices = [*prices[-RECENT_PRICES:], (price, changed_at)]
+        count += 1
+        if len(rows) >= 1000:
+            Product.objects.bulk_update(rows, fields)
+            rows = []
+    if current is not None:
+        rows.append(summary(current, prices, count))
+    Product.objects.bulk_update(rows, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0018_outbox_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='last_price_change_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='previous_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='price_change_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='recent_prices',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(backfill_price_summary, migrations.RunPython.noop),
+    ]
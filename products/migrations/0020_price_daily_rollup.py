@@ -0,0 +1,67 @@
+# Generated by Django 6.0.1 on 2026-10-16 23:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_daily_prices(apps, schema_editor):
+    PriceHistory = apps.get_model("products", "PriceHistory")
+    PriceDailyRollup = apps.get_model("products", "PriceDailyRollup")
+
+    history = (
+        PriceHistory.objects.order_by("product_id", "changed_at", "id")
+        .values_list("product_id", "price", "changed_at")
+        .iterator(chunk_size=2000)
+    )
+    rows, row = [], None
+    for product_id, price, changed_at in history:
+        day = timezone.localdate(changed_at)
+        if row is None or (row.product_id, row.day) != (product_id, day):
+            row = PriceDailyRollup(
+                product_id=product_id,
+                day=day,
+                open=price,
+                high=price,
+                low=price,
+                close=price,
+                change_count=0,
+            )
+            rows.append(row)
+            if len(rows) > 1000:
+                PriceDailyRollup.objects.bulk_create(rows[:-1])
+                rows = rows[-1:]
+        row.high = max(row.high, price)
+        row.low = min(row.low, price)
+        row.close = price
+        row.change_count += 1
+    PriceDailyRollup.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0019_product_price_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('open', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('high', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('low', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('close', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('change_count', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_prices', to='products.product')),
+            ],
+            options={
+                'verbose_name_plural': 'Price Daily Rollups',
+                'ordering': ['-day'],
+                'constraints': [models.UniqueConstraint(fields=('product', 'day'), name='unique_price_daily_rollup')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_prices, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,21 @@
-from django.db import models
+from decimal import Decimal, InvalidOperation
+
+from django.db import models, transaction
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
 from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from typing import TYPE_CHECKING
 
+from .instrumentation import instrumented
+
 if TYPE_CHECKING:
     from .models import PriceHistory, ProductMovement
 
@@ -27,6 +39,31 @@ class Category(models.Model):
         ]
 
 
+# Registros de preço guardados em Product.recent_prices (sparklines)
+RECENT_PRICES = 10
+
+# Maior valor que cabe em Product.price (max_digits=10, decimal_places=2)
+MAX_PRICE = Decimal("99999999.99")
+
+
+def parse_decimal(value):
+    """
+    Converte um valor digitado ("1.234,56", "-5,50", "12.5") em Decimal. Com
+    vírgula, é o formato brasileiro: pontos de milhar e vírgula decimal.
+    Levanta ValueError se não for um número finito.
+    """
+    value = value.strip()
+    if "," in value:
+        value = value.replace(".", "").replace(",", ".")
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"Número inválido: {value!r}.")
+    if not number.is_finite():
+        raise ValueError(f"Número inválido: {value!r}.")
+    return number
+
+
 class Product(models.Model):
     user = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name="products", null=True, blank=True
@@ -44,22 +81,190 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Resumo do histórico de preços, gravado só por price_summary.py (a
+    # partir de track_price_changes) para as telas não consultarem
+    # PriceHistory. recent_prices guarda pares [preço, data ISO] dos últimos
+    # RECENT_PRICES registros, do mais antigo ao mais recente
+    previous_price = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True, editable=False
+    )
+    last_price_change_at = models.DateTimeField(null=True, blank=True, editable=False)
+    price_change_count = models.PositiveIntegerField(default=0, editable=False)
+    recent_prices = models.JSONField(default=list, blank=True, editable=False)
+
     """ Como price_history é injetado em Product com  <related_name="price_history">
         isso avisa ao linter que price_history defato existe em Product.
     """
     if TYPE_CHECKING:
         price_history: models.Manager["PriceHistory"]
 
+    # Campos cujo valor lido do banco é guardado para detectar alterações
+    # sem consultas extras nos signals de save
+    TRACKED_FIELDS = ("user_id", "name", "description", "price", "stock", "is_public")
+
+    PRICE_SUMMARY_FIELDS = (
+        "previous_price",
+        "last_price_change_at",
+        "price_change_count",
+        "recent_prices",
+    )
+
+    # None enquanto a instância não vier do banco (ex.: Product(...) novo)
+    _loaded_values = None
+
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot()
+        return instance
+
+    def _snapshot(self, fields=None):
+        """
+        Guarda os valores atuais como os persistidos (todos ou `fields`),
+        convertidos como em get_changed_fields: um price="10.00" salvo é
+        guardado como Decimal("10.00").
+        """
+        current = {
+            name: self._meta.get_field(name).to_python(self.__dict__[name])
+            for name in self.TRACKED_FIELDS
+            if name in self.__dict__
+        }
+        if fields is None or self._loaded_values is None:
+            self._loaded_values = current
+            return
+        attnames = {self._meta.get_field(name).attname for name in fields}
+        self._loaded_values.update(
+            {name: value for name, value in current.items() if name in attnames}
+        )
+
+    @property
+    def loaded_values(self):
+        """Valores dos campos rastreados como estão no banco, ou None."""
+        if self._loaded_values is None:
+            return None
+        return dict(self._loaded_values)
+
+    def get_changed_fields(self):
+        """
+        Campos rastreados alterados desde a leitura do banco (ou o último
+        save). Numa instância que não veio do banco, todos contam como
+        alterados; campos adiados (`only`/`defer`) que não foram acessados não.
+        """
+        if self._loaded_values is None:
+            return set(self.TRACKED_FIELDS)
+        changed = set()
+        for name in self.TRACKED_FIELDS:
+            if name not in self.__dict__:
+                continue
+            if name not in self._loaded_values:
+                changed.add(name)
+                continue
+            to_python = self._meta.get_field(name).to_python
+            if to_python(self.__dict__[name]) != self._loaded_values[name]:
+                changed.add(name)
+        return changed
+
+    def has_changed(self, name):
+        return name in self.get_changed_fields()
+
+    @property
+    def price_points(self):
+        """recent_prices como dicts {price, changed_at}, do mais antigo ao mais recente."""
+        return [
+            {"price": Decimal(price), "changed_at": parse_datetime(changed_at)}
+            for price, changed_at in self.recent_prices
+        ]
+
+    @property
+    def price_trend(self):
+        """"up", "down" ou "stable": último preço registrado x o anterior."""
+        if self.previous_price is None or not self.recent_prices:
+            return "stable"
+        latest = Decimal(self.recent_prices[-1][0])
+        if latest > self.previous_price:
+            return "up"
+        if latest < self.previous_price:
+            return "down"
+        return "stable"
+
+    def save(self, *args, **kwargs):
+        from .outbox import outbox_enabled
+
+        if (
+            kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+            and not self._state.adding
+        ):
+            # O resumo de preços é gravado só por price_summary.py: um save
+            # com a instância desatualizada não o sobrescreve
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.name not in self.PRICE_SUMMARY_FIELDS
+            ]
+
+        if outbox_enabled():
+            # O save e os eventos do outbox gravados pelos signals são
+            # confirmados juntos
+            with transaction.atomic(using=kwargs.get("using")):
+                super().save(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
+        self._snapshot(kwargs.get("update_fields"))
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._snapshot(fields)
+
+    class Meta:
+        # Formatos de consulta das listagens (views e API): filtro por dono e
+        # visibilidade, faixas/ordenação de preço e estoque, ordenação por nome
+        # com o pk como desempate do cursor e os catálogos públicos (parciais)
+        indexes = [
+            models.Index(fields=["user", "is_public"], name="product_user_public_idx"),
+            models.Index(fields=["user", "name", "id"], name="product_user_name_idx"),
+            models.Index(fields=["user", "price"], name="product_user_price_idx"),
+            models.Index(fields=["user", "stock"], name="product_user_stock_idx"),
+            models.Index(
+                fields=["name", "id"],
+                condition=models.Q(is_public=True),
+                name="product_public_name_idx",
+            ),
+            models.Index(
+                fields=["user", "-created_at"],
+                condition=models.Q(is_public=True),
+                name="product_public_user_recent_idx",
+            ),
+        ]
+        constraints = [
+            # Última barreira contra vender além do estoque (ver stock.py)
+            models.CheckConstraint(
+                condition=models.Q(stock__gte=0), name="product_stock_non_negative"
+            ),
+        ]
+
 
 class PriceHistory(models.Model):
+    """
+    Registro de preço de um produto. O resumo em Product e os rollups
+    diários acompanham cada registro: save()/create() os atualizam pelo
+    signal `track_price_summary`; quem grava com bulk_create chama
+    price_summary.record_prices, e registros alterados com update() pedem
+    os comandos rebuild_price_summaries e rebuild_daily_prices.
+    """
+
     product = models.ForeignKey(
         Product, on_delete=models.CASCADE, related_name="price_history"
     )
     price = models.DecimalField(max_digits=10, decimal_places=2)
-    changed_at = models.DateTimeField(auto_now_add=True)
+    # Informável na criação (o worker do outbox grava a data do evento)
+    changed_at = models.DateTimeField(default=timezone.now, editable=False)
 
     def __str__(self):
         return f"{self.product.name} - R$ {self.price} em {self.changed_at.strftime('%d/%m/%Y %H:%M')}"
@@ -67,6 +272,12 @@ class PriceHistory(models.Model):
     class Meta:
         verbose_name_plural = "Price Histories"
         ordering = ["-changed_at"]
+        # price_history.first() e a consulta de janela do overview
+        indexes = [
+            models.Index(
+                fields=["product", "-changed_at"], name="price_hist_product_recent_idx"
+            ),
+        ]
 
 
 class ProductMovement(models.Model):
@@ -74,6 +285,10 @@ class ProductMovement(models.Model):
         ("IN", "Entrada"),
         ("OUT", "Saída"),
     ]
+    # Motivos das movimentações registradas pelo sistema
+    INITIAL_REASON = "Registro inicial do produto"
+    ADJUSTMENT_REASON = "Ajuste de estoque"
+
     product = models.ForeignKey(
         Product, on_delete=models.CASCADE, related_name="movements"
     )
@@ -81,13 +296,186 @@ class ProductMovement(models.Model):
     quantity = models.IntegerField()
     reason = models.CharField(max_length=255, blank=True)
     moved_at = models.DateTimeField(auto_now_add=True)
+    # Saldo do produto após esta movimentação (nulo em registros antigos até
+    # rodar o comando backfill_movement_balances)
+    balance_after = models.IntegerField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.get_type_display()} - {self.product.name} ({self.quantity}) em {self.moved_at.strftime('%d/%m/%Y %H:%M')}"
 
+    @property
+    def signed_quantity(self):
+        return self.quantity if self.type == "IN" else -self.quantity
+
+    @classmethod
+    def ledger_balance(cls, product_id, until=None):
+        """
+        Saldo atual do livro de movimentações do produto: o `balance_after`
+        da última movimentação (até o instante `until`, se informado). Só
+        soma o histórico quando ela ainda não tem saldo (dados anteriores ao
+        backfill).
+        """
+        movements = cls.objects.filter(product_id=product_id)
+        if until is not None:
+            movements = movements.filter(moved_at__lte=until)
+        last = (
+            movements.order_by("-moved_at", "-id")
+            .values("balance_after")
+            .first()
+        )
+        if last is None:
+            return 0
+        if last["balance_after"] is not None:
+            return last["balance_after"]
+        return (
+            movements.aggregate(
+                total=models.Sum(
+                    models.Case(
+                        models.When(type="IN", then=models.F("quantity")),
+                        models.When(type="OUT", then=-models.F("quantity")),
+                        default=0,
+                        output_field=models.IntegerField(),
+                    )
+                )
+            )["total"]
+            or 0
+        )
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding or self.balance_after is not None:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            # Trava o produto para que movimentações concorrentes leiam o
+            # saldo uma de cada vez
+            list(
+                Product.objects.select_for_update()
+                .filter(pk=self.product_id)
+                .values_list("pk", flat=True)
+            )
+            self.balance_after = (
+                ProductMovement.ledger_balance(self.product_id) + self.signed_quantity
+            )
+            return super().save(*args, **kwargs)
+
     class Meta:
         verbose_name_plural = "Product Movements"
         ordering = ["-moved_at"]
+        indexes = [
+            models.Index(
+                fields=["product", "-moved_at"], name="movement_product_recent_idx"
+            ),
+        ]
+
+
+class InventoryRollup(models.Model):
+    """
+    Totais de inventário mantidos incrementalmente pelos signals de Product.
+
+    Linhas com `category` nula guardam o total do usuário por visibilidade;
+    as demais guardam o total de cada categoria (um produto com várias
+    categorias conta uma vez em cada uma delas).
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="inventory_rollups"
+    )
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        related_name="inventory_rollups",
+        null=True,
+        blank=True,
+    )
+    is_public = models.BooleanField()
+    total_count = models.IntegerField(default=0)
+    total_stock = models.BigIntegerField(default=0)
+    total_value = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    def __str__(self):
+        scope = self.category.name if self.category else "Todos"
+        return f"{self.user.username} - {scope} ({'Público' if self.is_public else 'Privado'})"
+
+    class Meta:
+        verbose_name_plural = "Inventory Rollups"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "is_public"],
+                condition=models.Q(category__isnull=True),
+                name="unique_rollup_user_visibility",
+            ),
+            models.UniqueConstraint(
+                fields=["user", "category", "is_public"],
+                condition=models.Q(category__isnull=False),
+                name="unique_rollup_user_category_visibility",
+            ),
+        ]
+
+
+class PriceDailyRollup(models.Model):
+    """
+    Preços de um produto agregados por dia (abertura, máxima, mínima,
+    fechamento e nº de alterações), mantidos por price_summary.py a cada
+    registro de PriceHistory. Servem os gráficos e tabelas de períodos longos.
+    """
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="daily_prices"
+    )
+    day = models.DateField()
+    open = models.DecimalField(max_digits=10, decimal_places=2)
+    high = models.DecimalField(max_digits=10, decimal_places=2)
+    low = models.DecimalField(max_digits=10, decimal_places=2)
+    close = models.DecimalField(max_digits=10, decimal_places=2)
+    change_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.product_id} em {self.day:%d/%m/%Y}: R$ {self.close}"
+
+    class Meta:
+        verbose_name_plural = "Price Daily Rollups"
+        ordering = ["-day"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "day"], name="unique_price_daily_rollup"
+            ),
+        ]
+
+
+class OutboxEvent(models.Model):
+    """
+    Efeito colateral de um save de Product (histórico, índice de busca)
+    gravado na mesma transação do save e executado depois pelo worker
+    `run_outbox_worker`, quando PRODUCT_SIDE_EFFECTS = "outbox".
+    """
+
+    TOPICS = [
+        ("price", "Histórico de preço"),
+        ("stock", "Movimentação de estoque"),
+        ("search", "Índice de busca"),
+    ]
+    topic = models.CharField(max_length=10, choices=TOPICS)
+    # Sem FK: o evento sobrevive à exclusão do produto (e é descartado)
+    product_id = models.IntegerField()
+    payload = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"{self.topic} produto={self.product_id} ({self.created_at:%d/%m/%Y %H:%M})"
+
+    class Meta:
+        verbose_name_plural = "Outbox Events"
+        ordering = ["id"]
+        indexes = [
+            # Fila de pendentes, lida em ordem de criação pelo worker
+            models.Index(
+                fields=["id"],
+                condition=models.Q(processed_at__isnull=True),
+                name="outbox_pending_idx",
+            ),
+        ]
 
 
 class Profile(models.Model):
@@ -104,6 +492,7 @@ class Profile(models.Model):
 
 
 @receiver(post_save, sender=User)
+@instrumented
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.get_or_create(user=instance)
@@ -113,6 +502,7 @@ from django.contrib.auth.signals import user_logged_in
 
 
 @receiver(post_save, sender=User)
+@instrumented
 def save_user_profile(sender, instance, **kwargs):
     if not hasattr(instance, "profile"):
         Profile.objects.create(user=instance)
@@ -121,33 +511,80 @@ def save_user_profile(sender, instance, **kwargs):
 
 
 @receiver(user_logged_in)
+@instrumented
 def load_user_theme(sender, request, user, **kwargs):
     if hasattr(user, "profile"):
         request.session["theme"] = user.profile.theme
 
 
+def _defer(topic, instance, **payload):
+    """
+    No modo outbox (PRODUCT_SIDE_EFFECTS = "outbox"), grava o efeito
+    colateral para o worker e retorna True; no modo síncrono, retorna False.
+    """
+    from .outbox import enqueue, outbox_enabled
+
+    if not outbox_enabled():
+        return False
+    enqueue(topic, instance, **payload)
+    return True
+
+
 @receiver(post_save, sender=Product)
+@instrumented
 def track_price_changes(sender, instance, created, **kwargs):
     """
     Registra automaticamente mudanças de preço no histórico.
     Cria um registro inicial quando o produto é criado.
     """
     if created:
+        if _defer("price", instance, price=str(instance.price), created=True):
+            return
         # Primeiro registro de preço ao criar o produto
         PriceHistory.objects.create(product=instance, price=instance.price)
-    else:
-        # Verifica se o preço mudou comparando com o último registro
-        last_price_entry = instance.price_history.first()
+        return
 
-        # Se não há histórico anterior, cria o primeiro registro
-        if not last_price_entry:
-            PriceHistory.objects.create(product=instance, price=instance.price)
-        # Se o preço mudou, cria um novo registro
-        elif last_price_entry.price != instance.price:
-            PriceHistory.objects.create(product=instance, price=instance.price)
+    # Sem mudança de preço desde a leitura, nada a consultar
+    if not instance.has_changed("price"):
+        return
+
+    if _defer("price", instance, price=str(instance.price)):
+        return
+
+    loaded = instance.loaded_values
+    if loaded and "price" in loaded:
+        # O valor anterior é conhecido e é diferente: registra direto
+        PriceHistory.objects.create(product=instance, price=instance.price)
+        return
+
+    # Instância que não veio do banco: compara com o último registro
+    last_price_entry = instance.price_history.first()
+
+    # Se não há histórico anterior ou o preço mudou, cria um novo registro
+    if not last_price_entry or last_price_entry.price != instance.price:
+        PriceHistory.objects.create(product=instance, price=instance.price)
+
+
+@receiver(post_save, sender=PriceHistory)
+@instrumented
+def track_price_summary(sender, instance, created, raw=False, **kwargs):
+    """
+    Acrescenta cada registro de preço criado ao resumo do produto e aos
+    rollups diários; o produto em memória (ex.: o do signal acima) recebe
+    os novos valores.
+    """
+    if not created or raw:
+        return
+    from .price_summary import record_price
+
+    product = (
+        instance.product if PriceHistory.product.field.is_cached(instance) else None
+    )
+    record_price(instance, product)
 
 
 @receiver(post_save, sender=Product)
+@instrumented
 def track_stock_changes(sender, instance, created, **kwargs):
     """
     Registra automaticamente mudanças de estoque no histórico de movimentações.
@@ -156,51 +593,143 @@ def track_stock_changes(sender, instance, created, **kwargs):
     if created:
         # Primeiro registro de estoque (Entrada) ao criar o produto
         if instance.stock > 0:
+            if _defer("stock", instance, stock=instance.stock, created=True):
+                return
             ProductMovement.objects.create(
                 product=instance,
                 type="IN",
                 quantity=instance.stock,
-                reason="Registro inicial do produto",
+                reason=ProductMovement.INITIAL_REASON,
             )
-    else:
-        # Verifica se o estoque mudou comparando com o último estado conhecido
-        # Precisamos saber o estoque anterior. Como o Django não guarda o estado anterior nativamente no save,
-        # poderíamos usar um middleware ou buscar o último registro de movimentação para calcular.
-        # Mas uma forma mais simples é ver o saldo acumulado das movimentações.
-        # No entanto, se o usuário editar o campo 'stock' livremente, queremos capturar a diferença.
-
-        from django.db.models import Sum
-
-        movements_sum = (
-            instance.movements.aggregate(
-                total=Sum(
-                    models.Case(
-                        models.When(type="IN", then=models.F("quantity")),
-                        models.When(type="OUT", then=-models.F("quantity")),
-                        default=0,
-                        output_field=models.IntegerField(),
-                    )
-                )
-            )["total"]
-            or 0
-        )
-
-        diff = instance.stock - movements_sum
+    elif instance.has_changed("stock"):
+        if _defer("stock", instance, stock=instance.stock):
+            return
+        # O estoque mudou desde a leitura. A referência é o saldo do livro
+        # de movimentações (e não o valor anterior), pois a tela de
+        # movimentação e a API registram a própria movimentação antes do
+        # save; só a diferença restante vira um ajuste.
+        diff = instance.stock - ProductMovement.ledger_balance(instance.pk)
 
         if diff > 0:
             ProductMovement.objects.create(
-                product=instance, type="IN", quantity=diff, reason="Ajuste de estoque"
+                product=instance,
+                type="IN",
+                quantity=diff,
+                reason=ProductMovement.ADJUSTMENT_REASON,
             )
         elif diff < 0:
             ProductMovement.objects.create(
                 product=instance,
                 type="OUT",
                 quantity=abs(diff),
-                reason="Ajuste de estoque",
+                reason=ProductMovement.ADJUSTMENT_REASON,
             )
 
 
+@receiver(pre_save, sender=Product)
+@instrumented
+def snapshot_rollup_state(sender, instance, raw=False, **kwargs):
+    """
+    Guarda o estado persistido do produto antes do save para que o rollup
+    possa subtrair a contribuição antiga.
+    """
+    from .rollups import load_previous_state
+
+    instance._rollup_previous = None if raw else load_previous_state(instance)
+
+
+@receiver(post_save, sender=Product)
+@instrumented
+def update_inventory_rollup(sender, instance, created, raw=False, **kwargs):
+    """Aplica a diferença entre o estado antigo e o novo nos rollups."""
+    if raw:
+        return
+    from .rollups import apply_product_change
+
+    apply_product_change(instance, getattr(instance, "_rollup_previous", None))
+
+
+@receiver(pre_delete, sender=Product)
+@instrumented
+def snapshot_rollup_categories(sender, instance, **kwargs):
+    # As linhas da tabela M2M são removidas antes do post_delete
+    instance._rollup_category_ids = list(
+        instance.categories.values_list("id", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Product)
+@instrumented
+def remove_from_inventory_rollup(sender, instance, **kwargs):
+    from .rollups import apply_product_delete
+
+    apply_product_delete(instance, getattr(instance, "_rollup_category_ids", []))
+
+
+@receiver(m2m_changed, sender=Product.categories.through)
+@instrumented
+def update_category_rollup(sender, instance, action, reverse, pk_set, **kwargs):
+    """Mantém os rollups por categoria quando categorias são vinculadas."""
+    from .rollups import apply_category_links
+
+    if action == "pre_clear":
+        # O pk_set não é informado no clear, então capturamos os vínculos antes
+        if reverse:
+            instance._rollup_cleared = list(
+                instance.products.values_list("id", flat=True)
+            )
+        else:
+            instance._rollup_cleared = list(
+                instance.categories.values_list("id", flat=True)
+            )
+    elif action == "pre_remove":
+        # O remove() repassa os ids informados, mesmo os que não estão vinculados
+        instance._rollup_removed = list(
+            sender.objects.filter(
+                **(
+                    {"category_id": instance.pk, "product_id__in": pk_set}
+                    if reverse
+                    else {"product_id": instance.pk, "category_id__in": pk_set}
+                )
+            ).values_list("product_id" if reverse else "category_id", flat=True)
+        )
+    elif action == "post_clear":
+        apply_category_links(
+            instance, reverse, getattr(instance, "_rollup_cleared", []), sign=-1
+        )
+    elif action == "post_add":
+        apply_category_links(instance, reverse, pk_set, sign=1)
+    elif action == "post_remove":
+        apply_category_links(
+            instance, reverse, getattr(instance, "_rollup_removed", []), sign=-1
+        )
+
+
+@receiver(post_save, sender=Product)
+@instrumented
+def sync_search_index(sender, instance, created=False, raw=False, **kwargs):
+    """Mantém o índice de busca textual em dia com nome e descrição."""
+    if raw:
+        return
+    if not created and not ({"name", "description"} & instance.get_changed_fields()):
+        return
+    if _defer("search", instance):
+        return
+    from .search import index_products
+
+    index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+@instrumented
+def remove_from_search_index(sender, instance, **kwargs):
+    from .search import remove_products
+
+    remove_products([instance.pk])
+
+
 @receiver(post_save, sender=User)
+@instrumented
 def create_default_categories(sender, instance, created, **kwargs):
     if created:
         from django.utils.text import slugify
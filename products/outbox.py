@@ -0,0 +1,199 @@
+"""
+Outbox transacional para os efeitos colaterais dos saves de Product.
+
+Com `PRODUCT_SIDE_EFFECTS = "outbox"`, os receivers de post_save que gravam
+o histórico de preço, a movimentação de ajuste de estoque e o índice de
+busca deixam de executar o trabalho na requisição: gravam uma linha em
+OutboxEvent na mesma transação do save (`Product.save` fica atômico nesse
+modo), e o worker (`manage.py run_outbox_worker`) as executa depois, em
+lotes. Com "sync" (padrão), tudo continua síncrono como antes. Os rollups
+de inventário seguem sempre síncronos, pois as estatísticas os leem direto.
+
+Garantias:
+
+- um evento existe se e somente se o save foi confirmado (mesma transação);
+- o efeito e a marcação `processed_at` são gravados na mesma transação, então
+  cada evento é aplicado uma única vez, mesmo se o worker cair no meio;
+- eventos de um produto são aplicados em ordem de criação; se um falha, os
+  seguintes do mesmo produto esperam a próxima tentativa;
+- um evento que falha `MAX_ATTEMPTS` vezes sai da fila e fica com o erro em
+  `last_error`, para inspeção e `--retry-failed`.
+
+Os registros são gravados com a data do evento (`created_at`), não a do
+processamento, para o histórico e o livro de movimentações ficarem na ordem
+em que as alterações aconteceram.
+"""
+
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxEvent, PriceHistory, Product, ProductMovement
+from .search import index_products
+
+logger = logging.getLogger("products.outbox")
+
+SIDE_EFFECT_MODES = ("sync", "outbox")
+DEFAULT_BATCH_SIZE = 100
+MAX_ATTEMPTS = 5
+
+
+def outbox_enabled():
+    return getattr(settings, "PRODUCT_SIDE_EFFECTS", "sync") == "outbox"
+
+
+def enqueue(topic, product, **payload):
+    """Grava um evento do outbox para `product` (na transação corrente)."""
+    return OutboxEvent.objects.create(
+        topic=topic, product_id=product.pk, payload=payload
+    )
+
+
+def _lock_product(product_id):
+    """Trava o produto; retorna False se ele já foi excluído."""
+    return (
+        Product.objects.select_for_update()
+        .filter(pk=product_id)
+        .values_list("pk", flat=True)
+        .first()
+        is not None
+    )
+
+
+def _handle_price(event):
+    if not _lock_product(event.product_id):
+        return
+    price = Decimal(event.payload["price"])
+    # Compara com o último preço registrado até o evento, como o receiver
+    # síncrono faz com o último registro
+    last_price = (
+        PriceHistory.objects.filter(
+            product_id=event.product_id, changed_at__lte=event.created_at
+        )
+        .order_by("-changed_at", "-id")
+        .values_list("price", flat=True)
+        .first()
+    )
+    if last_price == price:
+        return
+    # O resumo e os rollups diários seguem pelo signal de PriceHistory
+    PriceHistory.objects.create(
+        product_id=event.product_id, price=price, changed_at=event.created_at
+    )
+
+
+def _handle_stock(event):
+    if not _lock_product(event.product_id):
+        return
+    stock = event.payload["stock"]
+    if event.payload.get("created"):
+        diff, reason = stock, ProductMovement.INITIAL_REASON
+    else:
+        # Diferença para o saldo do livro no momento do save; movimentações
+        # registradas depois dele já partem do novo estoque
+        balance = ProductMovement.ledger_balance(
+            event.product_id, until=event.created_at
+        )
+        diff, reason = stock - balance, ProductMovement.ADJUSTMENT_REASON
+    if not diff:
+        return
+    movement = ProductMovement.objects.create(
+        product_id=event.product_id,
+        type="IN" if diff > 0 else "OUT",
+        quantity=abs(diff),
+        reason=reason,
+        balance_after=stock,
+    )
+    ProductMovement.objects.filter(pk=movement.pk).update(moved_at=event.created_at)
+
+
+def _handle_search(event):
+    index_products([event.product_id])
+
+
+HANDLERS = {
+    "price": _handle_price,
+    "stock": _handle_stock,
+    "search": _handle_search,
+}
+
+
+def pending_events(max_attempts=MAX_ATTEMPTS):
+    return OutboxEvent.objects.filter(
+        processed_at__isnull=True, attempts__lt=max_attempts
+    )
+
+
+def failed_events(max_attempts=MAX_ATTEMPTS):
+    return OutboxEvent.objects.filter(
+        processed_at__isnull=True, attempts__gte=max_attempts
+    )
+
+
+def process_batch(batch_size=DEFAULT_BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+    """
+    Executa até `batch_size` eventos pendentes, em ordem, numa transação.
+    Cada evento roda num savepoint: uma falha desfaz só o seu efeito e
+    conta uma tentativa. Retorna (processados, com falha).
+    """
+    with transaction.atomic():
+        # Um segundo worker espera este lote terminar em vez de repeti-lo
+        events = list(
+            pending_events(max_attempts).select_for_update().order_by("id")[
+                :batch_size
+            ]
+        )
+        done, failed, blocked = [], 0, set()
+        for event in events:
+            if event.product_id in blocked:
+                continue
+            try:
+                with transaction.atomic():
+                    HANDLERS[event.topic](event)
+            except Exception as exc:
+                failed += 1
+                blocked.add(event.product_id)
+                OutboxEvent.objects.filter(pk=event.pk).update(
+                    attempts=F("attempts") + 1, last_error=repr(exc)
+                )
+                logger.exception(
+                    "Falha no evento %s (%s, produto=%s)",
+                    event.pk,
+                    event.topic,
+                    event.product_id,
+                )
+            else:
+                done.append(event.pk)
+        if done:
+            OutboxEvent.objects.filter(pk__in=done).update(
+                processed_at=timezone.now(), attempts=F("attempts") + 1
+            )
+    return len(done), failed
+
+
+def drain(batch_size=DEFAULT_BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+    """Processa lotes até a fila esvaziar. Retorna (processados, com falha)."""
+    processed = failed = 0
+    while True:
+        batch_processed, batch_failed = process_batch(batch_size, max_attempts)
+        processed += batch_processed
+        failed += batch_failed
+        if not batch_processed:
+            return processed, failed
+
+
+def retry_failed(max_attempts=MAX_ATTEMPTS):
+    """Devolve à fila os eventos que esgotaram as tentativas."""
+    return failed_events(max_attempts).update(attempts=0)
+
+
+def purge_processed(days):
+    """Remove eventos processados há mais de `days` dias."""
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = OutboxEvent.objects.filter(processed_at__lt=cutoff).delete()
+    return deleted
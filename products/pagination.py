@@ -0,0 +1,99 @@
+"""
+Paginação por cursor (keyset) para as listagens de produtos.
+
+Em vez de OFFSET, cada página é buscada a partir do último item da página
+anterior (valor do campo de ordenação + pk como desempate), então a página
+1000 custa o mesmo que a página 1 e a ordem continua estável mesmo quando
+produtos são criados ou removidos entre as requisições.
+"""
+
+import base64
+import binascii
+import json
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db.models import Q
+
+PAGE_SIZE = 24
+
+
+@dataclass
+class KeysetPage:
+    items: list = field(default_factory=list)
+    next_cursor: str | None = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def _to_json(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(data):
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Decodifica o cursor; retorna None se ele for inválido ou adulterado."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+    if not isinstance(data, dict) or not {"s", "d", "v", "pk"} <= data.keys():
+        return None
+    if not isinstance(data["pk"], int) or data["v"] is None:
+        return None
+    return data
+
+
+def paginate_keyset(
+    queryset, sort_field, sort_key, descending=False, cursor=None, page_size=PAGE_SIZE
+):
+    """
+    Retorna uma KeysetPage do queryset ordenado por (sort_key, pk).
+
+    `sort_field` é o nome público da ordenação (ex.: "price") e vai dentro do
+    cursor: se o usuário trocar a ordenação, cursores antigos são ignorados e a
+    listagem recomeça do início. `sort_key` é o campo ou anotação usado no
+    ORDER BY e não pode ser nulo (use Coalesce nas anotações).
+    """
+    direction = "desc" if descending else "asc"
+    prefix = "-" if descending else ""
+    lookup = "lt" if descending else "gt"
+
+    queryset = queryset.order_by(f"{prefix}{sort_key}", f"{prefix}pk")
+
+    data = decode_cursor(cursor)
+    if data and data["s"] == sort_field and data["d"] == direction:
+        queryset = queryset.filter(
+            Q(**{f"{sort_key}__{lookup}": data["v"]})
+            | Q(**{sort_key: data["v"], f"pk__{lookup}": data["pk"]})
+        )
+
+    items = list(queryset[: page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor(
+            {
+                "s": sort_field,
+                "d": direction,
+                "v": _to_json(getattr(last, sort_key)),
+                "pk": last.pk,
+            }
+        )
+
+    return KeysetPage(items=items, next_cursor=next_cursor)
@@ -0,0 +1,307 @@
+"""
+Resumo do histórico de preços gravado em Product.
+
+`previous_price`, `last_price_change_at`, `price_change_count` e
+`recent_prices` (os últimos RECENT_PRICES registros) permitem que listagens,
+o modal de detalhes, o overview de histórico e a API mostrem preço anterior,
+tendência e sparkline sem consultar PriceHistory. Cada PriceHistory criado
+com save()/create() entra no resumo por `record_price` (signal
+`track_price_summary`); quem grava com bulk_create chama `record_prices`.
+`rebuild_price_summaries` recalcula tudo a partir do histórico e é usado pelo
+comando `rebuild_price_summaries`.
+
+Os mesmos pontos mantêm os rollups diários (PriceDailyRollup: abertura,
+máxima, mínima e fechamento por dia, no fuso do projeto), que o histórico de
+preços da tela e da API usa em vez dos registros brutos quando o período
+passa de DAILY_PRICES_AFTER_DAYS. `rebuild_daily_prices` os recalcula
+(comando `rebuild_daily_prices`).
+"""
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Exists, F, Max, Min, OuterRef, Window
+from django.db.models.functions import FirstValue, RowNumber, TruncDate
+from django.utils import timezone
+
+from .models import RECENT_PRICES, PriceDailyRollup, PriceHistory, Product
+from .queries import price_history_summary
+
+EMPTY_SUMMARY = {
+    "previous_price": None,
+    "last_price_change_at": None,
+    "price_change_count": 0,
+    "recent_prices": [],
+}
+
+REBUILD_CHUNK_SIZE = 1000
+
+# Períodos mais longos que isso são servidos pelos rollups diários
+DAILY_PRICES_AFTER_DAYS = 90
+
+
+def _price(value):
+    """
+    Preço como Decimal de 2 casas: o de um PriceHistory recém-criado é o que
+    foi atribuído, que pode ser str ("12.00") ou float.
+    """
+    return Decimal(str(value)).quantize(Decimal("0.01"))
+
+
+def _point(price, changed_at):
+    return [str(_price(price)), changed_at.isoformat()]
+
+
+def summary_after(state, price, changed_at):
+    """Resumo de `state` depois de um novo registro de preço."""
+    price = _price(price)
+    recent = state["recent_prices"] or []
+    return {
+        "previous_price": Decimal(recent[-1][0]) if recent else None,
+        "last_price_change_at": changed_at,
+        "price_change_count": state["price_change_count"] + 1,
+        "recent_prices": [*recent, _point(price, changed_at)][-RECENT_PRICES:],
+    }
+
+
+def _assign(instance, changes):
+    for name, value in changes.items():
+        setattr(instance, name, value)
+
+
+def record_price(entry, instance=None, state=None):
+    """
+    Acrescenta o registro `entry` (PriceHistory já gravado) ao resumo do
+    produto com um UPDATE. Sem `state` (o resumo atual), a linha do produto
+    é lida travada; `instance`, se informada, recebe os novos valores.
+    """
+    with transaction.atomic():
+        if state is None:
+            state = (
+                Product.objects.select_for_update()
+                .filter(pk=entry.product_id)
+                .values(*Product.PRICE_SUMMARY_FIELDS)
+                .first()
+            )
+            if state is None:
+                return
+        changes = summary_after(state, entry.price, entry.changed_at)
+        Product.objects.filter(pk=entry.product_id).update(**changes)
+        apply_daily_prices([entry])
+    if instance is not None:
+        _assign(instance, changes)
+
+
+def record_prices(states, entries):
+    """
+    Versão em lote de `record_price` para registros gravados por
+    bulk_create: `states` mapeia o id do produto para o resumo atual (as
+    linhas já travadas pelo chamador) e `entries` são os PriceHistory
+    criados. Um único bulk_update para todos os produtos.
+    """
+    changes = {}
+    for entry in sorted(entries, key=lambda e: (e.product_id, e.changed_at)):
+        state = changes.get(entry.product_id) or states[entry.product_id]
+        changes[entry.product_id] = summary_after(state, entry.price, entry.changed_at)
+    Product.objects.bulk_update(
+        [Product(pk=pk, **values) for pk, values in changes.items()],
+        Product.PRICE_SUMMARY_FIELDS,
+    )
+    apply_daily_prices(entries)
+
+
+DAILY_FIELDS = ("open", "high", "low", "close", "change_count")
+
+
+def apply_daily_prices(entries):
+    """
+    Soma os registros `entries` (PriceHistory já gravados) aos rollups
+    diários: uma leitura das linhas dos dias afetados, um bulk_create para os
+    dias novos e um bulk_update para os existentes. O chamador trava os
+    produtos (ou acabou de criá-los).
+    """
+    days = {}
+    for entry in sorted(entries, key=lambda e: (e.product_id, e.changed_at)):
+        key = (entry.product_id, timezone.localdate(entry.changed_at))
+        days.setdefault(key, []).append(_price(entry.price))
+    if not days:
+        return
+    existing = {
+        (row.product_id, row.day): row
+        for row in PriceDailyRollup.objects.filter(
+            product_id__in={product_id for product_id, _ in days},
+            day__in={day for _, day in days},
+        )
+    }
+    new, changed = [], []
+    for (product_id, day), prices in days.items():
+        row = existing.get((product_id, day))
+        if row is None:
+            first = prices[0]
+            row = PriceDailyRollup(
+                product_id=product_id,
+                day=day,
+                open=first,
+                high=first,
+                low=first,
+                close=first,
+                change_count=0,
+            )
+            new.append(row)
+        else:
+            changed.append(row)
+        row.high = max(row.high, *prices)
+        row.low = min(row.low, *prices)
+        row.close = prices[-1]
+        row.change_count += len(prices)
+    PriceDailyRollup.objects.bulk_create(new)
+    PriceDailyRollup.objects.bulk_update(changed, DAILY_FIELDS)
+
+
+def daily_price_rows(products):
+    """
+    Rollups diários calculados a partir de PriceHistory para os produtos de
+    `products`, com funções de janela (uma linha por produto e dia).
+    """
+    day = TruncDate("changed_at", tzinfo=timezone.get_current_timezone())
+    by_day = {"partition_by": [F("product_id"), day]}
+    chronological = [F("changed_at"), F("id")]
+    return (
+        PriceHistory.objects.filter(product__in=products)
+        .annotate(
+            day=day,
+            position=Window(RowNumber(), order_by=chronological, **by_day),
+            open=Window(FirstValue("price"), order_by=chronological, **by_day),
+            close=Window(
+                FirstValue("price"),
+                order_by=[F("changed_at").desc(), F("id").desc()],
+                **by_day,
+            ),
+            high=Window(Max("price"), **by_day),
+            low=Window(Min("price"), **by_day),
+            change_count=Window(Count("id"), **by_day),
+        )
+        .filter(position=1)
+        .order_by("product_id", "day")
+        .values("product_id", "day", *DAILY_FIELDS)
+    )
+
+
+def rebuild_daily_prices(products=None, chunk_size=REBUILD_CHUNK_SIZE):
+    """
+    Recalcula os rollups diários dos produtos de `products` (todos, se None)
+    a partir de PriceHistory, em lotes de `chunk_size` produtos. Retorna o
+    número de linhas gravadas.
+    """
+    if products is None:
+        products = Product.objects.all()
+    product_ids = list(products.order_by("pk").values_list("pk", flat=True))
+    written = 0
+    for start in range(0, len(product_ids), chunk_size):
+        chunk = product_ids[start : start + chunk_size]
+        rows = [PriceDailyRollup(**row) for row in daily_price_rows(chunk)]
+        with transaction.atomic():
+            PriceDailyRollup.objects.filter(product_id__in=chunk).delete()
+            PriceDailyRollup.objects.bulk_create(rows, batch_size=1000)
+        written += len(rows)
+    return written
+
+
+def products_without_history():
+    """Produtos sem nenhum registro de preço (anti-join com NOT EXISTS)."""
+    return Product.objects.filter(
+        ~Exists(PriceHistory.objects.filter(product=OuterRef("pk")))
+    )
+
+
+def populate_missing_history(batch_size=REBUILD_CHUNK_SIZE, after=0):
+    """
+    Cria o registro inicial de preço (e o resumo) dos produtos sem
+    histórico, em lotes de `batch_size` por pk crescente a partir de
+    `after`, cada um numa transação. Gera (último pk do lote, registros
+    criados) depois de cada lote, para o chamador guardar onde retomar.
+    """
+    while True:
+        with transaction.atomic():
+            rows = list(
+                products_without_history()
+                .filter(pk__gt=after)
+                .order_by("pk")
+                .select_for_update()
+                .values_list("pk", "price")[:batch_size]
+            )
+            if not rows:
+                return
+            history = PriceHistory.objects.bulk_create(
+                [PriceHistory(product_id=pk, price=price) for pk, price in rows]
+            )
+            record_prices({pk: EMPTY_SUMMARY for pk, _ in rows}, history)
+        after = rows[-1][0]
+        yield after, len(history)
+
+
+def use_daily_prices(product, start=None, end=None):
+    """
+    Se o período [start, end] (datas; sem início, desde o cadastro do
+    produto; sem fim, até hoje) passa de DAILY_PRICES_AFTER_DAYS dias.
+    """
+    start = start or timezone.localdate(product.created_at)
+    end = end or timezone.localdate()
+    return end - start > timedelta(days=DAILY_PRICES_AFTER_DAYS)
+
+
+def rebuild_price_summaries(products=None, chunk_size=REBUILD_CHUNK_SIZE):
+    """
+    Recalcula o resumo de preços dos produtos de `products` (todos, se
+    None) a partir de PriceHistory, em lotes de `chunk_size` produtos.
+    Retorna o número de produtos atualizados.
+    """
+    if products is None:
+        products = Product.objects.all()
+    product_ids = list(products.order_by("pk").values_list("pk", flat=True))
+    for start in range(0, len(product_ids), chunk_size):
+        chunk = product_ids[start : start + chunk_size]
+        summary = price_history_summary(Product.objects.filter(pk__in=chunk))
+        rows = []
+        for pk in chunk:
+            item = summary.get(pk)
+            values = dict(EMPTY_SUMMARY)
+            if item:
+                values = {
+                    "previous_price": item["previous_price"],
+                    "last_price_change_at": item["changed_at"],
+                    "price_change_count": item["changes"],
+                    "recent_prices": [_point(*point) for point in item["points"]],
+                }
+            rows.append(Product(pk=pk, **values))
+        with transaction.atomic():
+            Product.objects.bulk_update(rows, Product.PRICE_SUMMARY_FIELDS)
+    return len(product_ids)
+
+
+def price_history_between(product, start=None, end=None):
+    """Registros de PriceHistory do produto entre as datas `start` e `end` (inclusive)."""
+    history = product.price_history.all()
+    if start:
+        history = history.filter(
+            changed_at__gte=timezone.make_aware(datetime.combine(start, time.min))
+        )
+    if end:
+        # Até o fim do dia final
+        history = history.filter(
+            changed_at__lt=timezone.make_aware(
+                datetime.combine(end + timedelta(days=1), time.min)
+            )
+        )
+    return history
+
+
+def daily_prices_between(product, start=None, end=None):
+    """Rollups diários do produto entre as datas `start` e `end` (inclusive)."""
+    daily = product.daily_prices.all()
+    if start:
+        daily = daily.filter(day__gte=start)
+    if end:
+        daily = daily.filter(day__lte=end)
+    return daily
@@ -0,0 +1,88 @@
+"""
+Consultas reutilizáveis sobre produtos, compartilhadas pelas views e pela API.
+"""
+
+from django.db.models import Count, DecimalField, F, Prefetch, Sum, Window
+from django.db.models.functions import Lag, RowNumber
+
+from .models import RECENT_PRICES, Category, PriceHistory, Product
+
+# Colunas de Category usadas pelos badges das listagens
+CATEGORY_BADGE_FIELDS = ("id", "name", "color")
+
+
+def for_listing(queryset):
+    """
+    Prepara um queryset de produtos para as listagens: carrega o dono no
+    mesmo SELECT e as categorias em uma única consulta extra (só com as
+    colunas dos badges), mantendo o número de queries constante por página.
+    """
+    return queryset.select_related("user").prefetch_related(
+        Prefetch("categories", queryset=Category.objects.only(*CATEGORY_BADGE_FIELDS))
+    )
+
+
+def inventory_stats(queryset):
+    """
+    Calcula total de produtos, itens em estoque e valor estimado em uma única
+    consulta agregada.
+
+    A agregação roda sobre `pk IN (subquery)`, então joins de M2M usados nos
+    filtros (ex.: categorias) não duplicam linhas nem inflam as somas, e a
+    ordenação/anotações do queryset de origem são descartadas.
+    """
+    product_ids = queryset.order_by().values("pk")
+    totals = Product.objects.filter(pk__in=product_ids).aggregate(
+        total_count=Count("pk"),
+        total_stock=Sum("stock"),
+        total_value=Sum(F("price") * F("stock"), output_field=DecimalField()),
+    )
+    return {
+        "total_count": totals["total_count"],
+        "total_stock": totals["total_stock"] or 0,
+        "total_value": totals["total_value"] or 0,
+    }
+
+
+def price_history_summary(queryset, points=RECENT_PRICES):
+    """
+    Resume o histórico de preços dos produtos de `queryset` numa única
+    consulta com funções de janela, sem carregar o histórico inteiro:
+    `ROW_NUMBER()` limita cada produto aos `points` registros mais recentes,
+    `COUNT(*) OVER` traz o total de alterações e `LAG()` o preço anterior.
+
+    Retorna {product_id: {"prices", "points", "changes", "price",
+    "previous_price", "changed_at"}}, com `prices` e `points` (pares preço,
+    data) em ordem cronológica e `previous_price` None quando o produto só
+    tem um registro.
+    """
+    by_product = {"partition_by": [F("product_id")]}
+    rows = (
+        PriceHistory.objects.filter(product__in=queryset.order_by().values("pk"))
+        .annotate(
+            position=Window(
+                RowNumber(),
+                order_by=[F("changed_at").desc(), F("id").desc()],
+                **by_product,
+            ),
+            changes=Window(Count("id"), **by_product),
+            previous_price=Window(
+                Lag("price"), order_by=[F("changed_at"), F("id")], **by_product
+            ),
+        )
+        .filter(position__lte=points)
+        .order_by("product_id", "-position")
+        .values_list(
+            "product_id", "price", "changed_at", "changes", "previous_price"
+        )
+    )
+    summary = {}
+    for product_id, price, changed_at, changes, previous_price in rows:
+        item = summary.setdefault(
+            product_id, {"prices": [], "points": [], "changes": changes}
+        )
+        item["prices"].append(price)
+        item["points"].append((price, changed_at))
+        # O último registro lido é o mais recente
+        item.update(price=price, previous_price=previous_price, changed_at=changed_at)
+    return summary
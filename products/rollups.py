@@ -0,0 +1,388 @@
+"""
+Manutenção dos rollups de inventário (InventoryRollup).
+
+Os signals de Product chamam as funções `apply_*` com a diferença de cada
+alteração; `rebuild_rollups`/`verify_rollups` recalculam tudo a partir de
+Product e são usados pelo comando `rebuild_inventory_rollups`.
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+
+from .models import InventoryRollup, Product
+
+ProductCategory = Product.categories.through
+
+
+def _contribution(stock, price, sign=1):
+    stock = int(stock or 0)
+    price = Decimal(str(price or 0))
+    return (sign, sign * stock, sign * price * stock)
+
+
+def _bump(user_id, category_id, is_public, delta):
+    count, stock, value = delta
+    if not user_id or not (count or stock or value):
+        return
+    rows = InventoryRollup.objects.filter(
+        user_id=user_id, category_id=category_id, is_public=is_public
+    )
+    changes = {
+        "total_count": F("total_count") + count,
+        "total_stock": F("total_stock") + stock,
+        "total_value": F("total_value") + value,
+    }
+    if rows.update(**changes):
+        return
+    _, created = InventoryRollup.objects.get_or_create(
+        user_id=user_id,
+        category_id=category_id,
+        is_public=is_public,
+        defaults={"total_count": count, "total_stock": stock, "total_value": value},
+    )
+    if not created:
+        # Outra requisição criou a linha entre o UPDATE e o INSERT
+        rows.update(**changes)
+
+
+def _bump_product(user_id, category_ids, is_public, delta):
+    _bump(user_id, None, is_public, delta)
+    for category_id in category_ids:
+        _bump(user_id, category_id, is_public, delta)
+
+
+ROLLUP_FIELDS = ("user_id", "is_public", "price", "stock")
+
+
+def load_previous_state(instance):
+    """
+    Estado persistido dos campos de Product que afetam os rollups. Usa os
+    valores guardados na leitura da instância e só consulta o banco quando
+    eles não são conhecidos.
+    """
+    if instance._state.adding or instance.pk is None:
+        return None
+    loaded = instance.loaded_values
+    if loaded is not None and all(name in loaded for name in ROLLUP_FIELDS):
+        return {name: loaded[name] for name in ROLLUP_FIELDS}
+    return (
+        Product.objects.filter(pk=instance.pk)
+        .values(*ROLLUP_FIELDS)
+        .first()
+    )
+
+
+def apply_product_change(instance, previous):
+    current = {
+        "user_id": instance.user_id,
+        "is_public": instance.is_public,
+        "price": Decimal(str(instance.price)),
+        "stock": int(instance.stock),
+    }
+    if previous == current:
+        return
+
+    # Num produto recém-criado as categorias ainda não foram vinculadas
+    category_ids = (
+        list(instance.categories.values_list("id", flat=True)) if previous else []
+    )
+    if previous:
+        _bump_product(
+            previous["user_id"],
+            category_ids,
+            previous["is_public"],
+            _contribution(previous["stock"], previous["price"], sign=-1),
+        )
+    _bump_product(
+        current["user_id"],
+        category_ids,
+        current["is_public"],
+        _contribution(current["stock"], current["price"]),
+    )
+
+
+def apply_product_delete(instance, category_ids):
+    _bump_product(
+        instance.user_id,
+        category_ids,
+        instance.is_public,
+        _contribution(instance.stock, instance.price, sign=-1),
+    )
+
+
+def apply_stock_delta(product_id, state, delta):
+    """
+    Soma `delta` unidades ao estoque de um produto nos rollups (total e
+    categorias) com um único UPDATE. Usado quando o estoque muda por
+    queryset.update(), sem passar pelos signals; `state` traz user_id,
+    is_public e price do produto.
+    """
+    if not delta or not state["user_id"]:
+        return
+    links = ProductCategory.objects.filter(product_id=product_id).values(
+        "category_id"
+    )
+    InventoryRollup.objects.filter(
+        Q(category__isnull=True) | Q(category__in=links),
+        user_id=state["user_id"],
+        is_public=state["is_public"],
+    ).update(
+        total_stock=F("total_stock") + delta,
+        total_value=F("total_value") + Decimal(str(state["price"])) * delta,
+    )
+
+
+def apply_stock_deltas(states, deltas):
+    """
+    Versão em lote de `apply_stock_delta`: `states` mapeia o id do produto
+    para user_id/is_public/price e `deltas` para a variação de estoque. As
+    variações são somadas por linha de rollup antes de gravar.
+    """
+    categories = {}
+    for product_id, category_id in ProductCategory.objects.filter(
+        product_id__in=deltas
+    ).values_list("product_id", "category_id"):
+        categories.setdefault(product_id, []).append(category_id)
+
+    totals = {}
+    for product_id, delta in deltas.items():
+        state = states[product_id]
+        value = Decimal(str(state["price"])) * delta
+        for category_id in [None, *categories.get(product_id, [])]:
+            key = (state["user_id"], category_id, state["is_public"])
+            stock_total, value_total = totals.get(key, (0, Decimal("0")))
+            totals[key] = (stock_total + delta, value_total + value)
+
+    for (user_id, category_id, is_public), (stock, value) in totals.items():
+        _bump(user_id, category_id, is_public, (0, stock, value))
+
+
+def apply_price_changes(states, prices):
+    """
+    Aplica aos rollups novos preços gravados por queryset.update(): `states`
+    mapeia o id do produto para user_id/is_public/price/stock anteriores e
+    `prices` para o novo preço. Só o valor total muda.
+    """
+    categories = {}
+    for product_id, category_id in ProductCategory.objects.filter(
+        product_id__in=prices
+    ).values_list("product_id", "category_id"):
+        categories.setdefault(product_id, []).append(category_id)
+
+    totals = {}
+    for product_id, price in prices.items():
+        state = states[product_id]
+        value = (Decimal(str(price)) - Decimal(str(state["price"]))) * state["stock"]
+        for category_id in [None, *categories.get(product_id, [])]:
+            key = (state["user_id"], category_id, state["is_public"])
+            totals[key] = totals.get(key, Decimal("0")) + value
+
+    for (user_id, category_id, is_public), value in totals.items():
+        _bump(user_id, category_id, is_public, (0, 0, value))
+
+
+def apply_visibility_changes(states, is_public):
+    """
+    Aplica aos rollups a troca de visibilidade gravada por queryset.update():
+    `states` mapeia o id do produto para user_id/is_public/price/stock
+    anteriores; a contribuição de cada produto que mudou sai das linhas da
+    visibilidade antiga e entra nas da nova, somada por linha de rollup.
+    """
+    changed = {
+        pk: state for pk, state in states.items() if state["is_public"] != is_public
+    }
+    categories = {}
+    for product_id, category_id in ProductCategory.objects.filter(
+        product_id__in=changed
+    ).values_list("product_id", "category_id"):
+        categories.setdefault(product_id, []).append(category_id)
+
+    totals = {}
+    for product_id, state in changed.items():
+        count, stock, value = _contribution(state["stock"], state["price"])
+        for category_id in [None, *categories.get(product_id, [])]:
+            for visibility, sign in ((state["is_public"], -1), (is_public, 1)):
+                key = (state["user_id"], category_id, visibility)
+                total = totals.get(key, (0, 0, Decimal("0")))
+                totals[key] = (
+                    total[0] + sign * count,
+                    total[1] + sign * stock,
+                    total[2] + sign * value,
+                )
+
+    for (user_id, category_id, visibility), delta in totals.items():
+        _bump(user_id, category_id, visibility, delta)
+
+
+def apply_products_created(entries):
+    """
+    Soma aos rollups produtos criados por bulk_create (sem signals).
+    `entries` são pares (produto, ids das categorias vinculadas); as
+    contribuições são somadas por linha de rollup antes de gravar.
+    """
+    totals = {}
+    for product, category_ids in entries:
+        count, stock, value = _contribution(product.stock, product.price)
+        for category_id in [None, *category_ids]:
+            key = (product.user_id, category_id, product.is_public)
+            total = totals.get(key, (0, 0, Decimal("0")))
+            totals[key] = (total[0] + count, total[1] + stock, total[2] + value)
+
+    for (user_id, category_id, is_public), delta in totals.items():
+        _bump(user_id, category_id, is_public, delta)
+
+
+def apply_category_links(instance, reverse, pk_set, sign):
+    """
+    Aplica vínculos produto↔categoria adicionados (sign=1) ou removidos
+    (sign=-1). Com `reverse`, `instance` é a categoria e `pk_set` os produtos.
+    """
+    if not pk_set:
+        return
+    if not reverse:
+        delta = _contribution(instance.stock, instance.price, sign)
+        for category_id in pk_set:
+            _bump(instance.user_id, category_id, instance.is_public, delta)
+        return
+
+    groups = (
+        Product.objects.filter(pk__in=pk_set)
+        .values("user_id", "is_public")
+        .annotate(
+            total_count=Count("pk"),
+            total_stock=Sum("stock"),
+            total_value=Sum(F("price") * F("stock"), output_field=DecimalField()),
+        )
+    )
+    for group in groups:
+        _bump(
+            group["user_id"],
+            instance.pk,
+            group["is_public"],
+            (
+                sign * group["total_count"],
+                sign * (group["total_stock"] or 0),
+                sign * (group["total_value"] or 0),
+            ),
+        )
+
+
+def compute_rollups(user=None):
+    """
+    Recalcula os totais a partir de Product, no formato
+    {(user_id, category_id, is_public): (count, stock, value)}.
+    """
+    products = Product.objects.filter(user__isnull=False)
+    links = ProductCategory.objects.filter(product__user__isnull=False)
+    if user is not None:
+        products = products.filter(user=user)
+        links = links.filter(product__user=user)
+
+    totals = {}
+    for row in products.values("user_id", "is_public").annotate(
+        total_count=Count("pk"),
+        total_stock=Sum("stock"),
+        total_value=Sum(F("price") * F("stock"), output_field=DecimalField()),
+    ):
+        totals[(row["user_id"], None, row["is_public"])] = (
+            row["total_count"],
+            row["total_stock"] or 0,
+            row["total_value"] or Decimal("0"),
+        )
+    for row in links.values(
+        "product__user_id", "category_id", "product__is_public"
+    ).annotate(
+        total_count=Count("product_id"),
+        total_stock=Sum("product__stock"),
+        total_value=Sum(
+            F("product__price") * F("product__stock"), output_field=DecimalField()
+        ),
+    ):
+        totals[
+            (row["product__user_id"], row["category_id"], row["product__is_public"])
+        ] = (
+            row["total_count"],
+            row["total_stock"] or 0,
+            row["total_value"] or Decimal("0"),
+        )
+    return totals
+
+
+def rebuild_rollups(user=None):
+    """Reconstrói os rollups (de um usuário ou de todos). Retorna o nº de linhas."""
+    totals = compute_rollups(user)
+    with transaction.atomic():
+        rows = InventoryRollup.objects.all()
+        if user is not None:
+            rows = rows.filter(user=user)
+        rows.delete()
+        InventoryRollup.objects.bulk_create(
+            [
+                InventoryRollup(
+                    user_id=user_id,
+                    category_id=category_id,
+                    is_public=is_public,
+                    total_count=count,
+                    total_stock=stock,
+                    total_value=value,
+                )
+                for (user_id, category_id, is_public), (
+                    count,
+                    stock,
+                    value,
+                ) in totals.items()
+            ],
+            batch_size=1000,
+        )
+    return len(totals)
+
+
+def verify_rollups(user=None):
+    """
+    Compara os rollups armazenados com o recálculo e retorna a lista de
+    divergências como (chave, esperado, armazenado).
+    """
+    expected = compute_rollups(user)
+    rows = InventoryRollup.objects.all()
+    if user is not None:
+        rows = rows.filter(user=user)
+    stored = {
+        (r.user_id, r.category_id, r.is_public): (
+            r.total_count,
+            r.total_stock,
+            r.total_value,
+        )
+        for r in rows
+    }
+    empty = (0, 0, Decimal("0"))
+    mismatches = []
+    for key in expected.keys() | stored.keys():
+        want = expected.get(key, empty)
+        got = stored.get(key, empty)
+        if want != got:
+            mismatches.append((key, want, got))
+    return mismatches
+
+
+def rollup_stats(user=None, is_public=None, category_id=None):
+    """
+    Lê as estatísticas de inventário já agregadas, no mesmo formato de
+    `queries.inventory_stats`, sem varrer a tabela de produtos.
+    """
+    rows = InventoryRollup.objects.filter(category_id=category_id or None)
+    if user is not None:
+        rows = rows.filter(user=user)
+    if is_public is not None:
+        rows = rows.filter(is_public=is_public)
+    totals = rows.aggregate(
+        total_count=Sum("total_count"),
+        total_stock=Sum("total_stock"),
+        total_value=Sum("total_value"),
+    )
+    return {
+        "total_count": totals["total_count"] or 0,
+        "total_stock": totals["total_stock"] or 0,
+        "total_value": totals["total_value"] or 0,
+    }
@@ -0,0 +1,375 @@
+"""
+Busca textual de produtos (nome e descrição).
+
+O backend é escolhido pelo banco em uso:
+
+- PostgreSQL: tabela `products_product_search` com um `tsvector` (config
+  "portuguese") e índice GIN;
+- SQLite: tabela virtual FTS5 `products_product_fts`;
+- outros bancos: `icontains`, como antes.
+
+Há também um modo aproximado (`mode="fuzzy"`), por trigramas do nome, que
+tolera erros de digitação e nomes parciais: `pg_trgm` com índice GIN no
+PostgreSQL e a tabela pré-calculada `products_product_trigram` no SQLite.
+A similaridade é a fração dos trigramas da busca presentes no nome (a
+`word_similarity` do `pg_trgm`).
+
+As tabelas são criadas pelas migrações 0013/0014 e mantidas pelos signals de
+Product (`index_products`/`remove_products`). Buscas retornam o queryset
+filtrado e anotado com `search_rank` (maior = mais relevante).
+"""
+
+import math
+import re
+import unicodedata
+
+from django.db import connection, transaction
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = "portuguese"
+PG_TABLE = "products_product_search"
+FTS_TABLE = "products_product_fts"
+TRIGRAM_TABLE = "products_product_trigram"
+
+SEARCH_MODES = ("fulltext", "fuzzy")
+# Similaridade mínima no modo aproximado
+FUZZY_THRESHOLD = 0.5
+
+# Limita o número de termos para não gerar consultas gigantes
+MAX_TERMS = 8
+
+
+def _terms(q):
+    return re.findall(r"\w+", q.lower())[:MAX_TERMS]
+
+
+def trigrams(text):
+    """
+    Trigramas de `text` no formato do `pg_trgm`: cada palavra em minúsculas,
+    sem acentos, com dois espaços antes e um depois.
+    """
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    grams = set()
+    for word in re.findall(r"[^\W_]+", text):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _product_column(field):
+    from .models import Product
+
+    qn = connection.ops.quote_name
+    return f"{qn(Product._meta.db_table)}.{qn(Product._meta.get_field(field).column)}"
+
+
+def _product_pk_column():
+    from .models import Product
+
+    qn = connection.ops.quote_name
+    return f"{qn(Product._meta.db_table)}.{qn(Product._meta.pk.column)}"
+
+
+class SimpleSearchBackend:
+    """Fallback sem índice: varredura com icontains."""
+
+    def search(self, queryset, q, ranked=False):
+        queryset = queryset.filter(Q(name__icontains=q) | Q(description__icontains=q))
+        if ranked:
+            queryset = queryset.annotate(search_rank=RawSQL("1.0", [], FloatField()))
+        return queryset
+
+    def fuzzy(self, queryset, q, ranked=False):
+        queryset = queryset.filter(name__icontains=q)
+        if ranked:
+            queryset = queryset.annotate(search_rank=RawSQL("1.0", [], FloatField()))
+        return queryset
+
+    def index(self, product_ids):
+        pass
+
+    def remove(self, product_ids):
+        pass
+
+    def rebuild(self):
+        return 0
+
+
+class PostgresSearchBackend(SimpleSearchBackend):
+    document_sql = (
+        "setweight(to_tsvector(%(config)s::regconfig, coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector(%(config)s::regconfig, coalesce(description, '')), 'B')"
+    )
+
+    def _tsquery(self, terms):
+        # Prefixo em cada termo para manter o comportamento de busca parcial
+        return " & ".join(f"{term}:*" for term in terms)
+
+    def search(self, queryset, q, ranked=False):
+        terms = _terms(q)
+        if not terms:
+            return super().search(queryset, q, ranked)
+        tsquery = self._tsquery(terms)
+        queryset = queryset.filter(
+            pk__in=RawSQL(
+                f"SELECT product_id FROM {PG_TABLE} "
+                "WHERE document @@ to_tsquery(%s::regconfig, %s)",
+                [SEARCH_CONFIG, tsquery],
+            )
+        )
+        if ranked:
+            queryset = queryset.annotate(
+                search_rank=RawSQL(
+                    f"SELECT ts_rank(document, to_tsquery(%s::regconfig, %s))::float8 "
+                    f"FROM {PG_TABLE} WHERE product_id = {_product_pk_column()}",
+                    [SEARCH_CONFIG, tsquery],
+                    FloatField(),
+                )
+            )
+        return queryset
+
+    def fuzzy(self, queryset, q, ranked=False):
+        q = q.strip()
+        if not q:
+            return super().fuzzy(queryset, q, ranked)
+        name = _product_column("name")
+        # O operador <% usa o índice GIN (gin_trgm_ops) com o limiar aplicado
+        # por _fuzzy_threshold; word_similarity() só confere o resultado.
+        # Os filtros entram na própria consulta, junto dos filtros do
+        # chamador (ex.: dono), e não numa subconsulta sobre a tabela toda
+        queryset = queryset.filter(
+            RawSQL(f"%s <%% {name}", [q], BooleanField()),
+            RawSQL(
+                f"word_similarity(%s, {name}) >= %s",
+                [q, FUZZY_THRESHOLD],
+                BooleanField(),
+            ),
+        )
+        if ranked:
+            # word_similarity (como o ts_rank acima) é float4: em float8, o
+            # valor lido pelo Python é o mesmo que o cursor da paginação
+            # compara, e empates não pulam itens entre as páginas
+            queryset = queryset.annotate(
+                search_rank=RawSQL(
+                    f"word_similarity(%s, {name})::float8",
+                    [q],
+                    FloatField(),
+                )
+            )
+        return queryset
+
+    def index(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        document = self.document_sql % {"config": "%s"}
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {PG_TABLE} (product_id, document) "
+                f"SELECT id, {document} FROM products_product WHERE id = ANY(%s) "
+                "ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+                [SEARCH_CONFIG, SEARCH_CONFIG, product_ids],
+            )
+
+    def remove(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {PG_TABLE} WHERE product_id = ANY(%s)", [product_ids]
+            )
+
+    def rebuild(self):
+        document = self.document_sql % {"config": "%s"}
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {PG_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {PG_TABLE} (product_id, document) "
+                f"SELECT id, {document} FROM products_product",
+                [SEARCH_CONFIG, SEARCH_CONFIG],
+            )
+            return cursor.rowcount
+
+
+def _fuzzy_threshold(execute, sql, params, many, context):
+    """
+    execute_wrapper das conexões PostgreSQL: consultas com o operador <%
+    rodam numa transação que define pg_trgm.word_similarity_threshold só
+    para ela (`set_config(..., true)`, como SET LOCAL), sem deixá-lo na
+    sessão (reaproveitada pelo pool).
+    """
+    if "<%%" not in sql:
+        return execute(sql, params, many, context)
+    with transaction.atomic(using=context["connection"].alias):
+        context["cursor"].execute(
+            "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)",
+            [str(FUZZY_THRESHOLD)],
+        )
+        return execute(sql, params, many, context)
+
+
+def install_fuzzy_threshold(sender, connection, **kwargs):
+    """Receiver de connection_created (ligado em ProductsConfig.ready)."""
+    if connection.vendor == "postgresql" and (
+        _fuzzy_threshold not in connection.execute_wrappers
+    ):
+        connection.execute_wrappers.append(_fuzzy_threshold)
+
+
+
+
+class SQLiteSearchBackend(SimpleSearchBackend):
+    def _match(self, terms):
+        # Termos entre aspas (sem operadores do usuário) e com prefixo
+        return " ".join(f'"{term}"*' for term in terms)
+
+    def search(self, queryset, q, ranked=False):
+        terms = _terms(q)
+        if not terms:
+            return super().search(queryset, q, ranked)
+        match = self._match(terms)
+        queryset = queryset.filter(
+            pk__in=RawSQL(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match]
+            )
+        )
+        if ranked:
+            # bm25() é menor para os melhores resultados
+            queryset = queryset.annotate(
+                search_rank=RawSQL(
+                    f"SELECT -bm25({FTS_TABLE}, 2.0, 1.0) FROM {FTS_TABLE} "
+                    f"WHERE {FTS_TABLE} MATCH %s AND rowid = {_product_pk_column()}",
+                    [match],
+                    FloatField(),
+                )
+            )
+        return queryset
+
+    def fuzzy(self, queryset, q, ranked=False):
+        grams = sorted(trigrams(q))
+        if not grams:
+            return super().fuzzy(queryset, q, ranked)
+        placeholders = ", ".join(["%s"] * len(grams))
+        # Cada produto tem uma linha por trigrama distinto, então COUNT(*)
+        # é o número de trigramas da busca presentes no nome
+        min_common = math.ceil(FUZZY_THRESHOLD * len(grams))
+        queryset = queryset.filter(
+            pk__in=RawSQL(
+                f"SELECT product_id FROM {TRIGRAM_TABLE} "
+                f"WHERE trigram IN ({placeholders}) "
+                "GROUP BY product_id HAVING COUNT(*) >= %s",
+                [*grams, min_common],
+            )
+        )
+        if ranked:
+            queryset = queryset.annotate(
+                search_rank=RawSQL(
+                    f"SELECT CAST(COUNT(*) AS REAL) / %s FROM {TRIGRAM_TABLE} "
+                    f"WHERE product_id = {_product_pk_column()} "
+                    f"AND trigram IN ({placeholders})",
+                    [len(grams), *grams],
+                    FloatField(),
+                )
+            )
+        return queryset
+
+    def _insert_trigrams(self, cursor, rows):
+        cursor.executemany(
+            f"INSERT INTO {TRIGRAM_TABLE} (trigram, product_id) VALUES (%s, %s)",
+            [(gram, pk) for pk, name in rows for gram in trigrams(name)],
+        )
+
+    def index(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        placeholders = ", ".join(["%s"] * len(product_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", product_ids
+            )
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, description) "
+                f"SELECT id, name, description FROM products_product "
+                f"WHERE id IN ({placeholders})",
+                product_ids,
+            )
+            cursor.execute(
+                f"DELETE FROM {TRIGRAM_TABLE} WHERE product_id IN ({placeholders})",
+                product_ids,
+            )
+            cursor.execute(
+                f"SELECT id, name FROM products_product WHERE id IN ({placeholders})",
+                product_ids,
+            )
+            self._insert_trigrams(cursor, cursor.fetchall())
+
+    def remove(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        placeholders = ", ".join(["%s"] * len(product_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", product_ids
+            )
+            cursor.execute(
+                f"DELETE FROM {TRIGRAM_TABLE} WHERE product_id IN ({placeholders})",
+                product_ids,
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, name, description) "
+                "SELECT id, name, description FROM products_product"
+            )
+            count = cursor.rowcount
+            cursor.execute(f"DELETE FROM {TRIGRAM_TABLE}")
+            cursor.execute("SELECT id, name FROM products_product")
+            self._insert_trigrams(cursor, cursor.fetchall())
+            return count
+
+
+BACKENDS = {
+    "postgresql": PostgresSearchBackend,
+    "sqlite": SQLiteSearchBackend,
+}
+
+
+def get_backend():
+    return BACKENDS.get(connection.vendor, SimpleSearchBackend)()
+
+
+def search_products(queryset, q, ranked=False, mode="fulltext"):
+    """
+    Filtra `queryset` pelos produtos que casam com `q`. Com `ranked=True`,
+    anota `search_rank` e ordena pelos mais relevantes. `mode="fuzzy"` usa a
+    busca aproximada por trigramas do nome.
+    """
+    backend = get_backend()
+    if mode == "fuzzy":
+        queryset = backend.fuzzy(queryset, q, ranked=ranked)
+    else:
+        queryset = backend.search(queryset, q, ranked=ranked)
+    if ranked:
+        queryset = queryset.order_by("-search_rank", "pk")
+    return queryset
+
+
+def index_products(product_ids):
+    """(Re)indexa os produtos informados; usado pelos signals e cargas em massa."""
+    get_backend().index(product_ids)
+
+
+def remove_products(product_ids):
+    get_backend().remove(product_ids)
+
+
+def rebuild_search_index():
+    """Reconstrói o índice inteiro. Retorna o número de produtos indexados."""
+    return get_backend().rebuild()
@@ -0,0 +1,301 @@
+"""
+Movimentações de estoque sem condição de corrida.
+
+`record_movement` aplica a movimentação com um único UPDATE condicional
+(`stock = stock - q WHERE stock >= q` nas saídas) na mesma transação do
+insert da movimentação: duas saídas concorrentes nunca vendem além do
+estoque, e a linha do produto fica travada pelo UPDATE até o commit, o que
+também serializa o saldo (`balance_after`) do livro. A constraint
+`product_stock_non_negative` garante o mesmo no banco.
+
+Como o UPDATE não passa por `Product.save()`, os signals de save não rodam:
+a movimentação já é registrada aqui e os rollups recebem só a diferença.
+
+`record_movements` faz o mesmo para um lote (API de integração/PDV), e
+`apply_inventory_count` grava o resultado de uma contagem de inventário
+(estoque contado por produto) como ajustes de entrada/saída.
+"""
+
+import csv
+import itertools
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .models import Product, ProductMovement
+from .rollups import apply_stock_delta, apply_stock_deltas
+
+MOVEMENT_TYPES = {code for code, _ in ProductMovement.MOVEMENT_TYPES}
+
+
+class StockError(Exception):
+    """Movimentação de estoque inválida."""
+
+
+class InsufficientStock(StockError):
+    def __init__(self, product_id, requested, available):
+        self.product_id = product_id
+        self.requested = requested
+        self.available = available
+        super().__init__(
+            f"Estoque insuficiente para esta saída. Estoque atual: {available}"
+        )
+
+
+def record_movement(product, movement_type, quantity, reason=""):
+    """
+    Registra uma entrada ("IN") ou saída ("OUT") de `quantity` unidades.
+    Retorna a ProductMovement criada e atualiza `product.stock` em memória;
+    levanta InsufficientStock se a saída deixaria o estoque negativo.
+    """
+    if movement_type not in MOVEMENT_TYPES:
+        raise StockError(f"Tipo de movimentação inválido: {movement_type}")
+    if quantity is None or quantity <= 0:
+        raise StockError("A quantidade deve ser maior que zero.")
+
+    delta = quantity if movement_type == "IN" else -quantity
+    with transaction.atomic():
+        rows = Product.objects.filter(pk=product.pk)
+        if delta < 0:
+            rows = rows.filter(stock__gte=quantity)
+        updated = rows.update(stock=F("stock") + delta, updated_at=timezone.now())
+        if not updated:
+            available = (
+                Product.objects.filter(pk=product.pk)
+                .values_list("stock", flat=True)
+                .first()
+            )
+            raise InsufficientStock(product.pk, quantity, available)
+
+        # A linha está travada pelo UPDATE: o valor lido é o saldo final
+        current = Product.objects.values("stock", "price", "user_id", "is_public").get(
+            pk=product.pk
+        )
+        movement = ProductMovement.objects.create(
+            product=product,
+            type=movement_type,
+            quantity=quantity,
+            reason=reason,
+            balance_after=current["stock"],
+        )
+        apply_stock_delta(product.pk, current, delta)
+
+    product.stock = current["stock"]
+    # O novo estoque já está persistido: não é uma alteração pendente
+    product._snapshot(["stock"])
+    return movement
+
+
+# Limite de linhas por lote, para manter a transação curta
+MAX_BATCH_LINES = 1000
+
+
+@dataclass
+class MovementLineResult:
+    movement: ProductMovement | None = None
+    error: str | None = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+@dataclass
+class MovementBatch:
+    lines: list = field(default_factory=list)
+    applied: bool = False
+
+    @property
+    def failed(self):
+        return sum(not line.ok for line in self.lines)
+
+
+def record_movements(user, lines, atomic=True):
+    """
+    Aplica um lote de movimentações de `user`. Cada linha é um dict com
+    product (id), type, quantity e reason.
+
+    Os produtos são validados e travados numa única consulta, o saldo é
+    conferido linha a linha na ordem recebida, e o lote é gravado com um
+    UPDATE por CASE no estoque e um bulk_create das movimentações. Com
+    `atomic=True`, qualquer linha inválida cancela o lote inteiro; senão,
+    apenas as linhas válidas são aplicadas.
+    """
+    batch = MovementBatch()
+    with transaction.atomic():
+        states = {
+            row["pk"]: row
+            for row in Product.objects.select_for_update()
+            .filter(pk__in={line["product"] for line in lines}, user=user)
+            .values("pk", "stock", "price", "user_id", "is_public")
+        }
+        running = {pk: state["stock"] for pk, state in states.items()}
+
+        for line in lines:
+            pk = line["product"]
+            if pk not in states:
+                batch.lines.append(MovementLineResult(error="Produto não encontrado."))
+                continue
+            quantity = line["quantity"]
+            delta = quantity if line["type"] == "IN" else -quantity
+            if running[pk] + delta < 0:
+                batch.lines.append(
+                    MovementLineResult(
+                        error=(
+                            "Estoque insuficiente para esta saída. "
+                            f"Estoque atual: {running[pk]}"
+                        )
+                    )
+                )
+                continue
+            running[pk] += delta
+            batch.lines.append(
+                MovementLineResult(
+                    movement=ProductMovement(
+                        product_id=pk,
+                        type=line["type"],
+                        quantity=quantity,
+                        reason=line.get("reason", ""),
+                        balance_after=running[pk],
+                    )
+                )
+            )
+
+        if atomic and batch.failed:
+            return batch
+
+        deltas = {
+            pk: running[pk] - state["stock"]
+            for pk, state in states.items()
+            if running[pk] != state["stock"]
+        }
+        if deltas:
+            Product.objects.filter(pk__in=deltas).update(
+                stock=F("stock")
+                + Case(
+                    *[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                ),
+                updated_at=timezone.now(),
+            )
+            apply_stock_deltas(states, deltas)
+        ProductMovement.objects.bulk_create(
+            [line.movement for line in batch.lines if line.ok]
+        )
+        batch.applied = True
+    return batch
+
+
+# Cabeçalhos aceitos no CSV de contagem (o CSV exportado também serve)
+COUNT_ID_COLUMNS = ("product_id", "id", "produto")
+COUNT_QUANTITY_COLUMNS = ("counted", "contagem", "quantidade", "stock", "estoque")
+
+
+@dataclass
+class InventoryCount:
+    movements: list = field(default_factory=list)
+    unchanged: int = 0
+    # (id do produto, mensagem)
+    errors: list = field(default_factory=list)
+
+    @property
+    def adjusted(self):
+        return len(self.movements)
+
+
+def apply_inventory_count(user, counts, reason=ProductMovement.ADJUSTMENT_REASON):
+    """
+    Define o estoque dos produtos de `user` a partir de uma contagem
+    (`counts` mapeia o id do produto para a quantidade contada).
+
+    Os estoques atuais são lidos e travados numa única consulta; a
+    diferença de cada produto vira uma movimentação IN/OUT de ajuste
+    (gravadas com um bulk_create, já com o saldo) e o estoque é gravado com
+    um único UPDATE por CASE. Produtos de outros usuários ou contagens
+    negativas são reportados em `errors` e não alteram nada.
+    """
+    result = InventoryCount()
+    with transaction.atomic():
+        states = {
+            row["pk"]: row
+            for row in Product.objects.select_for_update()
+            .filter(pk__in=counts, user=user)
+            .values("pk", "stock", "price", "user_id", "is_public")
+        }
+
+        deltas = {}
+        for pk, counted in counts.items():
+            if pk not in states:
+                result.errors.append((pk, "Produto não encontrado."))
+            elif counted < 0:
+                result.errors.append((pk, "A contagem não pode ser negativa."))
+            elif counted == states[pk]["stock"]:
+                result.unchanged += 1
+            else:
+                deltas[pk] = counted - states[pk]["stock"]
+                result.movements.append(
+                    ProductMovement(
+                        product_id=pk,
+                        type="IN" if deltas[pk] > 0 else "OUT",
+                        quantity=abs(deltas[pk]),
+                        reason=reason,
+                        balance_after=counted,
+                    )
+                )
+
+        if deltas:
+            Product.objects.filter(pk__in=deltas).update(
+                stock=Case(
+                    *[When(pk=pk, then=Value(counts[pk])) for pk in deltas],
+                    default=F("stock"),
+                    output_field=IntegerField(),
+                ),
+                updated_at=timezone.now(),
+            )
+            ProductMovement.objects.bulk_create(result.movements)
+            apply_stock_deltas(states, deltas)
+    return result
+
+
+def _count_column(columns, names):
+    for name in names:
+        if name in columns:
+            return columns.index(name)
+    return None
+
+
+def read_inventory_counts(stream):
+    """
+    Lê um CSV de contagem (id do produto e quantidade contada). Retorna
+    (contagens, erros), com os erros como (nº da linha, mensagem).
+    """
+    header = stream.readline()
+    delimiter = ";" if header.count(";") > header.count(",") else ","
+    reader = csv.reader(itertools.chain([header], stream), delimiter=delimiter)
+    columns = [name.strip().lower() for name in next(reader, [])]
+    id_column = _count_column(columns, COUNT_ID_COLUMNS)
+    quantity_column = _count_column(columns, COUNT_QUANTITY_COLUMNS)
+    if id_column is None or quantity_column is None:
+        raise StockError(
+            "O CSV precisa das colunas 'product_id' (ou 'id') e 'counted' "
+            "(ou 'quantidade'/'stock')."
+        )
+
+    counts, errors = {}, []
+    for values in reader:
+        if not any(value.strip() for value in values):
+            continue
+        try:
+            product_id = int(values[id_column])
+            counted = int(values[quantity_column])
+        except (IndexError, ValueError):
+            errors.append((reader.line_num, "Id ou quantidade inválidos."))
+            continue
+        if counted < 0:
+            errors.append((reader.line_num, "A contagem não pode ser negativa."))
+            continue
+        counts[product_id] = counted
+    return counts, errors
@@ -15,3 +15,10 @@ from . import test_views
 from . import test_integration
 from . import factories
 from . import test_utils
+from . import test_queries
+from . import test_instrumentation
+from . import test_stock
+from . import test_import
+from . import test_export
+from . import test_outbox
+from . import test_price_summary
@@ -0,0 +1,113 @@
+import csv
+import io
+import json
+import tempfile
+from decimal import Decimal
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from products.exporter import export_lines
+from products.importer import import_products
+from products.models import Category, PriceHistory, Product, ProductMovement
+from products.tests.factories import UserFactory, ProductFactory
+
+
+def _content(response):
+    return b"".join(response.streaming_content).decode("utf-8")
+
+
+class ExportTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.category = Category.objects.get(user=self.user, slug="utensilios")
+        self.caneca = ProductFactory.create(
+            user=self.user, name="Caneca", price=Decimal("39.90"), stock=12
+        )
+        self.caneca.categories.add(self.category)
+        self.caneca.price = Decimal("42.00")
+        self.caneca.save()
+        ProductFactory.create(user=self.user, name="Teclado", stock=0)
+
+    def test_product_csv_roundtrips_through_importer(self):
+        """Test the product CSV uses the importer's columns"""
+        content = "".join(export_lines("products", Product.objects.order_by("pk")))
+
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual([r["name"] for r in rows], ["Caneca", "Teclado"])
+        self.assertEqual(rows[0]["categories"], "Utensilios")
+        self.assertEqual(rows[0]["price"], "42.00")
+
+        other = UserFactory.create()
+        result = import_products(other, io.StringIO(content))
+        self.assertEqual(result.created, 2)
+        self.assertEqual(result.errors, [])
+
+    def test_jsonl_lines(self):
+        """Test JSONL has one object per history row"""
+        history = PriceHistory.objects.filter(product=self.caneca).order_by("id")
+        lines = list(export_lines("price_history", history, "jsonl"))
+
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(
+            [json.loads(line)["price"] for line in lines], ["39.90", "42.00"]
+        )
+
+    def test_product_export_view_honours_dashboard_filters(self):
+        """Test the export view applies the product_list filters"""
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse("product_export"), {"category": self.category.pk}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn("attachment;", response["Content-Disposition"])
+        rows = list(csv.DictReader(io.StringIO(_content(response))))
+        self.assertEqual([r["name"] for r in rows], ["Caneca"])
+
+    def test_product_export_uses_session_filters(self):
+        """Test the export matches what the dashboard is showing"""
+        self.client.force_login(self.user)
+        self.client.get(reverse("product_list"), {"q": "teclado"})
+        response = self.client.get(reverse("product_export"), {"format": "jsonl"})
+
+        lines = _content(response).splitlines()
+        self.assertEqual([json.loads(line)["name"] for line in lines], ["Teclado"])
+
+    def test_movement_export_view_filters(self):
+        """Test the movement export applies the overview filters"""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("movement_export"), {"tipo": "IN"})
+
+        rows = list(csv.DictReader(io.StringIO(_content(response))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["product"], "Caneca")
+        self.assertEqual(rows[0]["balance_after"], "12")
+
+    def test_export_only_own_data(self):
+        """Test other users' rows are never exported"""
+        other = UserFactory.create()
+        ProductFactory.create(user=other, name="Alheio", stock=5)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("price_history_export"))
+
+        self.assertNotIn("Alheio", _content(response))
+        self.assertEqual(
+            _content(self.client.get(reverse("movement_export"))).count("Alheio"), 0
+        )
+
+    def test_management_command_writes_file(self):
+        """Test export_products writes the movements to a file"""
+        with tempfile.NamedTemporaryFile("r", suffix=".csv", encoding="utf-8") as f:
+            call_command(
+                "export_products",
+                "movements",
+                user=self.user.username,
+                output=f.name,
+                stderr=io.StringIO(),
+            )
+            rows = list(csv.DictReader(f))
+
+        self.assertEqual(
+            len(rows), ProductMovement.objects.filter(product__user=self.user).count()
+        )
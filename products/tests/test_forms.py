@@ -1,7 +1,7 @@
 from decimal import Decimal
 from django.test import TestCase
 from django.contrib.auth.models import User
-from products.forms import ProductForm, CategoryForm
+from products.forms import BulkPriceForm, ProductForm, CategoryForm
 from products.models import Product, Category
 from products.tests.factories import UserFactory, CategoryFactory, ProductFactory
 
@@ -116,6 +116,26 @@ class ProductFormTest(TestCase):
         self.assertEqual(form["stock"].field.widget.attrs["placeholder"], "0")
 
 
+class BulkPriceFormTest(TestCase):
+    def test_price_value_accepts_both_decimal_formats(self):
+        """Test the bulk price value shares the importer number parsing"""
+        for raw, expected in [
+            ("-5,50", Decimal("-5.50")),
+            ("1.234,5", Decimal("1234.5")),
+            ("12.5", Decimal("12.5")),
+        ]:
+            form = BulkPriceForm(data={"price_mode": "amount", "price_value": raw})
+            self.assertTrue(form.is_valid(), raw)
+            self.assertEqual(form.cleaned_data["price_value"], expected)
+
+    def test_price_value_rejects_non_finite_numbers(self):
+        """Test NaN, infinity and text are rejected"""
+        for raw in ["NaN", "Infinity", "abc"]:
+            form = BulkPriceForm(data={"price_mode": "set", "price_value": raw})
+            self.assertFalse(form.is_valid(), raw)
+            self.assertIn("price_value", form.errors)
+
+
 class CategoryFormTest(TestCase):
     def test_category_form_valid_data(self):
         """Test category form with valid data"""
@@ -0,0 +1,141 @@
+import io
+import tempfile
+from decimal import Decimal
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from products.importer import CSVImportError, import_products
+from products.models import Category, PriceHistory, Product, ProductMovement
+from products.rollups import rollup_stats, verify_rollups
+from products.search import search_products
+from products.tests.factories import UserFactory
+
+CSV = (
+    "name;description;price;stock;is_public;categories\n"
+    "Caneca;Caneca de cerâmica;39,90;12;sim;Utensilios|Bebidas\n"
+    "Teclado;;1.234,50;0;não;Eletronicos\n"
+    "Mouse;Sem fio;89.90;3;1;\n"
+)
+
+
+class ProductImportTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory.create()
+
+    def test_import_creates_products_history_and_links(self):
+        """Test bulk import writes what the post_save signals would"""
+        result = import_products(self.user, io.StringIO(CSV))
+
+        self.assertEqual(result.created, 3)
+        self.assertEqual(result.errors, [])
+        caneca = Product.objects.get(user=self.user, name="Caneca")
+        self.assertEqual(caneca.price, Decimal("39.90"))
+        self.assertTrue(caneca.is_public)
+        self.assertEqual(
+            sorted(caneca.categories.values_list("slug", flat=True)),
+            ["bebidas", "utensilios"],
+        )
+        self.assertEqual(
+            Product.objects.get(name="Teclado").price, Decimal("1234.50")
+        )
+        self.assertEqual(
+            PriceHistory.objects.filter(product__user=self.user).count(), 3
+        )
+        # Só produtos com estoque recebem a entrada inicial, já com o saldo
+        movements = ProductMovement.objects.filter(product__user=self.user)
+        self.assertEqual(movements.count(), 2)
+        self.assertEqual(
+            ProductMovement.ledger_balance(caneca.pk), caneca.stock
+        )
+
+    def test_import_updates_rollups_and_search(self):
+        """Test imported products are counted and searchable"""
+        import_products(self.user, io.StringIO(CSV))
+
+        self.assertEqual(verify_rollups(self.user), [])
+        self.assertEqual(rollup_stats(user=self.user)["total_stock"], 15)
+        found = search_products(Product.objects.filter(user=self.user), "caneca")
+        self.assertEqual([p.name for p in found], ["Caneca"])
+
+    def test_existing_category_is_reused(self):
+        """Test categories match the user's own by name or slug"""
+        import_products(self.user, io.StringIO(CSV))
+
+        self.assertEqual(
+            Category.objects.filter(user=self.user, slug="utensilios").count(), 1
+        )
+        self.assertEqual(
+            Category.objects.filter(user=self.user, slug="bebidas").count(), 1
+        )
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        """Test row-level errors carry the file line number"""
+        content = (
+            "nome,preço,estoque\n"
+            "Válido,10.00,1\n"
+            ",5.00,1\n"
+            "Preço ruim,abc,1\n"
+            "Estoque negativo,1.00,-2\n"
+        )
+        result = import_products(self.user, io.StringIO(content), chunk_size=2)
+
+        self.assertEqual(result.rows, 4)
+        self.assertEqual(result.created, 1)
+        self.assertEqual([e.line for e in result.errors], [3, 4, 5])
+        self.assertEqual(Product.objects.filter(user=self.user).count(), 1)
+
+    def test_missing_required_column(self):
+        """Test a header without name is refused"""
+        with self.assertRaises(CSVImportError):
+            import_products(self.user, io.StringIO("price\n1.00\n"))
+
+    def test_chunked_import_with_workers(self):
+        """Test parsing in worker processes gives the same result"""
+        lines = ["name,price,stock"] + [f"Produto {i},{i}.50,{i % 3}" for i in range(50)]
+        result = import_products(
+            self.user, io.StringIO("\n".join(lines)), chunk_size=7, workers=2
+        )
+
+        self.assertEqual(result.created, 50)
+        self.assertEqual(Product.objects.filter(user=self.user).count(), 50)
+        self.assertEqual(verify_rollups(self.user), [])
+
+    def test_management_command(self):
+        """Test import_products command reads a file for a user"""
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", encoding="utf-8") as f:
+            f.write(CSV)
+            f.flush()
+            out = io.StringIO()
+            call_command(
+                "import_products", f.name, user=self.user.username, stdout=out
+            )
+
+        self.assertIn("3 produtos criados", out.getvalue())
+        self.assertEqual(Product.objects.filter(user=self.user).count(), 3)
+
+
+class ProductImportViewTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.client.force_login(self.user)
+
+    def test_upload_imports_and_shows_report(self):
+        """Test the upload view imports and lists the failed lines"""
+        content = CSV + "Sem preço;;;1;;\n"
+        upload = SimpleUploadedFile(
+            "produtos.csv", content.encode("utf-8"), content_type="text/csv"
+        )
+        response = self.client.post(reverse("product_import"), {"file": upload})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["result"].created, 3)
+        self.assertContains(response, "Preço obrigatório.")
+        self.assertEqual(Product.objects.filter(user=self.user).count(), 3)
+
+    def test_requires_login(self):
+        """Test anonymous users are redirected"""
+        self.client.logout()
+        response = self.client.get(reverse("product_import"))
+
+        self.assertEqual(response.status_code, 302)
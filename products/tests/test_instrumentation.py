@@ -0,0 +1,72 @@
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from products.instrumentation import current_timings, instrumented
+from products.tests.factories import UserFactory, ProductFactory
+
+
+def _server_timing(response):
+    """Converte o header Server-Timing em {métrica: (dur, desc)}"""
+    metrics = {}
+    for entry in response["Server-Timing"].split(", "):
+        name, *params = entry.split(";")
+        values = dict(param.split("=", 1) for param in params)
+        metrics[name] = (float(values["dur"]), values.get("desc", "").strip('"'))
+    return metrics
+
+
+class ServerTimingMiddlewareTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = UserFactory.create_admin()
+        self.client.force_login(self.user)
+
+    def test_header_reports_queries_and_templates(self):
+        """Test Server-Timing carries db, template, signals and total metrics"""
+        ProductFactory.create(user=self.user)
+
+        response = self.client.get(reverse("product_list"))
+
+        metrics = _server_timing(response)
+        self.assertEqual(set(metrics), {"db", "tpl", "signals", "total"})
+        queries, label = metrics["db"][1].split()
+        self.assertGreater(int(queries), 0)
+        self.assertEqual(label, "queries")
+        self.assertGreater(metrics["tpl"][0], 0)
+        self.assertGreaterEqual(metrics["total"][0], metrics["tpl"][0])
+
+    def test_signal_time_is_recorded_on_writes(self):
+        """Test time spent in products.models receivers is reported"""
+        response = self.client.post(
+            reverse("product_create"),
+            {"name": "Novo", "price": "10,00", "stock": 3},
+        )
+
+        self.assertEqual(response.status_code, 302)
+        self.assertGreater(_server_timing(response)["signals"][0], 0)
+
+    def test_structured_log_line(self):
+        """Test each request is logged with its timing fields"""
+        with self.assertLogs("products.timing", level="INFO") as logs:
+            self.client.get(reverse("product_list"))
+
+        record = logs.records[-1]
+        self.assertIn("path=/ status=200", record.getMessage())
+        self.assertEqual(record.timings["method"], "GET")
+        self.assertIn("queries", record.timings)
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_header_can_be_disabled(self):
+        """Test the header is omitted when disabled in settings"""
+        response = self.client.get(reverse("product_list"))
+
+        self.assertFalse(response.has_header("Server-Timing"))
+
+    def test_nothing_is_measured_outside_requests(self):
+        """Test instrumented receivers are no-ops without a request"""
+        calls = []
+        receiver = instrumented(lambda **kwargs: calls.append(kwargs))
+
+        receiver(sender=None)
+
+        self.assertEqual(calls, [{"sender": None}])
+        self.assertIsNone(current_timings())
@@ -1,8 +1,14 @@
 from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
-from products.models import Category, Product, PriceHistory, Profile
+from products.models import Category, Product, PriceHistory, ProductMovement, Profile
+from products.rollups import rollup_stats, verify_rollups
 from products.tests.factories import (
     UserFactory,
     CategoryFactory,
@@ -262,3 +268,208 @@ class SignalTests(TestCase):
         product.save()
 
         self.assertEqual(product.price_history.count(), 1)  # Only initial entry
+
+
+class ProductDirtyTrackingTest(TestCase):
+    def setUp(self):
+        self.product = ProductFactory.create(price=Decimal("100.00"), stock=5)
+        self.loaded = Product.objects.get(pk=self.product.pk)
+
+    def test_changed_fields(self):
+        """Test loaded products report only the fields changed since loading"""
+        self.assertEqual(self.loaded.get_changed_fields(), set())
+
+        self.loaded.price = "120.00"
+        self.loaded.name = "Outro nome"
+        self.loaded.stock = 5
+
+        self.assertEqual(self.loaded.get_changed_fields(), {"price", "name"})
+        self.assertEqual(self.loaded.loaded_values["price"], Decimal("100.00"))
+
+    def test_snapshot_is_reset_after_save_and_refresh(self):
+        """Test saving or refreshing makes the current values the baseline"""
+        self.loaded.price = Decimal("120.00")
+        self.loaded.save()
+        self.assertFalse(self.loaded.has_changed("price"))
+
+        Product.objects.filter(pk=self.loaded.pk).update(stock=9)
+        self.loaded.refresh_from_db()
+        self.assertEqual(self.loaded.get_changed_fields(), set())
+        self.assertEqual(self.loaded.loaded_values["stock"], 9)
+
+    def test_string_values_are_not_reported_after_save(self):
+        """Test a product saved with a string price is clean afterwards"""
+        product = Product.objects.create(
+            user=self.product.user, name="Cabo", price="10.00", stock=2
+        )
+        self.assertEqual(product.get_changed_fields(), set())
+
+        product.name = "Cabo USB"
+        product.save()
+        product.price = "10.00"
+        product.save()
+
+        self.assertEqual(product.get_changed_fields(), set())
+        self.assertEqual(product.price_history.count(), 1)
+        self.assertEqual(product.movements.count(), 1)
+
+    def test_deferred_fields_are_not_reported(self):
+        """Test fields left out by only() do not count as changed"""
+        product = Product.objects.only("name").get(pk=self.product.pk)
+
+        self.assertEqual(product.get_changed_fields(), set())
+
+    def test_save_without_price_or_stock_change_skips_history_queries(self):
+        """Test name/description/visibility saves issue no history queries"""
+        self.loaded.name = "Novo nome"
+        self.loaded.description = "Nova descrição"
+        self.loaded.is_public = not self.loaded.is_public
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.loaded.save()
+
+        history_tables = ("products_pricehistory", "products_productmovement")
+        history_queries = [
+            q["sql"]
+            for q in ctx.captured_queries
+            if any(table in q["sql"] for table in history_tables)
+        ]
+        self.assertEqual(history_queries, [])
+
+    def test_unchanged_save_issues_only_the_update(self):
+        """Test a save with nothing changed skips every signal query"""
+        with self.assertNumQueries(1):
+            self.loaded.save()
+
+    def test_price_and_stock_changes_are_recorded(self):
+        """Test history and movements still follow real changes"""
+        self.loaded.price = Decimal("80.00")
+        self.loaded.stock = 8
+        self.loaded.save()
+
+        self.assertEqual(self.product.price_history.count(), 2)
+        self.assertEqual(
+            list(self.product.movements.values_list("type", "quantity")),
+            [("IN", 3), ("IN", 5)],
+        )
+
+
+class MovementLedgerTest(TestCase):
+    def setUp(self):
+        self.product = ProductFactory.create(stock=10)
+
+    def _balances(self):
+        return list(
+            self.product.movements.order_by("moved_at", "id").values_list(
+                "quantity", "balance_after"
+            )
+        )
+
+    def test_balance_after_is_written_on_insert(self):
+        """Test each movement stores the running balance"""
+        ProductMovement.objects.create(product=self.product, type="OUT", quantity=4)
+        ProductMovement.objects.create(product=self.product, type="IN", quantity=2)
+
+        self.assertEqual(self._balances(), [(10, 10), (4, 6), (2, 8)])
+        self.assertEqual(ProductMovement.ledger_balance(self.product.pk), 8)
+
+    def test_stock_adjustment_reads_last_balance(self):
+        """Test the adjustment diff uses the last balance, not a full SUM"""
+        for _ in range(5):
+            ProductMovement.objects.create(product=self.product, type="IN", quantity=1)
+        product = Product.objects.get(pk=self.product.pk)
+        product.stock = 20
+
+        with CaptureQueriesContext(connection) as ctx:
+            product.save()
+
+        self.assertFalse([q for q in ctx.captured_queries if "SUM(" in q["sql"]])
+        last = product.movements.order_by("-moved_at", "-id").first()
+        self.assertEqual(
+            (last.reason, last.quantity, last.balance_after),
+            ("Ajuste de estoque", 5, 20),
+        )
+
+    def test_backfill_command_fills_legacy_rows(self):
+        """Test the backfill command rebuilds balances and verify checks stock"""
+        ProductMovement.objects.create(product=self.product, type="OUT", quantity=3)
+        ProductMovement.objects.update(balance_after=None)
+        Product.objects.filter(pk=self.product.pk).update(stock=7)
+
+        # Sem saldo gravado, o livro ainda é somado para não perder o histórico
+        self.assertEqual(ProductMovement.ledger_balance(self.product.pk), 7)
+
+        out = StringIO()
+        call_command("backfill_movement_balances", stdout=out)
+        self.assertIn("2 movimentações", out.getvalue())
+        self.assertEqual(self._balances(), [(10, 10), (3, 7)])
+
+        call_command("backfill_movement_balances", "--verify", stdout=StringIO())
+        Product.objects.filter(pk=self.product.pk).update(stock=99)
+        with self.assertRaises(CommandError):
+            call_command("backfill_movement_balances", "--verify", stdout=StringIO())
+
+
+class InventoryRollupTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.category = CategoryFactory.create(user=self.user)
+
+    def assertRollupsConsistent(self):
+        self.assertEqual(verify_rollups(), [])
+
+    def test_rollup_follows_product_lifecycle(self):
+        """Test signals keep the rollups equal to a full recomputation"""
+        product = ProductFactory.create(
+            user=self.user, price=Decimal("10.00"), stock=3
+        )
+        self.assertRollupsConsistent()
+
+        product.categories.add(self.category)
+        self.assertRollupsConsistent()
+
+        product.price = Decimal("12.50")
+        product.stock = 7
+        product.is_public = True
+        product.save()
+        self.assertRollupsConsistent()
+
+        stats = rollup_stats(user=self.user, category_id=self.category.pk)
+        self.assertEqual(stats["total_count"], 1)
+        self.assertEqual(stats["total_stock"], 7)
+        self.assertEqual(stats["total_value"], Decimal("87.50"))
+
+        product.categories.remove(self.category, CategoryFactory.create(user=self.user))
+        self.assertRollupsConsistent()
+
+        self.category.products.add(product)
+        self.assertRollupsConsistent()
+
+        product.categories.clear()
+        self.assertRollupsConsistent()
+
+        product.delete()
+        self.assertRollupsConsistent()
+        self.assertEqual(rollup_stats(user=self.user)["total_count"], 0)
+
+    def test_rollup_stats_by_visibility(self):
+        """Test rollup stats can be read per visibility"""
+        ProductFactory.create(user=self.user, stock=2, is_public=True)
+        ProductFactory.create(user=self.user, stock=5, is_public=False)
+
+        self.assertEqual(rollup_stats(user=self.user)["total_stock"], 7)
+        self.assertEqual(rollup_stats(user=self.user, is_public=True)["total_stock"], 2)
+        self.assertEqual(rollup_stats(is_public=False)["total_stock"], 5)
+
+    def test_rebuild_command_fixes_stale_rollups(self):
+        """Test rebuild_inventory_rollups repairs and verifies the table"""
+        ProductFactory.create(user=self.user, stock=4)
+        # update() não dispara signals, deixando o rollup desatualizado
+        Product.objects.filter(user=self.user).update(stock=9)
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_inventory_rollups", "--verify", stdout=StringIO())
+
+        call_command("rebuild_inventory_rollups", stdout=StringIO())
+        call_command("rebuild_inventory_rollups", "--verify", stdout=StringIO())
+        self.assertEqual(rollup_stats(user=self.user)["total_stock"], 9)
@@ -0,0 +1,120 @@
+import io
+from decimal import Decimal
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from products import outbox
+from products.models import OutboxEvent, PriceHistory, ProductMovement
+from products.outbox import drain, failed_events, process_batch, retry_failed
+from products.rollups import verify_rollups
+from products.stock import record_movement
+from products.tests.factories import UserFactory, ProductFactory
+
+
+@override_settings(PRODUCT_SIDE_EFFECTS="outbox")
+class OutboxTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.product = ProductFactory.create(
+            user=self.user, price=Decimal("10.00"), stock=5
+        )
+
+    def test_save_enqueues_instead_of_writing_history(self):
+        """Test saves only write outbox rows until the worker runs"""
+        self.product.price = Decimal("12.00")
+        self.product.stock = 8
+        self.product.save()
+
+        self.assertFalse(PriceHistory.objects.filter(product=self.product).exists())
+        self.assertFalse(ProductMovement.objects.filter(product=self.product).exists())
+        self.assertEqual(
+            list(OutboxEvent.objects.values_list("topic", flat=True)),
+            ["price", "stock", "search", "price", "stock"],
+        )
+        # Os rollups continuam síncronos
+        self.assertEqual(verify_rollups(self.user), [])
+
+    def test_worker_applies_events_in_order(self):
+        """Test the worker writes history and a consistent stock ledger"""
+        self.product.price = Decimal("12.00")
+        self.product.stock = 8
+        self.product.save()
+
+        self.assertEqual(drain(), (5, 0))
+
+        self.assertEqual(
+            list(
+                PriceHistory.objects.filter(product=self.product)
+                .order_by("changed_at", "id")
+                .values_list("price", flat=True)
+            ),
+            [Decimal("10.00"), Decimal("12.00")],
+        )
+        movements = ProductMovement.objects.filter(product=self.product).order_by(
+            "moved_at", "id"
+        )
+        self.assertEqual(
+            [(m.type, m.quantity, m.balance_after) for m in movements],
+            [("IN", 5, 5), ("IN", 3, 8)],
+        )
+        self.assertFalse(outbox.pending_events().exists())
+
+    def test_movement_recorded_before_worker_is_not_duplicated(self):
+        """Test a ledger movement between save and worker keeps balances right"""
+        drain()
+        self.product.stock = 7
+        self.product.save()
+        record_movement(self.product, "OUT", 2, "Venda")
+
+        drain()
+
+        self.assertEqual(ProductMovement.ledger_balance(self.product.pk), 5)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 5)
+
+    def test_failed_event_retries_and_blocks_product(self):
+        """Test a failing event is retried and holds later events back"""
+        drain()
+        self.product.price = Decimal("11.00")
+        self.product.save()
+        self.product.stock = 9
+        self.product.save()
+
+        failing = mock.Mock(side_effect=RuntimeError("x"))
+        with mock.patch.dict(outbox.HANDLERS, {"price": failing}):
+            with self.assertLogs("products.outbox", "ERROR"):
+                self.assertEqual(process_batch(max_attempts=1), (0, 1))
+        self.assertEqual(failed_events(max_attempts=1).count(), 1)
+        # O ajuste de estoque seguinte espera o evento de preço
+        self.assertEqual(ProductMovement.ledger_balance(self.product.pk), 5)
+
+        self.assertEqual(retry_failed(max_attempts=1), 1)
+        self.assertEqual(drain(), (2, 0))
+        self.assertTrue(PriceHistory.objects.filter(price=Decimal("11.00")).exists())
+        self.assertEqual(ProductMovement.ledger_balance(self.product.pk), 9)
+
+    def test_deleted_product_events_are_discarded(self):
+        """Test events of a deleted product are marked done without effects"""
+        self.product.delete()
+
+        self.assertEqual(drain(), (3, 0))
+        self.assertFalse(PriceHistory.objects.exists())
+
+    def test_worker_command_once(self):
+        """Test run_outbox_worker --once drains the queue"""
+        out = io.StringIO()
+        call_command("run_outbox_worker", once=True, stdout=out)
+
+        self.assertIn("3 eventos processados", out.getvalue())
+        self.assertEqual(PriceHistory.objects.filter(product=self.product).count(), 1)
+
+
+class SyncSideEffectsTest(TestCase):
+    def test_sync_mode_writes_history_directly(self):
+        """Test the default mode keeps history synchronous and the outbox empty"""
+        product = ProductFactory.create(price=Decimal("10.00"), stock=2)
+        product.price = Decimal("15.00")
+        product.save()
+
+        self.assertEqual(PriceHistory.objects.filter(product=product).count(), 2)
+        self.assertFalse(OutboxEvent.objects.exists())
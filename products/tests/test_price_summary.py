@@ -0,0 +1,302 @@
+import io
+import tempfile
+from pathlib import Path
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from products.bulk import adjust_prices
+from products.downsample import lttb
+from products.importer import import_products
+from products.models import RECENT_PRICES, PriceDailyRollup, PriceHistory, Product
+from products.outbox import drain
+from products.price_summary import (
+    populate_missing_history,
+    rebuild_daily_prices,
+    rebuild_price_summaries,
+)
+from products.tests.factories import UserFactory, ProductFactory
+
+
+def _summary(product):
+    product.refresh_from_db()
+    return {name: getattr(product, name) for name in Product.PRICE_SUMMARY_FIELDS}
+
+
+class PriceSummaryTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.product = ProductFactory.create(user=self.user, price=Decimal("10.00"))
+
+    def assertMatchesHistory(self, products):
+        """O resumo gravado é igual ao recalculado a partir do histórico."""
+        stored = [_summary(product) for product in products]
+        rebuild_price_summaries(Product.objects.filter(pk__in=[p.pk for p in products]))
+        self.assertEqual(stored, [_summary(product) for product in products])
+
+    def test_save_maintains_summary(self):
+        """Test price changes update previous price, count and trend"""
+        self.product.price = Decimal("12.50")
+        self.product.save()
+
+        self.assertEqual(self.product.previous_price, Decimal("10.00"))
+        self.assertEqual(self.product.price_change_count, 2)
+        self.assertEqual(self.product.price_trend, "up")
+        self.assertEqual(
+            [point["price"] for point in self.product.price_points],
+            [Decimal("10.00"), Decimal("12.50")],
+        )
+        self.assertEqual(
+            self.product.last_price_change_at,
+            PriceHistory.objects.filter(product=self.product).first().changed_at,
+        )
+        self.assertMatchesHistory([self.product])
+
+    def test_direct_history_entries_maintain_summary(self):
+        """Test PriceHistory rows created outside the product save count too"""
+        PriceHistory.objects.create(product_id=self.product.pk, price=Decimal("9.00"))
+
+        summary = _summary(self.product)
+        self.assertEqual(summary["previous_price"], Decimal("10.00"))
+        self.assertEqual(summary["price_change_count"], 2)
+        self.assertEqual(self.product.daily_prices.get().low, Decimal("9.00"))
+        self.assertMatchesHistory([self.product])
+
+    def test_recent_prices_are_capped(self):
+        """Test only the last RECENT_PRICES prices are kept"""
+        for cents in range(11, 11 + RECENT_PRICES + 2):
+            self.product.price = Decimal(cents)
+            self.product.save()
+
+        self.product.refresh_from_db()
+        self.assertEqual(len(self.product.recent_prices), RECENT_PRICES)
+        self.assertEqual(self.product.price_change_count, RECENT_PRICES + 3)
+        self.assertMatchesHistory([self.product])
+
+    def test_stale_instance_does_not_overwrite_summary(self):
+        """Test saving an outdated instance keeps the stored summary"""
+        stale = Product.objects.get(pk=self.product.pk)
+        self.product.price = Decimal("11.00")
+        self.product.save()
+
+        stale.name = "Renomeado"
+        stale.save()
+
+        self.assertEqual(_summary(stale)["price_change_count"], 2)
+        self.assertEqual(stale.name, "Renomeado")
+
+    def test_bulk_writers_maintain_summary(self):
+        """Test bulk price adjustment and CSV import keep the summary in sync"""
+        adjust_prices(Product.objects.filter(pk=self.product.pk), "percent", 10)
+        import_products(
+            self.user, io.StringIO("name,price\nCaneca,39.90\nTeclado,120.00\n")
+        )
+
+        self.assertEqual(_summary(self.product)["previous_price"], Decimal("10.00"))
+        self.assertMatchesHistory(list(Product.objects.order_by("pk")))
+
+    @override_settings(PRODUCT_SIDE_EFFECTS="outbox")
+    def test_outbox_worker_maintains_summary(self):
+        """Test the outbox worker updates the summary when it writes history"""
+        self.product.price = Decimal("9.00")
+        self.product.save()
+        self.assertEqual(_summary(self.product)["price_change_count"], 1)
+
+        drain()
+
+        self.assertEqual(_summary(self.product)["price_change_count"], 2)
+        self.assertEqual(self.product.price_trend, "down")
+        self.assertMatchesHistory([self.product])
+
+    def test_rebuild_command(self):
+        """Test rebuild_price_summaries restores wiped summaries"""
+        Product.objects.update(price_change_count=0, recent_prices=[])
+        out = io.StringIO()
+
+        call_command("rebuild_price_summaries", user=self.user.username, stdout=out)
+
+        self.assertIn("1 produtos", out.getvalue())
+        self.assertEqual(_summary(self.product)["price_change_count"], 1)
+
+    def test_pages_do_not_query_price_history(self):
+        """Test the detail modal and the overview read only the summary"""
+        self.product.price = Decimal("12.00")
+        self.product.save()
+        self.client.force_login(self.user)
+
+        with CaptureQueriesContext(connection) as ctx:
+            detail = self.client.get(reverse("product_detail", args=[self.product.pk]))
+            overview = self.client.get(reverse("price_history_overview"))
+
+        self.assertContains(detail, "12,00")
+        self.assertEqual(overview.context["total_alteracoes"], 2)
+        self.assertFalse(
+            [q for q in ctx.captured_queries if "products_pricehistory" in q["sql"]]
+        )
+
+
+class DailyPriceRollupTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.product = ProductFactory.create(user=self.user, price=Decimal("10.00"))
+        for price in ("14.00", "8.00", "11.00"):
+            self.product.price = Decimal(price)
+            self.product.save()
+
+    def _daily(self):
+        return list(
+            PriceDailyRollup.objects.filter(product=self.product).values(
+                "day", "open", "high", "low", "close", "change_count"
+            )
+        )
+
+    def _backdate(self, days):
+        """Move o produto e seu histórico `days` dias para o passado."""
+        past = timezone.now() - timedelta(days=days)
+        Product.objects.filter(pk=self.product.pk).update(created_at=past)
+        PriceHistory.objects.filter(product=self.product).update(changed_at=past)
+        rebuild_daily_prices()
+        self.product.refresh_from_db()
+
+    def test_price_changes_update_daily_ohlc(self):
+        """Test each price change folds into today's OHLC row"""
+        self.assertEqual(
+            self._daily(),
+            [
+                {
+                    "day": timezone.localdate(),
+                    "open": Decimal("10.00"),
+                    "high": Decimal("14.00"),
+                    "low": Decimal("8.00"),
+                    "close": Decimal("11.00"),
+                    "change_count": 4,
+                }
+            ],
+        )
+        incremental = self._daily()
+
+        out = io.StringIO()
+        call_command("rebuild_daily_prices", stdout=out)
+
+        self.assertIn("1 dias", out.getvalue())
+        self.assertEqual(self._daily(), incremental)
+
+    def test_string_prices_are_normalized(self):
+        """Test prices assigned as strings fold into the Decimal rollups"""
+        self.product.price = "16.50"
+        self.product.save()
+        self.product.price = "7.25"
+        self.product.save()
+
+        daily = self._daily()[0]
+        self.assertEqual(daily["high"], Decimal("16.50"))
+        self.assertEqual(daily["low"], Decimal("7.25"))
+        self.assertEqual(daily["close"], Decimal("7.25"))
+        self.assertEqual(daily["change_count"], 6)
+        summary = _summary(self.product)
+        self.assertEqual(summary["previous_price"], Decimal("16.50"))
+        self.assertEqual(summary["recent_prices"][-1][0], "7.25")
+
+    def test_price_history_page_switches_to_daily_for_long_ranges(self):
+        """Test short ranges list raw entries and long ranges list days"""
+        self.client.force_login(self.user)
+        url = reverse("price_history", args=[self.product.pk])
+
+        response = self.client.get(url)
+        self.assertFalse(response.context["daily"])
+        self.assertEqual(len(response.context["price_history"]), 4)
+
+        self._backdate(200)
+        response = self.client.get(url)
+        self.assertTrue(response.context["daily"])
+        self.assertEqual(len(response.context["daily_prices"]), 1)
+        self.assertEqual(response.context["total_alteracoes"], 4)
+        self.assertContains(response, "Fechamento")
+
+        today = timezone.localdate()
+        response = self.client.get(
+            url, {"data_inicio": (today - timedelta(days=30)).isoformat()}
+        )
+        self.assertFalse(response.context["daily"])
+        self.assertEqual(response.context["price_history"], [])
+
+
+class PopulatePriceHistoryTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.products = [ProductFactory.create(user=self.user) for _ in range(5)]
+        # Produtos anteriores ao histórico de preços
+        PriceHistory.objects.all().delete()
+        PriceDailyRollup.objects.all().delete()
+        Product.objects.update(price_change_count=0, recent_prices=[])
+
+    def assertMatchesHistory(self):
+        stored = [_summary(product) for product in self.products]
+        rebuild_price_summaries()
+        self.assertEqual(stored, [_summary(product) for product in self.products])
+
+    def test_batches_use_constant_queries(self):
+        """Test each batch is one anti-join select plus bulk writes"""
+        batches = populate_missing_history(batch_size=2)
+        with self.assertNumQueries(7):
+            next(batches)
+        with self.assertNumQueries(7):
+            next(batches)
+        list(batches)
+
+        self.assertEqual(PriceHistory.objects.count(), 5)
+        self.assertMatchesHistory()
+
+    def test_dry_run_writes_nothing(self):
+        """Test --dry-run only reports the products missing history"""
+        out = io.StringIO()
+        call_command("populate_price_history", dry_run=True, stdout=out)
+
+        self.assertIn("5 produtos sem histórico", out.getvalue())
+        self.assertFalse(PriceHistory.objects.exists())
+
+    def test_resumes_from_checkpoint(self):
+        """Test the command resumes after the checkpointed product"""
+        with tempfile.TemporaryDirectory() as tmp:
+            checkpoint = Path(tmp) / "populate.ckpt"
+            checkpoint.write_text(str(self.products[2].pk))
+            out = io.StringIO()
+
+            call_command(
+                "populate_price_history",
+                batch_size=1,
+                checkpoint=str(checkpoint),
+                stdout=out,
+            )
+
+            self.assertFalse(checkpoint.exists())
+        self.assertEqual(
+            set(PriceHistory.objects.values_list("product_id", flat=True)),
+            {self.products[3].pk, self.products[4].pk},
+        )
+        self.assertIn("100% (2/2)", out.getvalue())
+        self.assertIn("2 registros criados", out.getvalue())
+
+
+class LttbTest(SimpleTestCase):
+    def test_keeps_endpoints_and_peaks(self):
+        """Test LTTB keeps the first, last and extreme points"""
+        points = [(x, 0.0) for x in range(100)]
+        points[37] = (37, 50.0)
+        points[71] = (71, -40.0)
+
+        chosen = lttb(points, 10)
+
+        self.assertEqual(len(chosen), 10)
+        self.assertEqual((chosen[0], chosen[-1]), (0, 99))
+        self.assertIn(37, chosen)
+        self.assertIn(71, chosen)
+        self.assertEqual(chosen, sorted(chosen))
+
+    def test_short_series_is_returned_whole(self):
+        """Test series within the threshold are not reduced"""
+        self.assertEqual(lttb([(0, 1.0), (1, 2.0)], 10), [0, 1])
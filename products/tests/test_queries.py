@@ -0,0 +1,240 @@
+from decimal import Decimal
+from django.db import connection
+from django.db.models import Min
+from django.test import TestCase
+from products.models import PriceHistory, Product
+from products.queries import inventory_stats, price_history_summary
+from products.search import rebuild_search_index, search_products, trigrams
+from products.tests.factories import UserFactory, CategoryFactory, ProductFactory
+
+
+class InventoryStatsTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory.create()
+
+    def test_stats_single_query(self):
+        """Test stats are computed with one aggregate query"""
+        ProductFactory.create(user=self.user, price=Decimal("10.00"), stock=2)
+        ProductFactory.create(user=self.user, price=Decimal("5.50"), stock=4)
+
+        with self.assertNumQueries(1):
+            stats = inventory_stats(Product.objects.filter(user=self.user))
+
+        self.assertEqual(stats["total_count"], 2)
+        self.assertEqual(stats["total_stock"], 6)
+        self.assertEqual(stats["total_value"], Decimal("42.00"))
+
+    def test_stats_do_not_double_count_m2m_joins(self):
+        """Test products with several categories are counted once"""
+        cat_a = CategoryFactory.create(user=self.user, name="A")
+        cat_b = CategoryFactory.create(user=self.user, name="B")
+        product = ProductFactory.create(user=self.user, price=Decimal("3.00"), stock=3)
+        product.categories.add(cat_a, cat_b)
+
+        queryset = (
+            Product.objects.filter(user=self.user, categories__in=[cat_a, cat_b])
+            .annotate(sort_key=Min("categories__name"))
+            .order_by("sort_key")
+        )
+        stats = inventory_stats(queryset)
+
+        self.assertEqual(stats["total_count"], 1)
+        self.assertEqual(stats["total_stock"], 3)
+        self.assertEqual(stats["total_value"], Decimal("9.00"))
+
+    def test_stats_empty_queryset(self):
+        """Test empty querysets return zeros"""
+        stats = inventory_stats(Product.objects.none())
+
+        self.assertEqual(stats, {"total_count": 0, "total_stock": 0, "total_value": 0})
+
+
+class PriceHistorySummaryTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.product = ProductFactory.create(user=self.user, price=Decimal("1.00"))
+        for cents in range(2, 15):
+            self.product.price = Decimal(cents)
+            self.product.save()
+
+    def test_summary_keeps_last_points_only(self):
+        """Test the summary returns the last 10 prices in order in one query"""
+        with self.assertNumQueries(1):
+            summary = price_history_summary(Product.objects.filter(user=self.user))
+
+        item = summary[self.product.pk]
+        self.assertEqual(item["changes"], 14)
+        self.assertEqual(item["prices"], [Decimal(n) for n in range(5, 15)])
+        self.assertEqual(item["price"], Decimal("14"))
+        self.assertEqual(item["previous_price"], Decimal("13"))
+        self.assertEqual(
+            item["changed_at"],
+            PriceHistory.objects.filter(product=self.product).first().changed_at,
+        )
+
+    def test_single_entry_has_no_previous_price(self):
+        """Test a product with one history entry has no previous price"""
+        other = ProductFactory.create(user=self.user)
+
+        item = price_history_summary(Product.objects.filter(pk=other.pk))[other.pk]
+
+        self.assertEqual(item["changes"], 1)
+        self.assertIsNone(item["previous_price"])
+
+
+class ProductSearchTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.products = Product.objects.filter(user=self.user)
+
+    def _names(self, q, ranked=False):
+        return [p.name for p in search_products(self.products, q, ranked=ranked)]
+
+    def test_search_matches_name_prefix_and_description(self):
+        """Test search matches word prefixes in name and description"""
+        ProductFactory.create(user=self.user, name="Notebook Gamer")
+        ProductFactory.create(
+            user=self.user, name="Mouse", description="Compatível com notebooks"
+        )
+        ProductFactory.create(user=self.user, name="Teclado")
+
+        self.assertCountEqual(self._names("note"), ["Notebook Gamer", "Mouse"])
+        self.assertEqual(self._names("gamer note"), ["Notebook Gamer"])
+
+    def test_search_ignores_accents(self):
+        """Test search is accent insensitive"""
+        ProductFactory.create(user=self.user, name="Cabo Eletrônico")
+
+        self.assertEqual(self._names("eletronico"), ["Cabo Eletrônico"])
+
+    def test_index_follows_updates_and_deletes(self):
+        """Test signals keep the search index in sync"""
+        product = ProductFactory.create(user=self.user, name="Cadeira")
+
+        product.name = "Poltrona"
+        product.save()
+        self.assertEqual(self._names("cadeira"), [])
+        self.assertEqual(self._names("poltrona"), ["Poltrona"])
+
+        product.delete()
+        self.assertEqual(self._names("poltrona"), [])
+
+    def test_ranked_search_prefers_name_matches(self):
+        """Test ranked results put name matches first"""
+        ProductFactory.create(
+            user=self.user, name="Suporte", description="Para monitor e monitor"
+        )
+        ProductFactory.create(user=self.user, name="Monitor 24", description="")
+
+        self.assertEqual(self._names("monitor", ranked=True), ["Monitor 24", "Suporte"])
+
+    def test_rebuild_search_index(self):
+        """Test rebuilding the index keeps every product searchable"""
+        ProductFactory.create(user=self.user, name="Luminária")
+
+        self.assertEqual(rebuild_search_index(), 1)
+        self.assertEqual(self._names("luminaria"), ["Luminária"])
+
+
+class FuzzySearchTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.products = Product.objects.filter(user=self.user)
+
+    def _names(self, q):
+        return [
+            p.name
+            for p in search_products(self.products, q, ranked=True, mode="fuzzy")
+        ]
+
+    def test_trigrams_follow_pg_trgm_format(self):
+        """Test trigrams are padded per word, lowercased and unaccented"""
+        self.assertEqual(trigrams("Pé"), {"  p", " pe", "pe "})
+
+    def test_fuzzy_search_tolerates_typos(self):
+        """Test fuzzy mode finds misspelled and partial names"""
+        ProductFactory.create(user=self.user, name="Cadeira Gamer")
+        ProductFactory.create(user=self.user, name="Teclado")
+
+        self.assertEqual(self._names("cadiera"), ["Cadeira Gamer"])
+        self.assertEqual(self._names("gamr"), ["Cadeira Gamer"])
+        self.assertEqual(self._names("xyz"), [])
+
+    def test_fuzzy_search_orders_by_similarity(self):
+        """Test closer names come first"""
+        ProductFactory.create(user=self.user, name="Monitar")
+        ProductFactory.create(user=self.user, name="Monitor")
+
+        self.assertEqual(self._names("monitor"), ["Monitor", "Monitar"])
+
+    def test_trigram_index_follows_updates_and_rebuild(self):
+        """Test the trigram index is kept in sync with product names"""
+        product = ProductFactory.create(user=self.user, name="Cadeira")
+        product.name = "Poltrona"
+        product.save()
+
+        self.assertEqual(self._names("cadeira"), [])
+        self.assertEqual(self._names("poltrna"), ["Poltrona"])
+
+        rebuild_search_index()
+        self.assertEqual(self._names("poltrna"), ["Poltrona"])
+
+
+class QueryPlanIndexTest(TestCase):
+    """Os formatos de consulta mais usados devem usar os índices do Meta"""
+
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.product = ProductFactory.create(user=self.user, is_public=True)
+        if connection.vendor == "postgresql":
+            # Em tabelas minúsculas o planner prefere seq scan
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, plan)
+
+    def test_product_listing_indexes(self):
+        """Test owner/visibility, range and keyset sorts hit composite indexes"""
+        products = Product.objects.filter(user=self.user)
+
+        if connection.vendor == "postgresql":
+            # O SQLite não indexa o filtro booleano (NOT is_public) e fica
+            # com o índice da FK
+            self.assertUsesIndex(
+                products.filter(is_public=False), "product_user_public_idx"
+            )
+        self.assertUsesIndex(products.order_by("name", "pk"), "product_user_name_idx")
+        self.assertUsesIndex(
+            products.filter(price__gte=10, price__lte=50), "product_user_price_idx"
+        )
+        self.assertUsesIndex(products.filter(stock__lte=5), "product_user_stock_idx")
+
+    def test_public_catalog_partial_indexes(self):
+        """Test public catalogs use the partial indexes on is_public"""
+        public = Product.objects.filter(is_public=True)
+
+        self.assertUsesIndex(public.order_by("name", "pk"), "product_public_name_idx")
+        self.assertUsesIndex(
+            public.filter(user=self.user).order_by("-created_at"),
+            "product_public_user_recent_idx",
+        )
+
+    def test_fuzzy_search_uses_trigram_index(self):
+        """Test fuzzy search filters through the trigram index"""
+        products = search_products(
+            Product.objects.filter(user=self.user), "produto", mode="fuzzy"
+        )
+
+        if connection.vendor == "postgresql":
+            self.assertUsesIndex(products, "products_product_name_trgm")
+        else:
+            self.assertUsesIndex(products, "products_product_trigram")
+
+    def test_history_and_movement_indexes(self):
+        """Test latest price and movement lookups use (product, -date) indexes"""
+        self.assertUsesIndex(
+            self.product.price_history.all()[:1], "price_hist_product_recent_idx"
+        )
+        self.assertUsesIndex(self.product.movements.all(), "movement_product_recent_idx")
@@ -0,0 +1,174 @@
+import io
+import threading
+import time
+from decimal import Decimal
+from django.db import IntegrityError, OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from products.models import Product, ProductMovement
+from products.rollups import rollup_stats, verify_rollups
+from products.stock import (
+    InsufficientStock,
+    StockError,
+    apply_inventory_count,
+    read_inventory_counts,
+    record_movement,
+)
+from products.tests.factories import UserFactory, ProductFactory
+
+
+class RecordMovementTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.product = ProductFactory.create(
+            user=self.user, stock=5, price=Decimal("2.00")
+        )
+
+    def test_out_movement_updates_stock_ledger_and_rollups(self):
+        """Test a movement updates stock, balance and rollups together"""
+        movement = record_movement(self.product, "OUT", 3, "Venda")
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 2)
+        self.assertEqual(movement.balance_after, 2)
+        self.assertEqual(rollup_stats(user=self.user)["total_stock"], 2)
+        self.assertEqual(verify_rollups(self.user), [])
+
+    def test_oversell_is_rejected(self):
+        """Test an OUT larger than the stock changes nothing"""
+        with self.assertRaises(InsufficientStock) as ctx:
+            record_movement(self.product, "OUT", 6)
+
+        self.assertEqual(ctx.exception.available, 5)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 5)
+        self.assertEqual(self.product.movements.count(), 1)
+
+    def test_invalid_quantity(self):
+        """Test zero or negative quantities are refused"""
+        with self.assertRaises(StockError):
+            record_movement(self.product, "IN", 0)
+
+    def test_movement_skips_save_signals(self):
+        """Test no price history or adjustment is written by the movement"""
+        record_movement(self.product, "IN", 4)
+
+        self.assertEqual(self.product.price_history.count(), 1)
+        self.assertEqual(
+            list(
+                self.product.movements.order_by("moved_at", "id").values_list(
+                    "reason", flat=True
+                )
+            ),
+            ["Registro inicial do produto", ""],
+        )
+        # A instância em memória já reflete o estoque persistido
+        self.assertEqual(self.product.stock, 9)
+        self.assertFalse(self.product.has_changed("stock"))
+
+    def test_negative_stock_is_rejected_by_constraint(self):
+        """Test the database refuses negative stock"""
+        with self.assertRaises(IntegrityError):
+            Product.objects.filter(pk=self.product.pk).update(stock=-1)
+
+
+class ConcurrentMovementTest(TransactionTestCase):
+    THREADS = 12
+    STOCK = 5
+
+    def _sell_one(self, product_id, barrier, results):
+        product = Product.objects.get(pk=product_id)
+        barrier.wait()
+        try:
+            for _ in range(50):
+                try:
+                    record_movement(product, "OUT", 1, "Venda concorrente")
+                    results.append("sold")
+                    return
+                except InsufficientStock:
+                    results.append("refused")
+                    return
+                except OperationalError:
+                    # SQLite: banco travado por outra escrita, tenta de novo
+                    time.sleep(0.01)
+            results.append("gave_up")
+        finally:
+            connection.close()
+
+    def test_concurrent_outs_never_oversell(self):
+        """Test concurrent OUT movements sell exactly the available stock"""
+        product = ProductFactory.create(stock=self.STOCK)
+        barrier = threading.Barrier(self.THREADS)
+        results = []
+        threads = [
+            threading.Thread(target=self._sell_one, args=(product.pk, barrier, results))
+            for _ in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        self.assertEqual(results.count("sold"), self.STOCK)
+        self.assertEqual(results.count("refused"), self.THREADS - self.STOCK)
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(product.movements.filter(type="OUT").count(), self.STOCK)
+        self.assertEqual(ProductMovement.ledger_balance(product.pk), 0)
+
+
+class InventoryCountTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.products = [
+            ProductFactory.create(user=self.user, stock=10, price=Decimal("1.00"))
+            for _ in range(3)
+        ]
+
+    def test_count_creates_adjustments_and_sets_stock(self):
+        """Test counted quantities become IN/OUT adjustments with balances"""
+        a, b, c = self.products
+        result = apply_inventory_count(self.user, {a.pk: 14, b.pk: 7, c.pk: 10})
+
+        self.assertEqual((result.adjusted, result.unchanged), (2, 1))
+        stocks = dict(
+            Product.objects.filter(user=self.user).values_list("pk", "stock")
+        )
+        self.assertEqual(stocks, {a.pk: 14, b.pk: 7, c.pk: 10})
+        self.assertEqual(
+            list(
+                a.movements.order_by("moved_at", "id").values_list(
+                    "type", "quantity", "balance_after"
+                )
+            ),
+            [("IN", 10, 10), ("IN", 4, 14)],
+        )
+        self.assertEqual(ProductMovement.ledger_balance(b.pk), 7)
+        self.assertEqual(verify_rollups(self.user), [])
+
+    def test_count_in_constant_queries(self):
+        """Test the count costs the same for 3 or 300 products"""
+        counts = {p.pk: 0 for p in self.products}
+        # Savepoint, SELECT FOR UPDATE, UPDATE, INSERT, vínculos, UPDATE do
+        # rollup total (sem categorias) e release
+        with self.assertNumQueries(7):
+            apply_inventory_count(self.user, counts)
+
+    def test_foreign_and_negative_counts_are_reported(self):
+        """Test invalid lines are skipped without touching stock"""
+        foreign = ProductFactory.create(user=UserFactory.create(), stock=5)
+        result = apply_inventory_count(
+            self.user, {foreign.pk: 1, self.products[0].pk: -1}
+        )
+
+        self.assertEqual(result.adjusted, 0)
+        self.assertEqual(len(result.errors), 2)
+        foreign.refresh_from_db()
+        self.assertEqual(foreign.stock, 5)
+
+    def test_read_counts_from_export_csv(self):
+        """Test the exported product CSV can be uploaded as a count"""
+        content = "id,name,price,stock\n1,A,1.00,3\n2,B,1.00,x\n3,C,1.00,-1\n"
+        counts, errors = read_inventory_counts(io.StringIO(content))
+
+        self.assertEqual(counts, {1: 3})
+        self.assertEqual([line for line, _ in errors], [3, 4])
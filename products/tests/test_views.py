@@ -1,8 +1,14 @@
+import html
+import re
 from decimal import Decimal
 from django.forms import ModelForm
 from django.test import TestCase, Client
 from django.contrib.auth.models import User
 from django.urls import reverse
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.messages import get_messages
 from products.models import Product, Category, PriceHistory
 from products.tests.factories import (
@@ -12,6 +18,8 @@ from products.tests.factories import (
     PriceHistoryFactory,
 )
 from products.tests.test_utils import BaseTestCase
+from products.pagination import PAGE_SIZE
+from products.rollups import rollup_stats, verify_rollups
 
 
 class ProductViewTest(BaseTestCase):
@@ -316,6 +324,468 @@ class ProductViewTest(BaseTestCase):
         # 4 alterações, pois o primeiro valor é contabilizado como alteração.
         self.assertEqual(response.context["total_alteracoes"], 4)
 
+    def test_price_history_overview_highlights_and_trend(self):
+        """Test the largest increase and decrease use the last two prices"""
+        up = ProductFactory.create(user=self.user, price=Decimal("100.00"))
+        down = ProductFactory.create(user=self.user, price=Decimal("100.00"))
+        up.price = Decimal("150.00")
+        up.save()
+        down.price = Decimal("80.00")
+        down.save()
+
+        response = self.client.get(reverse("price_history_overview"))
+
+        self.assertEqual(response.context["maior_aumento"]["produto"], up)
+        self.assertEqual(response.context["maior_aumento"]["percentual"], 50)
+        self.assertEqual(response.context["maior_reducao"]["produto"], down)
+        self.assertEqual(response.context["maior_reducao"]["percentual"], 20)
+        trends = {
+            item["produto"].pk: item["trend"]
+            for item in response.context["produtos_com_historico"]
+        }
+        self.assertEqual(trends, {up.pk: "up", down.pk: "down"})
+
+
+class ProductListPaginationTest(BaseTestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = UserFactory.create_admin()
+        self.client.force_login(self.user)
+
+    def _collect_all_pages(self, params):
+        """Percorre todas as páginas seguindo o cursor e retorna os ids"""
+        response = self.client.get(reverse("product_list"), params)
+        ids = [p.pk for p in response.context["products"]]
+        cursor = response.context["next_cursor"]
+        while cursor:
+            response = self.client.get(reverse("product_list"), {"cursor": cursor})
+            ids += [p.pk for p in response.context["products"]]
+            cursor = response.context["next_cursor"]
+        return ids
+
+    def test_first_page_is_limited(self):
+        """Test product list renders only the first page"""
+        for i in range(PAGE_SIZE + 5):
+            ProductFactory.create(user=self.user, name=f"Produto {i:02d}")
+
+        response = self.client.get(reverse("product_list"))
+
+        self.assertEqual(len(response.context["products"]), PAGE_SIZE)
+        self.assertIsNotNone(response.context["next_cursor"])
+        # As estatísticas continuam considerando todos os produtos filtrados
+        self.assertEqual(response.context["stats"]["total_count"], PAGE_SIZE + 5)
+
+    def test_cursor_is_stable_with_duplicate_sort_values(self):
+        """Test keyset pagination visits every product once under ties"""
+        category = CategoryFactory.create(user=self.user, name="Hardware")
+        expected = set()
+        for i in range(PAGE_SIZE * 2 + 3):
+            product = ProductFactory.create(
+                user=self.user,
+                price=Decimal(i % 3),
+                stock=i % 2,
+                is_public=bool(i % 2),
+            )
+            if i % 4 == 0:
+                product.categories.add(category)
+            expected.add(product.pk)
+
+        for sort in ["name", "price", "stock", "status", "category"]:
+            for direction in ["asc", "desc"]:
+                ids = self._collect_all_pages({"sort": sort, "dir": direction})
+                self.assertEqual(len(ids), len(expected), (sort, direction))
+                self.assertEqual(set(ids), expected, (sort, direction))
+
+    def test_sort_is_kept_in_session_filters(self):
+        """Test sort and direction are persisted with the dashboard filters"""
+        self.client.get(reverse("product_list"), {"sort": "price", "dir": "desc"})
+
+        filters = self.client.session["filters_dashboard"]
+        self.assertEqual(filters["sort"], "price")
+        self.assertEqual(filters["dir"], "desc")
+
+    def test_load_more_returns_partial(self):
+        """Test HTMX load more request renders only the next items"""
+        for i in range(PAGE_SIZE + 2):
+            ProductFactory.create(user=self.user, name=f"Produto {i:02d}")
+
+        response = self.client.get(reverse("product_list"))
+        cursor = response.context["next_cursor"]
+
+        response = self.client.get(
+            reverse("product_list"),
+            {"cursor": cursor, "mode": "grid"},
+            HTTP_HX_REQUEST="true",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "products/product_grid_items.html")
+        self.assertTemplateNotUsed(response, "products/product_list.html")
+        self.assertEqual(len(response.context["products"]), 2)
+        self.assertIsNone(response.context["next_cursor"])
+
+    def test_fuzzy_search_pages_by_similarity(self):
+        """Test fuzzy mode orders by similarity across cursor pages"""
+        for i in range(PAGE_SIZE + 3):
+            ProductFactory.create(user=self.user, name=f"Monitor {i:02d}")
+        ProductFactory.create(user=self.user, name="Monitar")
+        ProductFactory.create(user=self.user, name="Teclado")
+
+        ids = self._collect_all_pages({"q": "monitor", "search_mode": "fuzzy"})
+
+        filters = self.client.session["filters_dashboard"]
+        self.assertEqual(filters["search_mode"], "fuzzy")
+        self.assertEqual(filters["sort"], "relevance")
+        self.assertEqual(len(ids), PAGE_SIZE + 4)
+        self.assertEqual(len(set(ids)), PAGE_SIZE + 4)
+        self.assertEqual(Product.objects.get(pk=ids[-1]).name, "Monitar")
+
+    def test_fuzzy_search_pages_through_tied_ranks(self):
+        """Test products tied on similarity across a page boundary are all listed"""
+        expected = {
+            ProductFactory.create(user=self.user, name=f"Mesa {i}").pk
+            for i in range(3)
+        }
+        # "mesinha" tem 3 dos 5 trigramas de "mesa": todos empatam em 0.6
+        expected |= {
+            ProductFactory.create(user=self.user, name=f"Mesinha {i:02d}").pk
+            for i in range(PAGE_SIZE + 2)
+        }
+
+        ids = self._collect_all_pages({"q": "mesa", "search_mode": "fuzzy"})
+
+        self.assertEqual(len(ids), len(expected))
+        self.assertEqual(set(ids), expected)
+
+    def test_invalid_cursor_starts_from_first_page(self):
+        """Test a tampered cursor is ignored"""
+        ProductFactory.create(user=self.user, name="Único")
+
+        response = self.client.get(reverse("product_list"), {"cursor": "%%%lixo"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["products"]), 1)
+
+
+class ProductLiveSearchTest(BaseTestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = UserFactory.create_admin()
+        self.client.force_login(self.user)
+        ProductFactory.create(user=self.user, name="Monitor", stock=3)
+        ProductFactory.create(user=self.user, name="Teclado", stock=5)
+
+    def _search(self, **params):
+        return self.client.get(
+            reverse("product_live_search"), params, HTTP_HX_REQUEST="true"
+        )
+
+    def test_returns_items_fragment_with_oob_stats(self):
+        """Test live search renders only the listing and out-of-band stats"""
+        response = self._search(q="monitor")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "products/product_list_view.html")
+        self.assertTemplateNotUsed(response, "products/product_list.html")
+        content = response.content.decode()
+        self.assertIn('id="product-view"', content)
+        self.assertIn('id="product-stats"', content)
+        self.assertIn('hx-swap-oob="true"', content)
+        self.assertIn("Monitor", content)
+        self.assertNotIn("Teclado", content)
+        self.assertEqual(self.client.session["filters_dashboard"]["q"], "monitor")
+
+    def test_equivalent_filters_hit_the_cache(self):
+        """Test normalized filter sets reuse the cached fragment"""
+        self._search(q="Monitor ")
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self._search(q=" monitor")
+
+        self.assertIn("Monitor", response.content.decode())
+        self.assertFalse(
+            [q for q in ctx.captured_queries if "products_product" in q["sql"]]
+        )
+
+    def test_different_filters_are_not_shared(self):
+        """Test a different filter set renders a fresh fragment"""
+        self._search(q="monitor")
+        response = self._search(q="teclado")
+
+        self.assertIn("Teclado", response.content.decode())
+        self.assertNotIn("Monitor", response.content.decode())
+
+    def test_load_more_sentinel_pages_the_listing(self):
+        """Test the infinite scroll sentinel continues the search on the listing"""
+        for i in range(PAGE_SIZE + 2):
+            ProductFactory.create(user=self.user, name=f"Monitor {i:02d}")
+
+        response = self._search(q="monitor")
+
+        match = re.search(r'hx-get="([^"]*\?cursor=[^"]*)"', response.content.decode())
+        self.assertIsNotNone(match)
+        url = html.unescape(match.group(1))
+        self.assertTrue(url.startswith(reverse("product_list") + "?"))
+
+        response = self.client.get(url, HTTP_HX_REQUEST="true")
+
+        self.assertTemplateUsed(response, "products/product_grid_items.html")
+        self.assertTemplateNotUsed(response, "products/product_list_view.html")
+        names = [p.name for p in response.context["products"]]
+        self.assertEqual(len(names), 3)
+        self.assertTrue(all(name.startswith("Monitor") for name in names))
+
+
+class ListQueryCountTest(BaseTestCase):
+    """As listagens devem executar o mesmo número de queries para 2 ou 20 produtos"""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = UserFactory.create_admin()
+        self.client.force_login(self.user)
+        self.categories = [
+            CategoryFactory.create(user=self.user, name=f"Cat {i}") for i in range(3)
+        ]
+
+    def _create_products(self, count):
+        for _ in range(count):
+            product = ProductFactory.create(user=self.user, stock=1, is_public=True)
+            product.categories.set(self.categories)
+            # Uma alteração de preço para alimentar o histórico
+            product.price = Decimal("11.00")
+            product.save()
+
+    def _count_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def assertConstantQueries(self, url, params=None):
+        self._create_products(2)
+        few = self._count_queries(url, params)
+        self._create_products(18)
+        many = self._count_queries(url, params)
+        self.assertEqual(few, many)
+
+    def test_product_list_query_count(self):
+        self.assertConstantQueries(reverse("product_list"))
+
+    def test_product_list_filtered_query_count(self):
+        self.assertConstantQueries(reverse("product_list"), {"q": "Test"})
+
+    def test_public_product_list_query_count(self):
+        self.assertConstantQueries(reverse("public_product_list"))
+
+    def test_user_public_catalog_query_count(self):
+        self.assertConstantQueries(
+            reverse("user_public_catalog", args=[self.user.username])
+        )
+
+    def test_movement_select_product_query_count(self):
+        self.assertConstantQueries(reverse("movement_select_product", args=["IN"]))
+
+    def test_price_history_overview_query_count(self):
+        self.assertConstantQueries(reverse("price_history_overview"))
+
+
+class ProductBulkCategoryTest(BaseTestCase):
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.client.force_login(self.user)
+        self.target = CategoryFactory.create(user=self.user, name="Alvo")
+        self.other = CategoryFactory.create(user=self.user, name="Outra")
+        self.products = [
+            ProductFactory.create(user=self.user, stock=2, price=Decimal("5.00"))
+            for _ in range(20)
+        ]
+        self.products[0].categories.add(self.target, self.other)
+        self.products[1].categories.add(self.other)
+
+    def _post(self, action, category=None):
+        return self.client.post(
+            reverse("product_bulk_action"),
+            {
+                "action": action,
+                "product_ids": [p.pk for p in self.products],
+                "bulk_category_id": (category or self.target).pk,
+            },
+        )
+
+    def test_add_category_is_set_based(self):
+        """Test bulk add issues a constant number of queries"""
+        with CaptureQueriesContext(connection) as ctx:
+            self._post("add_category")
+        inserts = [
+            q
+            for q in ctx.captured_queries
+            if q["sql"].startswith("INSERT")
+            and "products_product_categories" in q["sql"]
+        ]
+
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(self.target.products.count(), 20)
+        self.assertEqual(
+            rollup_stats(self.user, category_id=self.target.pk)["total_count"], 20
+        )
+        self.assertEqual(verify_rollups(self.user), [])
+
+    def test_remove_category(self):
+        """Test bulk remove unlinks only the chosen category"""
+        self._post("remove_category", self.other)
+
+        self.assertEqual(self.other.products.count(), 0)
+        self.assertEqual(self.target.products.count(), 1)
+        self.assertEqual(verify_rollups(self.user), [])
+
+    def test_replace_category(self):
+        """Test bulk replace leaves the chosen category as the only one"""
+        self._post("replace_category")
+
+        self.assertEqual(self.target.products.count(), 20)
+        self.assertEqual(self.other.products.count(), 0)
+        self.assertEqual(verify_rollups(self.user), [])
+
+    def test_visibility_toggle_applies_rollup_deltas(self):
+        """Test make public/private moves only the changed products in the rollups"""
+        self.products[0].is_public = True
+        self.products[0].save()
+
+        with CaptureQueriesContext(connection) as ctx:
+            self._post("make_public")
+        rebuilds = [
+            q
+            for q in ctx.captured_queries
+            if q["sql"].startswith("DELETE") and "inventoryrollup" in q["sql"]
+        ]
+
+        self.assertEqual(rebuilds, [])
+        self.assertEqual(Product.objects.filter(is_public=True).count(), 20)
+        stats = rollup_stats(self.user, is_public=True, category_id=self.other.pk)
+        self.assertEqual(stats["total_count"], 2)
+        self.assertEqual(verify_rollups(self.user), [])
+
+        self._post("make_private")
+
+        self.assertEqual(rollup_stats(self.user, is_public=False)["total_count"], 20)
+        self.assertEqual(rollup_stats(self.user, is_public=True)["total_count"], 0)
+        self.assertEqual(verify_rollups(self.user), [])
+
+    def test_other_users_category_is_refused(self):
+        """Test a category from another user returns 404"""
+        foreign = CategoryFactory.create(user=UserFactory.create())
+        response = self._post("add_category", foreign)
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(foreign.products.count(), 0)
+
+
+class ProductBulkPriceTest(BaseTestCase):
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.client.force_login(self.user)
+        self.category = CategoryFactory.create(user=self.user)
+        self.products = [
+            ProductFactory.create(user=self.user, stock=3, price=Decimal("10.00"))
+            for _ in range(30)
+        ]
+        for product in self.products:
+            product.categories.add(self.category)
+
+    def _post(self, mode, value):
+        return self.client.post(
+            reverse("product_bulk_action"),
+            {
+                "action": "adjust_price",
+                "product_ids": [p.pk for p in self.products],
+                "price_mode": mode,
+                "price_value": value,
+            },
+        )
+
+    def test_percent_adjustment_in_constant_queries(self):
+        """Test repricing 30 products takes a handful of queries"""
+        with CaptureQueriesContext(connection) as ctx:
+            self._post("percent", "8")
+        history_inserts = [
+            q
+            for q in ctx.captured_queries
+            if q["sql"].startswith("INSERT") and "products_pricehistory" in q["sql"]
+        ]
+
+        self.assertEqual(len(history_inserts), 1)
+        self.assertLess(len(ctx.captured_queries), 20)
+        prices = set(
+            Product.objects.filter(user=self.user).values_list("price", flat=True)
+        )
+        self.assertEqual(prices, {Decimal("10.80")})
+        self.assertEqual(
+            PriceHistory.objects.filter(product__user=self.user).count(), 60
+        )
+        self.assertEqual(verify_rollups(self.user), [])
+
+    def test_amount_never_goes_negative(self):
+        """Test a fixed reduction larger than the price floors at zero"""
+        self._post("amount", "-12,50")
+
+        prices = Product.objects.filter(user=self.user).values_list("price", flat=True)
+        self.assertEqual(set(prices), {Decimal("0.00")})
+        self.assertEqual(verify_rollups(self.user), [])
+
+    def test_unchanged_price_writes_no_history(self):
+        """Test setting the current price records nothing"""
+        self._post("set", "10,00")
+
+        self.assertEqual(
+            PriceHistory.objects.filter(product__user=self.user).count(), 30
+        )
+
+    def test_invalid_value(self):
+        """Test an unparseable value changes nothing"""
+        response = self._post("percent", "abc")
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            Product.objects.filter(user=self.user, price=Decimal("10.00")).count(), 30
+        )
+
+
+class InventoryCountViewTest(BaseTestCase):
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.client.force_login(self.user)
+        self.product = ProductFactory.create(user=self.user, stock=10)
+        self.other = ProductFactory.create(user=self.user, stock=4)
+
+    def test_form_counts_adjust_stock(self):
+        """Test blank fields are ignored and filled ones are applied"""
+        response = self.client.post(
+            reverse("inventory_count"),
+            {f"count_{self.product.pk}": "6", f"count_{self.other.pk}": ""},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.product.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.product.stock, self.other.stock), (6, 4))
+        self.assertEqual(
+            self.product.movements.filter(reason="Ajuste de estoque").count(), 1
+        )
+
+    def test_csv_upload(self):
+        """Test a CSV of counts is applied and bad lines are listed"""
+        content = f"product_id;counted\n{self.other.pk};9\n999999;1\n"
+        upload = SimpleUploadedFile("contagem.csv", content.encode("utf-8"))
+        response = self.client.post(
+            reverse("inventory_count"), {"file": upload, "reason": "Balanço"}
+        )
+
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.stock, 9)
+        self.assertEqual(self.other.movements.latest("id").reason, "Balanço")
+        self.assertContains(response, "Produto não encontrado.")
+
 
 class CategoryViewTest(BaseTestCase):
     def setUp(self):
@@ -566,6 +1036,81 @@ class UtilityViewTest(BaseTestCase):
         self.user.profile.refresh_from_db()  # type: ignore
         self.assertEqual(self.user.profile.view_preferences.get("prod_list"), "table")  # type: ignore
 
+    def test_product_list_renders_only_active_view_mode(self):
+        """Test only the stored view mode is rendered"""
+        ProductFactory.create(user=self.user, name="Produto Único")
+        self.user.profile.view_preferences = {"product_list": "table"}  # type: ignore
+        self.user.profile.save()  # type: ignore
+
+        response = self.client.get(reverse("product_list"))
+
+        self.assertContains(response, 'id="view-table"')
+        self.assertNotContains(response, 'id="view-grid"')
+
+    def test_set_view_mode_htmx_returns_partial(self):
+        """Test HTMX mode switch returns only the swapped product block"""
+        ProductFactory.create(user=self.user, name="Produto Único")
+        url = reverse(
+            "set_view_mode", kwargs={"context": "product_list", "mode": "table"}
+        )
+
+        response = self.client.get(
+            url,
+            HTTP_HX_REQUEST="true",
+            HTTP_HX_TARGET="product-view",
+            HTTP_HX_CURRENT_URL="http://testserver" + reverse("product_list"),
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "products/product_list_view.html")
+        self.assertTemplateNotUsed(response, "products/product_list.html")
+        self.assertContains(response, 'id="view-table"')
+        self.assertContains(response, 'hx-swap-oob="true"')
+        self.assertContains(response, "Produto Único")
+        self.user.profile.refresh_from_db()  # type: ignore
+        self.assertEqual(self.user.profile.view_preferences["product_list"], "table")  # type: ignore
+
+    def test_set_view_mode_htmx_sentinel_pages_the_listing(self):
+        """Test the swapped block keeps loading more from the listing URL"""
+        for i in range(PAGE_SIZE + 1):
+            ProductFactory.create(user=self.user, name=f"Produto {i:02d}")
+        url = reverse(
+            "set_view_mode", kwargs={"context": "product_list", "mode": "table"}
+        )
+
+        response = self.client.get(
+            url,
+            HTTP_HX_REQUEST="true",
+            HTTP_HX_TARGET="product-view",
+            HTTP_HX_CURRENT_URL="http://testserver" + reverse("product_list"),
+        )
+
+        content = response.content.decode()
+        self.assertIn(f'hx-get="{reverse("product_list")}?cursor=', content)
+        self.assertNotIn(f'hx-get="{url}?cursor=', content)
+
+    def test_set_view_mode_htmx_keeps_current_filters(self):
+        """Test HTMX mode switch re-renders the page with its query string"""
+        ProductFactory.create(user=self.user, name="Laptop", is_public=True)
+        ProductFactory.create(user=self.user, name="Phone", is_public=True)
+        url = reverse(
+            "set_view_mode", kwargs={"context": "public_product_list", "mode": "grid"}
+        )
+
+        response = self.client.get(
+            url,
+            HTTP_HX_REQUEST="true",
+            HTTP_HX_TARGET="product-view",
+            HTTP_HX_CURRENT_URL="http://testserver"
+            + reverse("public_product_list")
+            + "?q=Laptop",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'id="view-grid"')
+        self.assertContains(response, "Laptop")
+        self.assertNotContains(response, "Phone")
+
     def test_logout_view_post(self):
         """Test custom logout view"""
         response = self.client.post(reverse("custom_logout"))
@@ -3,13 +3,22 @@ from . import views
 
 urlpatterns = [
     path("", views.product_list, name="product_list"),
+    path("search/", views.product_live_search, name="product_live_search"),
+    path("export/", views.product_export, name="product_export"),
     path("detail/<int:pk>/", views.product_detail, name="product_detail"),
     path("price-history/<int:pk>/", views.price_history_view, name="price_history"),
     path("price-history/", views.price_history_overview, name="price_history_overview"),
+    path(
+        "price-history/export/",
+        views.price_history_export,
+        name="price_history_export",
+    ),
     path("movements/<int:pk>/", views.product_movement_view, name="product_movement"),
     path(
         "movements/", views.product_movement_overview, name="product_movement_overview"
     ),
+    path("movements/export/", views.movement_export, name="movement_export"),
+    path("movements/inventory/", views.inventory_count, name="inventory_count"),
     path(
         "movements/select/<str:type>/",
         views.movement_select_product,
@@ -24,6 +33,7 @@ urlpatterns = [
     path("add/", views.product_create, name="product_create"),
     path("edit/<int:pk>/", views.product_update, name="product_update"),
     path("delete/<int:pk>/", views.product_delete, name="product_delete"),
+    path("import/", views.product_import, name="product_import"),
     path("bulk-action/", views.product_bulk_action, name="product_bulk_action"),
     # Categories
     path("categories/", views.category_list, name="category_list"),
@@ -3,100 +3,150 @@ from django.contrib.auth.decorators import login_required
 from django.db import models
 from django.contrib.auth.models import User
 from .models import Product, Category, PriceHistory, ProductMovement
-from .forms import ProductForm, CategoryForm, MovementForm
+from .forms import (
+    BulkPriceForm,
+    CategoryForm,
+    InventoryCountForm,
+    MovementForm,
+    ProductForm,
+    ProductImportForm,
+)
+from .bulk import (
+    PriceAdjustmentError,
+    add_category,
+    adjust_prices,
+    remove_category,
+    replace_categories,
+    set_visibility,
+)
+from .exporter import EXPORT_FORMATS, export_lines
+from .importer import CSVImportError, import_products
+from .pagination import paginate_keyset
+from .price_summary import (
+    daily_prices_between,
+    price_history_between,
+    use_daily_prices,
+)
+from .queries import for_listing, inventory_stats
+from .rollups import rollup_stats
+from .search import SEARCH_MODES, search_products
+from .stock import (
+    InsufficientStock,
+    StockError,
+    apply_inventory_count,
+    read_inventory_counts,
+    record_movement,
+)
 from django.contrib import messages
-from django.db.models import Min, Sum, F, ExpressionWrapper, DecimalField, Q
+from django.db.models import Count, Min, Sum, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.core.cache import cache
+from django.http import HttpResponse, QueryDict, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.urls import Resolver404, resolve, reverse
+from urllib.parse import urlsplit
+import hashlib
+import io
+import json
 from datetime import datetime, timedelta
-from django.db.models import Count
+from decimal import Decimal
 
 
-# --- Product Views ---
-@login_required
-def product_list(request):
-    # Lógica para limpar filtros
-    if "clear" in request.GET:
-        if "filters_dashboard" in request.session:
-            del request.session["filters_dashboard"]
-        return redirect("product_list")
+# Listagens que sabem devolver apenas o bloco #product-view
+VIEW_SWAP_URL_NAMES = {"product_list", "public_product_list", "user_public_catalog"}
 
-    # Recuperação de filtros da sessão
-    session_filters = request.session.get("filters_dashboard", {})
 
-    q = request.GET.get("q") if "q" in request.GET else session_filters.get("q", "")
-    status = (
-        request.GET.get("status")
-        if "status" in request.GET
-        else session_filters.get("status", "")
-    )
-    min_price = (
-        request.GET.get("min_price")
-        if "min_price" in request.GET
-        else session_filters.get("min_price", "")
-    )
-    max_price = (
-        request.GET.get("max_price")
-        if "max_price" in request.GET
-        else session_filters.get("max_price", "")
-    )
-    min_stock = (
-        request.GET.get("min_stock")
-        if "min_stock" in request.GET
-        else session_filters.get("min_stock", "")
-    )
-    max_stock = (
-        request.GET.get("max_stock")
-        if "max_stock" in request.GET
-        else session_filters.get("max_stock", "")
-    )
-    category_id = (
-        request.GET.get("category")
-        if "category" in request.GET
-        else session_filters.get("category", "")
-    )
+def _is_view_swap(request):
+    """Troca de modo grade/tabela via HTMX: renderiza só o modo ativo."""
+    return request.headers.get("HX-Target") == "product-view"
 
-    # Parâmetros de Ordenação
-    sort_field = request.GET.get("sort", "name")
-    sort_direction = request.GET.get("dir", "asc")
-    prefix = "" if sort_direction == "asc" else "-"
 
-    # Salva filtros na sessão
-    request.session["filters_dashboard"] = {
-        "q": q,
-        "status": status,
-        "category": category_id,
-        "min_price": min_price,
-        "max_price": max_price,
-        "min_stock": min_stock,
-        "max_stock": max_stock,
+# Filtros do dashboard, na ordem em que são persistidos na sessão
+DASHBOARD_FILTER_DEFAULTS = {
+    "q": "",
+    "status": "",
+    "category": "",
+    "min_price": "",
+    "max_price": "",
+    "min_stock": "",
+    "max_stock": "",
+    "search_mode": "fulltext",
+    "sort": "name",
+    "dir": "asc",
+}
+
+# Validade do cache da busca em tempo real (segundos)
+LIVE_SEARCH_CACHE_TTL = 5
+
+
+def _dashboard_filters(request):
+    """Lê os filtros do dashboard do GET, com a sessão como fallback."""
+    session_filters = request.session.get("filters_dashboard", {})
+    filters = {
+        key: (
+            request.GET.get(key)
+            if key in request.GET
+            else session_filters.get(key, default)
+        )
+        for key, default in DASHBOARD_FILTER_DEFAULTS.items()
     }
+    if filters["search_mode"] not in SEARCH_MODES:
+        filters["search_mode"] = "fulltext"
+
+    # Ao filtrar no modo aproximado, os resultados vêm por similaridade até
+    # que o usuário escolha outra coluna
+    if "search_mode" in request.GET and "sort" not in request.GET:
+        filters["sort"] = "relevance" if filters["search_mode"] == "fuzzy" else "name"
+    fuzzy = filters["search_mode"] == "fuzzy" and bool(filters["q"])
+    if filters["sort"] == "relevance" and not fuzzy:
+        filters["sort"] = "name"
+    return filters
+
+
+def _dashboard_products(user, filters):
+    """
+    Aplica os filtros do dashboard aos produtos de `user`. Retorna o queryset,
+    a chave de ordenação e se a ordem é decrescente.
+    """
+    q = filters["q"]
+    status = filters["status"]
+    sort_field = filters["sort"]
 
     # QuerySet Base
-    products = Product.objects.filter(user=request.user)
+    products = Product.objects.filter(user=user)
 
     # Filtros
     if q:
-        products = products.filter(Q(name__icontains=q) | Q(description__icontains=q))
-    if category_id:
-        products = products.filter(categories__id=category_id)
+        products = search_products(
+            products, q, ranked=sort_field == "relevance", mode=filters["search_mode"]
+        )
+    if filters["category"]:
+        products = products.filter(categories__id=filters["category"])
     if status == "public":
         products = products.filter(is_public=True)
     elif status == "private":
         products = products.filter(is_public=False)
-    if min_price:
-        products = products.filter(price__gte=min_price)
-    if max_price:
-        products = products.filter(price__lte=max_price)
-    if min_stock:
-        products = products.filter(stock__gte=min_stock)
-    if max_stock:
-        products = products.filter(stock__lte=max_stock)
-
-    # Ordenação com Annotate para evitar duplicados
+    if filters["min_price"]:
+        products = products.filter(price__gte=filters["min_price"])
+    if filters["max_price"]:
+        products = products.filter(price__lte=filters["max_price"])
+    if filters["min_stock"]:
+        products = products.filter(stock__gte=filters["min_stock"])
+    if filters["max_stock"]:
+        products = products.filter(stock__lte=filters["max_stock"])
+
+    # Ordenação com Annotate para evitar duplicados. O Coalesce garante uma
+    # chave não nula, necessária para a comparação do cursor.
+    descending = filters["dir"] == "desc"
     if sort_field == "category":
-        products = products.annotate(sort_key=Min("categories__name")).order_by(
-            f"{prefix}sort_key"
+        products = products.annotate(
+            sort_key=Coalesce(Min("categories__name"), Value(""))
         )
+        sort_key = "sort_key"
+    elif sort_field == "relevance":
+        sort_key = "search_rank"
+        descending = True
     else:
         valid_fields = {
             "name": "name",
@@ -104,21 +154,120 @@ def product_list(request):
             "stock": "stock",
             "status": "is_public",
         }
-        target = valid_fields.get(sort_field, "name")
-        products = products.order_by(f"{prefix}{target}")
+        sort_key = valid_fields.get(sort_field, "name")
 
     # Remove duplicatas residuais de filtros M2M
-    products = products.distinct()
-
-    # Cálculo de Estatísticas usando agregação do Banco de Dados
-    stats = {
-        "total_count": products.count(),
-        "total_stock": products.aggregate(Sum("stock"))["stock__sum"] or 0,
-        "total_value": products.annotate(
-            val=ExpressionWrapper(F("price") * F("stock"), output_field=DecimalField())
-        ).aggregate(total=Sum("val"))["total"]
-        or 0,
-    }
+    return products.distinct(), sort_key, descending
+
+
+def _dashboard_stats(user, filters, products):
+    # Sem busca nem faixas de preço/estoque, as estatísticas vêm prontas dos
+    # rollups; caso contrário, uma única agregação no Banco de Dados
+    if not any(
+        filters[key] for key in ("q", "min_price", "max_price", "min_stock", "max_stock")
+    ):
+        return rollup_stats(
+            user=user,
+            is_public={"public": True, "private": False}.get(filters["status"]),
+            category_id=filters["category"],
+        )
+    return inventory_stats(products)
+
+
+def _live_search_cache_key(user, filters, view_mode):
+    """Chave do cache: mesmos filtros normalizados, mesma resposta."""
+    normalized = {key: str(value).strip() for key, value in filters.items()}
+    normalized["q"] = " ".join(normalized["q"].lower().split())
+    raw = json.dumps([user.pk, view_mode, normalized], sort_keys=True)
+    return "product_live_search:" + hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _overview_products(request):
+    """
+    Produtos do usuário filtrados como nos painéis de histórico de preços e
+    de movimentações (busca e categoria). Retorna (queryset, q, categoria).
+    """
+    products = Product.objects.filter(user=request.user)
+
+    # Filtro por Termo de Busca (q)
+    q = request.GET.get("q", "")
+    if q:
+        products = search_products(products, q)
+
+    # Filtro por Categoria
+    category_id = request.GET.get("category")
+    if category_id:
+        products = products.filter(categories__id=category_id)
+    return products, q, category_id
+
+
+def _parse_date(value):
+    """Data "AAAA-MM-DD" dos filtros de período, ou None se vazia/inválida."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def _filter_movements(movements, params):
+    """Filtros de período (data_inicio/data_fim) e tipo das movimentações."""
+    data_inicio = params.get("data_inicio")
+    data_fim = params.get("data_fim")
+    tipo = params.get("tipo")
+
+    if data_inicio:
+        try:
+            data_inicio_obj = datetime.strptime(data_inicio, "%Y-%m-%d")
+            movements = movements.filter(moved_at__gte=data_inicio_obj)
+        except ValueError:
+            pass
+
+    if data_fim:
+        try:
+            data_fim_obj = datetime.strptime(data_fim, "%Y-%m-%d")
+            data_fim_obj = data_fim_obj + timedelta(days=1)
+            movements = movements.filter(moved_at__lt=data_fim_obj)
+        except ValueError:
+            pass
+
+    if tipo in ["IN", "OUT"]:
+        movements = movements.filter(type=tipo)
+    return movements
+
+
+def _export_response(kind, queryset, fmt, filename):
+    """Resposta em streaming: a memória não cresce com o número de linhas."""
+    if fmt not in EXPORT_FORMATS:
+        fmt = "csv"
+    content_type, extension = EXPORT_FORMATS[fmt]
+    response = StreamingHttpResponse(
+        export_lines(kind, queryset, fmt), content_type=content_type
+    )
+    stamp = timezone.localdate().isoformat()
+    response["Content-Disposition"] = (
+        f'attachment; filename="{filename}-{stamp}.{extension}"'
+    )
+    return response
+
+
+# --- Product Views ---
+@login_required
+def product_list(request):
+    # Lógica para limpar filtros
+    if "clear" in request.GET:
+        if "filters_dashboard" in request.session:
+            del request.session["filters_dashboard"]
+        return redirect("product_list")
+
+    # Recuperação de filtros (GET ou sessão) e persistência na sessão,
+    # incluindo a ordenação usada pelo cursor da paginação
+    filters = _dashboard_filters(request)
+    request.session["filters_dashboard"] = filters
+
+    products, sort_key, descending = _dashboard_products(request.user, filters)
+    stats = _dashboard_stats(request.user, filters, products)
 
     # Determine view mode
     view_mode = "grid"
@@ -127,28 +276,109 @@ def product_list(request):
     else:
         view_mode = request.session.get("view_mode_product_list", "grid")
 
+    # Paginação por cursor: páginas profundas custam o mesmo que a primeira
+    page = paginate_keyset(
+        for_listing(products),
+        filters["sort"],
+        sort_key,
+        descending=descending,
+        cursor=request.GET.get("cursor"),
+    )
+
+    # "Carregar mais" do scroll infinito: devolve apenas os itens da página
+    if request.headers.get("HX-Request") and "cursor" in request.GET:
+        mode = request.GET.get("mode", view_mode)
+        template = (
+            "products/product_table_rows.html"
+            if mode == "table"
+            else "products/product_grid_items.html"
+        )
+        return render(
+            request,
+            template,
+            {
+                "products": page.items,
+                "next_cursor": page.next_cursor,
+                "is_public_view": False,
+                "view_mode": mode,
+                "listing_url": reverse("product_list"),
+            },
+        )
+
+    swap = _is_view_swap(request)
     return render(
         request,
-        "products/product_list.html",
+        "products/product_list_view.html" if swap else "products/product_list.html",
         {
-            "products": products,
+            "products": page.items,
+            "next_cursor": page.next_cursor,
             "categories": Category.objects.filter(user=request.user),
             "stats": stats,
             "title": "Meus Produtos",
             "is_public_view": False,
-            "q": q,
-            "status": status,
-            "category_id": category_id,
-            "min_price": min_price,
-            "max_price": max_price,
-            "min_stock": min_stock,
-            "max_stock": max_stock,
+            "sort_field": filters["sort"],
+            "sort_direction": "desc" if descending else "asc",
+            "q": filters["q"],
+            "status": filters["status"],
+            "category_id": filters["category"],
+            "search_mode": filters["search_mode"],
+            "min_price": filters["min_price"],
+            "max_price": filters["max_price"],
+            "min_stock": filters["min_stock"],
+            "max_stock": filters["max_stock"],
             "view_mode": view_mode,
             "view_context": "product_list",
+            "swap_toggle": swap,
+            # Fixo, e não request.path: na troca de modo via HTMX esta view é
+            # chamada a partir de /view-mode/
+            "listing_url": reverse("product_list"),
         },
     )
 
 
+@login_required
+def product_live_search(request):
+    """
+    Busca em tempo real do dashboard (hx-get a cada digitação): devolve apenas
+    o bloco #product-view e as estatísticas via out-of-band swap, sem a página,
+    o formulário de filtros e as categorias. A resposta fica alguns segundos
+    em cache, pela combinação normalizada de filtros.
+    """
+    filters = _dashboard_filters(request)
+    # Mantém o "carregar mais" (que lê a sessão) coerente com a busca, mas só
+    # grava a sessão quando os filtros realmente mudam
+    if request.session.get("filters_dashboard") != filters:
+        request.session["filters_dashboard"] = filters
+
+    view_mode = request.user.profile.view_preferences.get("product_list", "grid")
+    cache_key = _live_search_cache_key(request.user, filters, view_mode)
+    content = cache.get(cache_key)
+    if content is None:
+        products, sort_key, descending = _dashboard_products(request.user, filters)
+        page = paginate_keyset(
+            for_listing(products), filters["sort"], sort_key, descending=descending
+        )
+        content = render_to_string(
+            "products/product_live_search.html",
+            {
+                "products": page.items,
+                "next_cursor": page.next_cursor,
+                "stats": _dashboard_stats(request.user, filters, products),
+                "is_public_view": False,
+                "sort_field": filters["sort"],
+                "sort_direction": "desc" if descending else "asc",
+                "view_mode": view_mode,
+                "view_context": "product_list",
+                # O "carregar mais" pagina a listagem (que lê os filtros da
+                # sessão), não esta busca, que sempre devolve a 1ª página
+                "listing_url": reverse("product_list"),
+            },
+            request=request,
+        )
+        cache.set(cache_key, content, LIVE_SEARCH_CACHE_TTL)
+    return HttpResponse(content)
+
+
 @login_required
 def product_create(request):
     if request.method == "POST":
@@ -205,10 +435,45 @@ def product_delete(request, pk):
     return render(request, "products/product_confirm_delete.html", {"product": product})
 
 
+@login_required
+def product_import(request):
+    """
+    Upload de CSV para criar produtos em massa (ver `products.importer`).
+    Mostra o resumo da importação e os erros por linha.
+    """
+    result = None
+    if request.method == "POST":
+        form = ProductImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            stream = io.TextIOWrapper(
+                form.cleaned_data["file"], encoding="utf-8-sig", newline=""
+            )
+            try:
+                result = import_products(request.user, stream)
+            except (UnicodeDecodeError, CSVImportError) as exc:
+                messages.error(request, f"Não foi possível importar o arquivo: {exc}")
+            else:
+                if result.created:
+                    messages.success(
+                        request,
+                        f"{result.created} produtos importados com sucesso.",
+                    )
+                if result.failed:
+                    messages.warning(
+                        request, f"{result.failed} linhas não foram importadas."
+                    )
+    else:
+        form = ProductImportForm()
+    return render(
+        request, "products/product_import.html", {"form": form, "result": result}
+    )
+
+
 @login_required
 def product_bulk_action(request):
     """
-    Realiza ações em massa (excluir, público, privado) em múltiplos produtos.
+    Realiza ações em massa (excluir, público, privado, categorias, reajuste
+    de preço) em múltiplos produtos.
     """
     if request.method == "POST":
         product_ids = request.POST.getlist("product_ids")
@@ -226,33 +491,101 @@ def product_bulk_action(request):
             products.delete()
             messages.success(request, f"{count} produtos excluídos com sucesso.")
         elif action == "make_public":
-            products.update(is_public=True)
+            set_visibility(products, True)
             messages.success(request, f"{count} produtos marcados como Públicos.")
         elif action == "make_private":
-            products.update(is_public=False)
+            set_visibility(products, False)
             messages.success(request, f"{count} produtos marcados como Privados.")
-        elif action == "add_category":
+        elif action in ("add_category", "remove_category", "replace_category"):
             category_id = request.POST.get("bulk_category_id")
             if category_id:
                 category = get_object_or_404(
                     Category, id=category_id, user=request.user
                 )
-                for product in products:
-                    product.categories.add(category)
-                messages.success(
-                    request,
-                    f"Categoria '{category.name}' adicionada a {count} produtos.",
-                )
+                # Vínculos gravados por conjunto, com um único m2m_changed
+                if action == "add_category":
+                    add_category(category, products)
+                    messages.success(
+                        request,
+                        f"Categoria '{category.name}' adicionada a {count} produtos.",
+                    )
+                elif action == "remove_category":
+                    removed = remove_category(category, products)
+                    messages.success(
+                        request,
+                        f"Categoria '{category.name}' removida de {removed} produtos.",
+                    )
+                else:
+                    replace_categories(category, products)
+                    messages.success(
+                        request,
+                        f"Categoria de {count} produtos substituída por '{category.name}'.",
+                    )
             else:
                 messages.error(request, "Nenhuma categoria selecionada.")
+        elif action == "adjust_price":
+            form = BulkPriceForm(request.POST)
+            if form.is_valid():
+                try:
+                    changed = adjust_prices(
+                        products,
+                        form.cleaned_data["price_mode"],
+                        form.cleaned_data["price_value"],
+                    )
+                except PriceAdjustmentError as exc:
+                    messages.error(request, str(exc))
+                else:
+                    messages.success(request, f"Preço de {changed} produtos reajustado.")
+            else:
+                messages.error(request, "Informe um reajuste de preço válido.")
         else:
             messages.error(request, "Ação inválida.")
 
     return redirect("product_list")
 
 
+@login_required
+def product_export(request):
+    """
+    Exporta os produtos com os mesmos filtros e ordenação do dashboard
+    (`?format=csv|jsonl`).
+    """
+    filters = _dashboard_filters(request)
+    products, sort_key, descending = _dashboard_products(request.user, filters)
+    products = products.order_by(
+        f"-{sort_key}" if descending else sort_key, "-pk" if descending else "pk"
+    )
+    return _export_response(
+        "products", products, request.GET.get("format", "csv"), "produtos"
+    )
+
+
+@login_required
+def price_history_export(request):
+    """Exporta o histórico de preços com os filtros da visão geral de preços."""
+    products, _, _ = _overview_products(request)
+    history = PriceHistory.objects.filter(product__in=products).order_by(
+        "product_id", "changed_at", "id"
+    )
+    return _export_response(
+        "price_history", history, request.GET.get("format", "csv"), "historico-precos"
+    )
+
+
+@login_required
+def movement_export(request):
+    """Exporta as movimentações com os filtros da visão geral de movimentações."""
+    products, _, _ = _overview_products(request)
+    movements = _filter_movements(
+        ProductMovement.objects.filter(product__in=products), request.GET
+    ).order_by("moved_at", "id")
+    return _export_response(
+        "movements", movements, request.GET.get("format", "csv"), "movimentacoes"
+    )
+
+
 def product_detail(request, pk):
-    product = get_object_or_404(Product, pk=pk)
+    product = get_object_or_404(for_listing(Product.objects.all()), pk=pk)
 
     # Se o produto for privado, apenas o dono pode ver (exige estar logado e ser o dono)
     if not product.is_public:
@@ -273,39 +606,41 @@ def price_history_view(request, pk):
             return redirect("account_login")
 
     # Filtros de data
-    price_history = product.price_history.all()
-
     data_inicio = request.GET.get("data_inicio")
     data_fim = request.GET.get("data_fim")
+    inicio = _parse_date(data_inicio)
+    fim = _parse_date(data_fim)
 
-    if data_inicio:
-        try:
-            # Converte string para datetime ingênuo
-            data_inicio_obj = datetime.strptime(data_inicio, "%Y-%m-%d")
-            # Torna o datetime ciente (aware) do fuso horário do projeto
-            data_inicio_obj = timezone.make_aware(data_inicio_obj)
-            price_history = price_history.filter(changed_at__gte=data_inicio_obj)
-        except ValueError:
-            pass
+    # Períodos longos usam os rollups diários em vez dos registros brutos
+    if use_daily_prices(product, inicio, fim):
+        daily_prices = list(daily_prices_between(product, inicio, fim))
+        return render(
+            request,
+            "products/price_history.html",
+            {
+                "product": product,
+                "daily": True,
+                "daily_prices": daily_prices,
+                "total_alteracoes": sum(d.change_count for d in daily_prices),
+                "primeira_alteracao": daily_prices[-1].day if daily_prices else None,
+                "data_inicio": data_inicio,
+                "data_fim": data_fim,
+            },
+        )
 
-    if data_fim:
-        try:
-            # Converte string para datetime ingênuo
-            data_fim_obj = datetime.strptime(data_fim, "%Y-%m-%d")
-            # Adiciona 1 dia para incluir todo o dia final (até 23:59:59)
-            data_fim_obj = data_fim_obj + timedelta(days=1)
-            # Torna o datetime ciente (aware)
-            data_fim_obj = timezone.make_aware(data_fim_obj)
-            price_history = price_history.filter(changed_at__lt=data_fim_obj)
-        except ValueError:
-            pass
+    price_history = list(price_history_between(product, inicio, fim))
 
     return render(
         request,
         "products/price_history.html",
         {
             "product": product,
+            "daily": False,
             "price_history": price_history,
+            "total_alteracoes": len(price_history),
+            "primeira_alteracao": (
+                price_history[-1].changed_at if price_history else None
+            ),
             "data_inicio": data_inicio,
             "data_fim": data_fim,
         },
@@ -319,116 +654,62 @@ def price_history_overview(request):
         messages.error(request, "Você precisa estar logado para acessar esta página.")
         return redirect("account_login")
 
-    # Base Queryset com otimização de prefetch
-    user_products = Product.objects.filter(user=request.user).prefetch_related(
-        "price_history"
-    )
-
-    # Filtro por Termo de Busca (q)
-    q = request.GET.get("q", "")
-    if q:
-        user_products = user_products.filter(
-            models.Q(name__icontains=q) | models.Q(description__icontains=q)
-        )
+    user_products, q, category_id = _overview_products(request)
 
-    # Filtro por Categoria
-    category_id = request.GET.get("category")
-    if category_id:
-        user_products = user_products.filter(categories__id=category_id)
+    # O resumo de preços fica em Product (price_summary.py): nenhuma
+    # consulta ao histórico
+    product_ids = user_products.order_by().values("pk")
+    totals = Product.objects.filter(pk__in=product_ids).aggregate(
+        total_produtos=Count("pk"), total_alteracoes=Sum("price_change_count")
+    )
+    total_alteracoes = totals["total_alteracoes"] or 0
+    total_produtos = totals["total_produtos"]
+    media_alteracoes = total_alteracoes / total_produtos if total_produtos > 0 else 0
 
-    # Estatísticas gerais
-    total_alteracoes = PriceHistory.objects.filter(product__in=user_products).count()
+    products = list(
+        for_listing(
+            Product.objects.filter(pk__in=product_ids, price_change_count__gt=0)
+        ).order_by("-last_price_change_at", "-pk")
+    )
 
     # Produto com mais alterações
-    produto_mais_alteracoes_obj = (
-        user_products.annotate(num_alteracoes=Count("price_history"))
-        .order_by("-num_alteracoes")
-        .first()
+    produto_mais_alteracoes_obj = max(
+        products, key=lambda p: p.price_change_count, default=None
     )
     produto_mais_alteracoes = {
         "produto": produto_mais_alteracoes_obj,
         "count": (
-            produto_mais_alteracoes_obj.num_alteracoes  # type: ignore
+            produto_mais_alteracoes_obj.price_change_count
             if produto_mais_alteracoes_obj
             else 0
         ),
     }
 
-    # Calcular maior aumento e redução percentual
+    # Maior aumento e redução percentual entre os dois últimos preços, e
+    # dados da lista principal (já ordenada pela última alteração)
     maior_aumento = {"produto": None, "percentual": 0}
     maior_reducao = {"produto": None, "percentual": 0}
-
-    # Query otimizada para buscar os dois últimos preços de todos os produtos
-    from django.db.models import OuterRef, Subquery
-
-    latest_prices = PriceHistory.objects.filter(product=OuterRef("pk")).order_by(
-        "-changed_at"
-    )
-    products_with_prices = user_products.annotate(
-        current_price=Subquery(latest_prices.values("price")[:1]),
-        previous_price=Subquery(latest_prices.values("price")[1:2]),
-    ).filter(previous_price__isnull=False)
-
-    for p in products_with_prices:
-        if p.current_price > p.previous_price:  # type: ignore
-            percentual = ((p.current_price - p.previous_price) / p.previous_price) * 100  # type: ignore
-            if percentual > maior_aumento["percentual"]:
-                maior_aumento["percentual"] = percentual
-                maior_aumento["produto"] = p
-        elif p.current_price < p.previous_price:  # type: ignore
-            percentual = ((p.previous_price - p.current_price) / p.previous_price) * 100  # type: ignore
-            if percentual > maior_reducao["percentual"]:
-                maior_reducao["percentual"] = percentual
-                maior_reducao["produto"] = p
-
-    # Média de alterações por produto
-    total_produtos = user_products.count()
-    media_alteracoes = total_alteracoes / total_produtos if total_produtos > 0 else 0
-
-    # Produtos com seus históricos (para lista principal)
     produtos_com_historico = []
-    for product in user_products:
-        # Ordenação em Python para aproveitar o prefetch_related e evitar N+1 queries
-        history = sorted(
-            product.price_history.all(), key=lambda x: x.changed_at, reverse=True
-        )
-
-        if not history:
-            continue
-
-        # Dados para o Sparkline (últimos 10 preços, ordem cronológica)
-        history_prices = [float(h.price) for h in history[:10]]
-        history_prices.reverse()  # Reverte para o gráfico (do mais antigo para o mais novo)
-
-        # Determinar tendência
-        latest = history[0]
-        previous = history[1] if len(history) > 1 else None
-        trend = "stable"
-
-        if previous:
-            if latest.price > previous.price:
-                trend = "up"
-            elif latest.price < previous.price:
-                trend = "down"
+    for product in products:
+        trend = product.price_trend
+        previous = product.previous_price
+        if trend != "stable" and previous:
+            latest = Decimal(product.recent_prices[-1][0])
+            percentual = abs(latest - previous) / previous * 100
+            destaque = maior_aumento if trend == "up" else maior_reducao
+            if percentual > destaque["percentual"]:
+                destaque.update(produto=product, percentual=percentual)
 
         produtos_com_historico.append(
             {
                 "produto": product,
-                "historico_precos": history_prices,
-                "total_alteracoes": len(history),
-                "ultima_alteracao": latest,
+                "historico_precos": [float(price) for price, _ in product.recent_prices],
+                "total_alteracoes": product.price_change_count,
+                "ultima_alteracao": product.last_price_change_at,
                 "trend": trend,
             }
         )
 
-    # Ordenar por data da última alteração
-    produtos_com_historico.sort(
-        key=lambda x: (
-            x["ultima_alteracao"].changed_at if x["ultima_alteracao"] else datetime.min
-        ),
-        reverse=True,
-    )
-
     context = {
         "total_alteracoes": total_alteracoes,
         "produto_mais_alteracoes": produto_mais_alteracoes,
@@ -504,49 +785,18 @@ def product_movement_overview(request):
         return redirect("account_login")
 
     # Base Queryset
-    user_products = Product.objects.filter(user=request.user)
-
-    # Filtro por Termo de Busca (q)
-    q = request.GET.get("q", "")
-    if q:
-        user_products = user_products.filter(
-            models.Q(name__icontains=q) | models.Q(description__icontains=q)
-        )
-
-    # Filtro por Categoria
-    category_id = request.GET.get("category")
-    if category_id:
-        user_products = user_products.filter(categories__id=category_id)
+    user_products, q, category_id = _overview_products(request)
 
     movements = ProductMovement.objects.filter(
         product__in=user_products
     ).select_related("product")
 
     # Filtros de data e tipo
+    movements = _filter_movements(movements, request.GET)
     data_inicio = request.GET.get("data_inicio")
     data_fim = request.GET.get("data_fim")
     tipo = request.GET.get("tipo")
 
-    if data_inicio:
-        try:
-            from datetime import datetime
-
-            data_inicio_obj = datetime.strptime(data_inicio, "%Y-%m-%d")
-            movements = movements.filter(moved_at__gte=data_inicio_obj)
-        except ValueError:
-            pass
-
-    if data_fim:
-        try:
-            data_fim_obj = datetime.strptime(data_fim, "%Y-%m-%d")
-            data_fim_obj = data_fim_obj + timedelta(days=1)
-            movements = movements.filter(moved_at__lt=data_fim_obj)
-        except ValueError:
-            pass
-
-    if tipo in ["IN", "OUT"]:
-        movements = movements.filter(type=tipo)
-
     # Estatísticas
     from django.db.models import Sum
 
@@ -591,7 +841,7 @@ def movement_select_product(request, type):
     status = request.GET.get("status", "")
 
     if q:
-        products = products.filter(Q(name__icontains=q) | Q(description__icontains=q))
+        products = search_products(products, q)
     if category_id:
         products = products.filter(categories__id=category_id)
     if status == "public":
@@ -599,7 +849,7 @@ def movement_select_product(request, type):
     elif status == "private":
         products = products.filter(is_public=False)
 
-    products = products.distinct().order_by("name")
+    products = for_listing(products.distinct().order_by("name"))
 
     context = {
         "products": products,
@@ -628,33 +878,27 @@ def perform_movement(request, pk, type):
     if request.method == "POST":
         form = MovementForm(request.POST)
         if form.is_valid():
-            movement = form.save(commit=False)
-            movement.product = product
-            movement.type = type
-
-            # Atualiza o estoque do produto
-            if type == "IN":
-                product.stock += movement.quantity
-            else:
-                if product.stock < movement.quantity:
-                    messages.error(
-                        request,
-                        f"Estoque insuficiente para realizar esta saída. Estoque atual: {product.stock}",
-                    )
-                    return render(
-                        request,
-                        "products/movement_form.html",
-                        {
-                            "form": form,
-                            "product": product,
-                            "type": type,
-                            "type_display": "Entrada" if type == "IN" else "Saída",
-                        },
-                    )
-                product.stock -= movement.quantity
-
-            movement.save()
-            product.save()
+            # UPDATE condicional + insert da movimentação numa só transação
+            try:
+                record_movement(
+                    product,
+                    type,
+                    form.cleaned_data["quantity"],
+                    form.cleaned_data["reason"],
+                )
+            except InsufficientStock as exc:
+                product.stock = exc.available
+                messages.error(request, str(exc))
+                return render(
+                    request,
+                    "products/movement_form.html",
+                    {
+                        "form": form,
+                        "product": product,
+                        "type": type,
+                        "type_display": "Entrada" if type == "IN" else "Saída",
+                    },
+                )
 
             messages.success(
                 request,
@@ -676,6 +920,81 @@ def perform_movement(request, pk, type):
     )
 
 
+# Produtos exibidos no formulário de contagem; acima disso, use o CSV
+INVENTORY_FORM_LIMIT = 300
+
+
+@login_required
+def inventory_count(request):
+    """
+    Contagem de inventário: define o estoque contado de vários produtos de
+    uma vez, pelo formulário (um campo por produto) ou por CSV. As
+    diferenças viram movimentações de ajuste gravadas em lote.
+    """
+    products, q, category_id = _overview_products(request)
+    products = products.order_by("name", "pk")[:INVENTORY_FORM_LIMIT]
+    result = None
+    row_errors = []
+
+    if request.method == "POST":
+        form = InventoryCountForm(request.POST, request.FILES)
+        if form.is_valid():
+            counts = {}
+            unreadable = False
+            upload = form.cleaned_data["file"]
+            if upload:
+                stream = io.TextIOWrapper(upload, encoding="utf-8-sig", newline="")
+                try:
+                    counts, row_errors = read_inventory_counts(stream)
+                except (UnicodeDecodeError, StockError) as exc:
+                    messages.error(request, f"Não foi possível ler o arquivo: {exc}")
+                    unreadable = True
+            else:
+                for key, value in request.POST.items():
+                    if key.startswith("count_") and value.strip():
+                        try:
+                            counts[int(key[6:])] = int(value)
+                        except ValueError:
+                            row_errors.append((key[6:], "Quantidade inválida."))
+
+            if counts:
+                result = apply_inventory_count(
+                    request.user,
+                    counts,
+                    reason=form.cleaned_data["reason"]
+                    or ProductMovement.ADJUSTMENT_REASON,
+                )
+                row_errors += result.errors
+                messages.success(
+                    request,
+                    f"Inventário aplicado: {result.adjusted} produtos ajustados, "
+                    f"{result.unchanged} sem diferença.",
+                )
+            elif not (row_errors or unreadable):
+                messages.warning(request, "Nenhuma contagem informada.")
+            if row_errors:
+                messages.warning(
+                    request, f"{len(row_errors)} contagens não foram aplicadas."
+                )
+    else:
+        form = InventoryCountForm()
+
+    return render(
+        request,
+        "products/inventory_count.html",
+        {
+            "form": form,
+            "products": products,
+            "result": result,
+            "row_errors": row_errors,
+            "q": q,
+            "selected_category": int(category_id) if category_id else "",
+            "categorias": Category.objects.filter(user=request.user),
+            "limit": INVENTORY_FORM_LIMIT,
+        },
+    )
+
+
 # --- Category Views ---
 @login_required
 def category_list(request):
@@ -842,10 +1161,10 @@ def user_public_catalog(request, username):
     products = Product.objects.filter(user=catalog_user, is_public=True)
 
     q = request.GET.get("q")
+    search_mode = request.GET.get("search_mode", "")
+    fuzzy = search_mode == "fuzzy" and bool(q)
     if q:
-        products = products.filter(name__icontains=q) | products.filter(
-            description__icontains=q
-        )
+        products = search_products(products, q, ranked=fuzzy, mode=search_mode)
 
     category_id = request.GET.get("category")
     if category_id:
@@ -865,13 +1184,13 @@ def user_public_catalog(request, username):
     if max_stock:
         products = products.filter(stock__lte=max_stock)
 
-    products = products.distinct().order_by("-created_at")
+    ordering = ("-search_rank", "pk") if fuzzy else ("-created_at",)
+    products = for_listing(products.distinct().order_by(*ordering))
 
-    stats = {
-        "total_count": products.count(),
-        "total_stock": sum(p.stock for p in products),
-        "total_value": sum(p.price * p.stock for p in products),
-    }
+    if not (q or min_price or max_price or min_stock or max_stock):
+        stats = rollup_stats(user=catalog_user, is_public=True, category_id=category_id)
+    else:
+        stats = inventory_stats(products)
 
     # Determine view mode
     view_mode = "grid"
@@ -882,9 +1201,10 @@ def user_public_catalog(request, username):
     else:
         view_mode = request.session.get("view_mode_user_public_catalog", "grid")
 
+    swap = _is_view_swap(request)
     return render(
         request,
-        "products/product_list.html",
+        "products/product_list_view.html" if swap else "products/product_list.html",
         {
             "products": products,
             "categories": Category.objects.filter(user=catalog_user),
@@ -892,6 +1212,7 @@ def user_public_catalog(request, username):
             "title": f"Catálogo de {catalog_user.username}",
             "is_public_view": True,
             "q": q,
+            "search_mode": search_mode,
             "category_id": request.GET.get("category", ""),
             "min_price": min_price,
             "max_price": max_price,
@@ -899,6 +1220,7 @@ def user_public_catalog(request, username):
             "max_stock": max_stock,
             "view_mode": view_mode,
             "view_context": "user_public_catalog",
+            "swap_toggle": swap,
         },
     )
 
@@ -912,8 +1234,12 @@ def public_product_list(request):
     min_stock = request.GET.get("min_stock", "")
     max_stock = request.GET.get("max_stock", "")
 
-    # Parâmetros de Ordenação
-    sort_field = request.GET.get("sort", "name")
+    search_mode = request.GET.get("search_mode", "")
+
+    # Parâmetros de Ordenação (na busca aproximada, por similaridade)
+    fuzzy = search_mode == "fuzzy" and bool(q)
+    default_sort = "relevance" if fuzzy else "name"
+    sort_field = request.GET.get("sort", default_sort)
     sort_direction = request.GET.get("dir", "asc")
     prefix = "" if sort_direction == "asc" else "-"
 
@@ -922,7 +1248,9 @@ def public_product_list(request):
 
     # Filtros
     if q:
-        products = products.filter(Q(name__icontains=q) | Q(description__icontains=q))
+        products = search_products(
+            products, q, ranked=fuzzy and sort_field == "relevance", mode=search_mode
+        )
     if category_id:
         products = products.filter(categories__id=category_id)
     if min_price:
@@ -941,23 +1269,21 @@ def public_product_list(request):
         )
     elif sort_field == "user":
         products = products.order_by(f"{prefix}user__username")
+    elif sort_field == "relevance" and fuzzy:
+        products = products.order_by("-search_rank", "pk")
     else:
         valid_fields = {"name": "name", "price": "price", "stock": "stock"}
         target = valid_fields.get(sort_field, "name")
         products = products.order_by(f"{prefix}{target}")
 
     # Distinct final
-    products = products.distinct()
+    products = for_listing(products.distinct())
 
     # Estatísticas
-    stats = {
-        "total_count": products.count(),
-        "total_stock": products.aggregate(Sum("stock"))["stock__sum"] or 0,
-        "total_value": products.annotate(
-            val=ExpressionWrapper(F("price") * F("stock"), output_field=DecimalField())
-        ).aggregate(total=Sum("val"))["total"]
-        or 0,
-    }
+    if not (q or min_price or max_price or min_stock or max_stock):
+        stats = rollup_stats(is_public=True, category_id=category_id)
+    else:
+        stats = inventory_stats(products)
 
     # Determine view mode
     view_mode = "grid"
@@ -968,16 +1294,20 @@ def public_product_list(request):
     else:
         view_mode = request.session.get("view_mode_public_product_list", "grid")
 
+    swap = _is_view_swap(request)
     return render(
         request,
-        "products/product_list.html",
+        "products/product_list_view.html" if swap else "products/product_list.html",
         {
             "products": products,
             "categories": Category.objects.filter(products__is_public=True).distinct(),
             "stats": stats,
             "title": "Catálogo Público",
             "is_public_view": True,
+            "sort_field": sort_field,
+            "sort_direction": sort_direction,
             "q": q,
+            "search_mode": search_mode,
             "category_id": category_id,
             "min_price": min_price,
             "max_price": max_price,
@@ -985,6 +1315,7 @@ def public_product_list(request):
             "max_stock": max_stock,
             "view_mode": view_mode,
             "view_context": "public_product_list",
+            "swap_toggle": swap,
         },
     )
 
@@ -1025,4 +1356,17 @@ def set_view_mode(request, context, mode):
             profile.save()
         else:
             request.session[f"view_mode_{context}"] = mode
+
+    # Via HTMX, re-renderiza apenas o bloco de produtos da página atual no novo
+    # modo, em vez de redirecionar e montar a página inteira de novo
+    if request.headers.get("HX-Request"):
+        current_url = urlsplit(request.headers.get("HX-Current-URL", ""))
+        try:
+            match = resolve(current_url.path)
+        except Resolver404:
+            match = None
+        if match and match.url_name in VIEW_SWAP_URL_NAMES:
+            request.GET = QueryDict(current_url.query)
+            return match.func(request, *match.args, **match.kwargs)
+
     return redirect(request.META.get("HTTP_REFERER", "/"))
@@ -17,6 +17,11 @@ function getKoreUniqueSelectedIds() {
     return Array.from(uniqueIds);
 }
 
+// Botões de categoria (aplicar/remover/substituir) só com uma categoria escolhida
+function setBulkCategoryButtons(enabled) {
+    document.querySelectorAll('.bulk-cat-btn').forEach(btn => btn.disabled = !enabled);
+}
+
 // Funções globais
 window.submitBulkAction = function (action) {
     const input = document.getElementById('bulk-action-input');
@@ -28,6 +33,14 @@ window.submitBulkAction = function (action) {
 
     if (selectedCount === 0) return;
 
+    if (action === 'adjust_price') {
+        const value = document.getElementById('bulk-price-value');
+        if (!value || !value.value.trim()) {
+            if (value) value.focus();
+            return;
+        }
+    }
+
     // Armazena a ação para execução posterior
     currentBulkAction = action;
 
@@ -86,6 +99,38 @@ window.openBulkActionModal = function (action, count) {
         extraInfo.classList.remove('hidden');
         icon.setAttribute('data-lucide', 'tag');
         icon.classList.add('text-primary');
+    } else if (action === 'adjust_price') {
+        const mode = document.getElementById('bulk-price-mode');
+        const value = document.getElementById('bulk-price-value');
+        const label = mode ? mode.options[mode.selectedIndex].text : "";
+        title.textContent = "Reajustar Preços";
+        desc.textContent = "Aplicar o mesmo reajuste aos produtos selecionados.";
+        warning.textContent = "Cada alteração de preço ficará registrada no histórico.";
+        extraInfo.innerHTML = `<p class="text-xs font-bold text-muted-foreground uppercase mb-1">${label}:</p><p class="text-sm font-bold text-primary"></p>`;
+        extraInfo.lastElementChild.textContent = value ? value.value : "";
+        extraInfo.classList.remove('hidden');
+        icon.setAttribute('data-lucide', 'badge-dollar-sign');
+        icon.classList.add('text-primary');
+    } else if (action === 'remove_category') {
+        const searchInput = document.getElementById('bulk-category-search');
+        const catName = searchInput ? searchInput.value : "selecionada";
+        title.textContent = "Remover Categoria";
+        desc.textContent = "Desvincular a categoria dos produtos selecionados.";
+        warning.textContent = "As demais categorias dos produtos serão mantidas.";
+        extraInfo.innerHTML = `<p class="text-xs font-bold text-muted-foreground uppercase mb-1">Categoria:</p><p class="text-sm font-bold text-primary">${catName}</p>`;
+        extraInfo.classList.remove('hidden');
+        icon.setAttribute('data-lucide', 'tag');
+        icon.classList.add('text-muted-foreground');
+    } else if (action === 'replace_category') {
+        const searchInput = document.getElementById('bulk-category-search');
+        const catName = searchInput ? searchInput.value : "selecionada";
+        title.textContent = "Substituir Categorias";
+        desc.textContent = "Os produtos selecionados ficarão apenas com esta categoria.";
+        warning.textContent = "Todas as outras categorias serão removidas desses produtos.";
+        extraInfo.innerHTML = `<p class="text-xs font-bold text-muted-foreground uppercase mb-1">Única Categoria:</p><p class="text-sm font-bold text-primary">${catName}</p>`;
+        extraInfo.classList.remove('hidden');
+        icon.setAttribute('data-lucide', 'replace');
+        icon.classList.add('text-primary');
     }
 
     modal.classList.remove('hidden');
@@ -117,16 +162,16 @@ window.clearSelection = function () {
 
     const searchInput = document.getElementById('bulk-category-search');
     const hiddenId = document.getElementById('bulk-category-id');
-    const applyBtn = document.getElementById('bulk-apply-cat-btn');
     if (searchInput) searchInput.value = "";
     if (hiddenId) hiddenId.value = "";
-    if (applyBtn) applyBtn.disabled = true;
+    setBulkCategoryButtons(false);
 
     window.updateBulkActionBar();
 };
 
 window.updateBulkActionBar = function () {
-    const container = document.getElementById('product-list-container');
+    // #product-view é trocado via HTMX ao alternar o modo, então é lido a cada chamada
+    const container = document.getElementById('product-view');
     const viewMode = container ? container.dataset.viewMode : 'grid';
     const selectedCount = getKoreUniqueSelectedIds().length;
     const actionBar = document.getElementById('bulk-action-bar');
@@ -151,20 +196,17 @@ window.updateBulkActionBar = function () {
 
 // Inicialização
 function initKoreBulkActions() {
-    const selectAllBtn = document.getElementById('select-all');
-
-    if (selectAllBtn) {
-        selectAllBtn.onclick = function () {
-            const isChecked = this.checked;
+    // Delegation centralizada (a tabela pode ser inserida depois via HTMX)
+    document.body.addEventListener('change', function (e) {
+        if (e.target && e.target.id === 'select-all') {
+            const isChecked = e.target.checked;
             document.querySelectorAll('.checkbox-product').forEach(cb => {
                 cb.checked = isChecked;
             });
             window.updateBulkActionBar();
-        };
-    }
+            return;
+        }
 
-    // Delegation centralizada
-    document.body.addEventListener('change', function (e) {
         if (e.target && e.target.classList.contains('checkbox-product')) {
             const isChecked = e.target.checked;
             const productId = e.target.value;
@@ -175,6 +217,7 @@ function initKoreBulkActions() {
             });
 
             // Atualiza Select All checkbox
+            const selectAllBtn = document.getElementById('select-all');
             if (selectAllBtn && !isChecked) {
                 selectAllBtn.checked = false;
             }
@@ -189,7 +232,6 @@ function initKoreBulkActions() {
         const searchInput = document.getElementById('bulk-category-search');
         const menu = document.getElementById('bulk-category-menu');
         const hiddenId = document.getElementById('bulk-category-id');
-        const applyBtn = document.getElementById('bulk-apply-cat-btn');
 
         if (searchInput && menu) {
             searchInput.addEventListener('focus', () => menu.classList.remove('hidden'));
@@ -207,7 +249,7 @@ function initKoreBulkActions() {
                 });
                 if (query === "") {
                     hiddenId.value = "";
-                    if (applyBtn) applyBtn.disabled = true;
+                    setBulkCategoryButtons(false);
                 }
             });
 
@@ -217,12 +259,19 @@ function initKoreBulkActions() {
                     searchInput.value = opt.dataset.name;
                     hiddenId.value = opt.dataset.id;
                     menu.classList.add('hidden');
-                    if (applyBtn) applyBtn.disabled = false;
+                    setBulkCategoryButtons(true);
                 }
             });
         }
     }
 
+    // Ao trocar o modo via HTMX, a barra de ações segue o novo modo
+    document.body.addEventListener('htmx:afterSwap', function (e) {
+        if (e.detail.target && e.detail.target.id === 'product-view') {
+            window.clearSelection();
+        }
+    });
+
     window.updateBulkActionBar();
 }
 